@@ -0,0 +1,13 @@
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmarks", "benchmark suite (pytest -m benchmark)")
+    group.addoption(
+        "--benchmark-size",
+        type=int,
+        default=10000,
+        help="Number of members of the synthetic tree used by benchmarks.",
+    )
+    group.addoption(
+        "--benchmark-update",
+        action="store_true",
+        help="Store results of the benchmarks as the new baseline instead of comparing.",
+    )
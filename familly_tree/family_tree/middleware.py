@@ -0,0 +1,144 @@
+"""
+Opt-in per request SQL profiling, enabled with QUERY_PROFILING = True.
+
+Every request gets a Server-Timing header (database and total time, number of queries) and
+one JSON log line on the "family_tree.profiling" logger. Queries are grouped by their SQL
+text, so the same statement run with different parameters (an N+1 pattern, e.g. a count per
+row) shows up as duplicates. Requests slower than QUERY_PROFILING_SLOW_MS, or repeating a
+statement QUERY_PROFILING_DUPLICATES times, are logged as warnings with the top statements.
+Database time is measured around execute(), fetching rows of large results counts as app.
+"""
+
+import json
+import logging
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger("family_tree.profiling")
+
+DEFAULTS = {
+    "QUERY_PROFILING_SLOW_MS": 500,
+    "QUERY_PROFILING_DUPLICATES": 5,
+    "QUERY_PROFILING_TOP": 5,
+}
+
+
+def _setting(name):
+    return getattr(settings, name, DEFAULTS[name])
+
+
+class QueryProfile:
+    """SQL statements run during one request, used as an execute_wrapper."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        # sql -> [count, seconds]
+        self.statements = defaultdict(lambda: [0, 0.0])
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            statement = self.statements[sql]
+            statement[0] += 1
+            statement[1] += elapsed
+
+    @property
+    def duplicates(self) -> int:
+        """Queries repeating a statement which already ran in the request."""
+        return self.count - len(self.statements)
+
+    def most_repeated(self) -> int:
+        return max((count for count, _ in self.statements.values()), default=0)
+
+    def top(self, limit: int) -> list[dict]:
+        """Statements which took the most time in total."""
+        statements = sorted(
+            self.statements.items(), key=lambda item: item[1][1], reverse=True
+        )
+        return [
+            {"sql": sql, "count": count, "ms": round(seconds * 1000, 2)}
+            for sql, (count, seconds) in statements[:limit]
+        ]
+
+
+class QueryProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "QUERY_PROFILING", False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile = QueryProfile()
+        started = time.perf_counter()
+        with self._profiling(profile):
+            response = self.get_response(request)
+        return self._finish(request, response, profile, started)
+
+    async def __acall__(self, request):
+        profile = QueryProfile()
+        started = time.perf_counter()
+        # the wrappers are set on the connections of this context, which sync_to_async
+        # shares with the thread that runs the queries
+        with self._profiling(profile):
+            response = await self.get_response(request)
+        return self._finish(request, response, profile, started)
+
+    @staticmethod
+    def _profiling(profile):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(profile))
+        return stack
+
+    def _finish(self, request, response, profile, started):
+        total_ms = (time.perf_counter() - started) * 1000
+        db_ms = profile.seconds * 1000
+
+        # streamed content is produced after this point and is not included
+        response["Server-Timing"] = (
+            f'db;dur={db_ms:.2f};desc="{profile.count} queries", '
+            f"app;dur={total_ms - db_ms:.2f}, total;dur={total_ms:.2f}"
+        )
+        self._log(request, response, profile, db_ms, total_ms)
+        return response
+
+    @staticmethod
+    def _log(request, response, profile, db_ms, total_ms):
+        match = request.resolver_match
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "view": match.view_name if match else None,
+            "status": response.status_code,
+            "queries": profile.count,
+            "duplicates": profile.duplicates,
+            "db_ms": round(db_ms, 2),
+            "total_ms": round(total_ms, 2),
+        }
+        slow = total_ms >= _setting("QUERY_PROFILING_SLOW_MS")
+        repeated = profile.most_repeated() >= _setting("QUERY_PROFILING_DUPLICATES")
+        if not (slow or repeated):
+            logger.info(json.dumps(record))
+            return
+        record["slow"] = slow
+        record["top"] = profile.top(_setting("QUERY_PROFILING_TOP"))
+        logger.warning(json.dumps(record))
@@ -0,0 +1,145 @@
+"""
+Read/write splitting between the primary database and a read replica.
+
+Enabled by DATABASE_REPLICA (alias of the replica in DATABASES), see the settings profile
+in settings.py. Reads of GET/HEAD requests to views listed in DATABASE_REPLICA_VIEWS go to the
+replica, everything else - writes, reads inside transactions, reads after a write of the same
+request, management commands - to the primary. After a request writes, the client is pinned to
+the primary for DATABASE_REPLICA_PIN_SECONDS with a cookie, so it reads its own writes while
+the replica catches up.
+
+The routing state lives in a context variable, so it follows requests of async views into
+the threads running their queries.
+"""
+
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.urls import Resolver404, resolve
+
+PIN_COOKIE = "pin_primary"
+SAFE_METHODS = ("GET", "HEAD")
+DEFAULTS = {
+    "DATABASE_REPLICA": None,
+    "DATABASE_REPLICA_VIEWS": (),
+    "DATABASE_REPLICA_PIN_SECONDS": 5,
+}
+
+
+def _setting(name):
+    return getattr(settings, name, DEFAULTS[name])
+
+
+@dataclass
+class RequestRouting:
+    replica: bool
+    wrote: bool = False
+
+
+_routing: ContextVar[Optional[RequestRouting]] = ContextVar(
+    "database_routing", default=None
+)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or not state.replica or state.wrote:
+            return DEFAULT_DB_ALIAS
+        # e.g. checks under select_for_update() must see the rows they lock
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return _setting("DATABASE_REPLICA")
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        # explicitly, instances read from the replica would be saved there otherwise
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas get their schema from the primary
+        return db != _setting("DATABASE_REPLICA")
+
+
+def reads_from_replica(request) -> bool:
+    if request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES:
+        return False
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return False
+    return match.view_name in _setting("DATABASE_REPLICA_VIEWS")
+
+
+class ReplicaRoutingMiddleware:
+    """Sets the routing state of each request and pins clients which wrote."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not _setting("DATABASE_REPLICA"):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RequestRouting(replica=reads_from_replica(request))
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self._pin_writer(state, response)
+
+    async def __acall__(self, request):
+        state = RequestRouting(replica=reads_from_replica(request))
+        token = _routing.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self._pin_writer(state, response)
+
+    @staticmethod
+    def _pin_writer(state, response):
+        if response.streaming and not response.is_async:
+            response.streaming_content = _routed_stream(
+                state, response.streaming_content
+            )
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=_setting("DATABASE_REPLICA_PIN_SECONDS"),
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+
+def _routed_stream(state: RequestRouting, content):
+    """Streamed content (exports) runs its queries after the response left the middleware."""
+    iterator = iter(content)
+    while True:
+        token = _routing.set(state)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _routing.reset(token)
+        yield chunk
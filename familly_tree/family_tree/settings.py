@@ -42,6 +42,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # outermost, so queries and time of the other middleware are included
+    "family_tree.middleware.QueryProfilingMiddleware",
+    # before anything reading the database, e.g. sessions
+    "family_tree.routers.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -52,6 +56,14 @@ MIDDLEWARE = [
     "whitenoise.middleware.WhiteNoiseMiddleware",  # for serving staticfiles with DEBUG=False, without nginx
 ]
 
+# Per request SQL profiling (Server-Timing header, "family_tree.profiling" log lines),
+# off unless QUERY_PROFILING=1 is set in the environment
+QUERY_PROFILING = os.environ.get("QUERY_PROFILING") == "1"
+# requests slower than this or repeating one statement this many times log top statements
+QUERY_PROFILING_SLOW_MS = 500
+QUERY_PROFILING_DUPLICATES = 5
+QUERY_PROFILING_TOP = 5
+
 ROOT_URLCONF = "family_tree.urls"
 
 TEMPLATES = [
@@ -83,6 +95,56 @@ DATABASES = {
     }
 }
 
+# Read replica profile, off unless DATABASE_REPLICA_NAME (path of a copy of the database,
+# refreshed with `py manage.py sync_replica`) is set in the environment. Reads of the views
+# below go to the replica, writes and clients which just wrote to the primary (family_tree.routers)
+DATABASE_REPLICA_NAME = os.environ.get("DATABASE_REPLICA_NAME")
+DATABASE_REPLICA = None
+if DATABASE_REPLICA_NAME:
+    DATABASE_REPLICA = "replica"
+    DATABASES[DATABASE_REPLICA] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        # read only, so nothing is written to the replica by mistake
+        "NAME": f"file:{DATABASE_REPLICA_NAME}?mode=ro",
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_ROUTERS = ["family_tree.routers.PrimaryReplicaRouter"]
+DATABASE_REPLICA_VIEWS = (
+    "members:members",
+    "members:details",
+    "members:tree",
+    "members:export",
+    "members:api_member_subtree",
+    "members:api_relationship",
+    "members:api_member_search",
+)
+# seconds for which a client reads from the primary after writing
+DATABASE_REPLICA_PIN_SECONDS = 5
+
+# Template fragments (members.templatetags) and whole pages for anonymous clients
+# (members.page_cache). Local memory of each process, unless CACHE_DIR is set in the
+# environment, then files shared by the processes
+CACHE_DIR = os.environ.get("CACHE_DIR")
+CACHES = {
+    "default": {
+        "BACKEND": (
+            "django.core.cache.backends.filebased.FileBasedCache"
+            if CACHE_DIR
+            else "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": CACHE_DIR or "family-tree",
+        # a page per member, the default of 300 entries keeps few of them
+        "OPTIONS": {"MAX_ENTRIES": 20000},
+    }
+}
+# writes invalidate cached pages, the timeout bounds how long a page can outlive a missed
+# invalidation. With a replica pages can be rendered from data behind the primary, so they
+# are only kept for as long as the replica may lag
+PAGE_CACHE_TIMEOUT = DATABASE_REPLICA_PIN_SECONDS if DATABASE_REPLICA else 60 * 5
+# invalidations of one process must reach the others, so running several processes with
+# the local memory cache needs CACHE_DIR or PAGE_CACHE_ENABLED=0
+PAGE_CACHE_ENABLED = os.environ.get("PAGE_CACHE_ENABLED", "1") == "1"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -0,0 +1,305 @@
+"""
+JSON endpoints for the front-end.
+
+Subtrees are read one generation at a time with a single query per generation (plus one
+for all spouses), so the cost depends on the requested depth and the subtree size,
+never on the size of the whole tree. Their ETags are built from the subtree only (see
+subtree_tag()), so edits elsewhere in the tree do not invalidate them.
+"""
+
+import hashlib
+import json
+from dataclasses import asdict
+from typing import Optional
+
+from django.core.exceptions import BadRequest
+from django.db.models import Q
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import condition, require_GET, require_POST
+
+from . import page_cache
+from .bulk_edit import bulk_edit_members
+from .dates import date_sort_key
+from .models import MartialRelationship, Member
+from .relationships import UnknownMember, relationship_between
+
+NODE_FIELDS = (
+    "id",
+    "firstname",
+    "lastname",
+    "sex",
+    "birth_date",
+    "death_date",
+    "father_id",
+    "mother_id",
+    "children_count",
+)
+DIRECTIONS = ("ancestors", "descendants", "both")
+DEFAULT_DEPTH = 2
+MAX_DEPTH = 10
+SEARCH_PAGE_SIZE = 20
+
+
+def build_subtree(member_id: int, depth: int, direction: str) -> Optional[dict]:
+    """
+    Return the member as a node dict with ancestors in "father"/"mother" and descendants in
+    "children", up to depth generations away. Nodes on the edge are not expanded, clients can
+    tell whether they have more relatives from father_id, mother_id and children_count.
+    """
+    root = Member.objects.filter(pk=member_id).values(*NODE_FIELDS).first()
+    if root is None:
+        return None
+    nodes = [root]
+    if direction in ("ancestors", "both"):
+        nodes += _add_ancestors(root, depth)
+    if direction in ("descendants", "both"):
+        nodes += _add_descendants(root, depth)
+    _add_spouses(nodes)
+    return root
+
+
+def _add_ancestors(root: dict, depth: int) -> list[dict]:
+    added, generation = [], [root]
+    for _ in range(depth):
+        parent_ids = {
+            node[field] for node in generation for field in ("father_id", "mother_id")
+        } - {None}
+        if not parent_ids:
+            break
+        parents = Member.objects.filter(pk__in=parent_ids).values(*NODE_FIELDS)
+        parents = {parent["id"]: parent for parent in parents}
+        for node in generation:
+            node["father"] = parents.get(node["father_id"])
+            node["mother"] = parents.get(node["mother_id"])
+        generation = list(parents.values())
+        added += generation
+    return added
+
+
+def _add_descendants(root: dict, depth: int) -> list[dict]:
+    added, generation = [], [root]
+    for _ in range(depth):
+        for node in generation:
+            node["children"] = []
+        parents = {node["id"]: node for node in generation if node["children_count"]}
+        if not parents:
+            break
+        children = (
+            Member.objects.filter(Q(father_id__in=parents) | Q(mother_id__in=parents))
+            .order_by("birth_date_key", "id")
+            .values(*NODE_FIELDS)
+        )
+        generation = []
+        for child in children:
+            generation.append(child)
+            for parent_id in (child["father_id"], child["mother_id"]):
+                if parent_id in parents:
+                    parents[parent_id]["children"].append(child)
+        added += generation
+    return added
+
+
+def _add_spouses(nodes: list[dict]) -> None:
+    spouses: dict[int, list[dict]] = {node["id"]: [] for node in nodes}
+    relationships = (
+        MartialRelationship.objects.filter(member_id__in=spouses)
+        .order_by("id")
+        .values(
+            "member_id", "spouse_id", "spouse__firstname", "spouse__lastname", "married"
+        )
+    )
+    for relationship in relationships:
+        spouses[relationship["member_id"]].append(
+            {
+                "id": relationship["spouse_id"],
+                "firstname": relationship["spouse__firstname"],
+                "lastname": relationship["spouse__lastname"],
+                "married": relationship["married"],
+            }
+        )
+    for node in nodes:
+        node["spouses"] = spouses[node["id"]]
+
+
+def subtree_tag(member_id: int, depth: int, direction: str) -> Optional[str]:
+    """
+    Identifies the state of the subtree, None if the member does not exist. Members of the
+    subtree are found with the lineage query and read in one query, ordered, with their
+    versions (bumped by every change of a member or its marriages), children counts (edge
+    nodes show them) and their marriages with versions of the spouses (spouse names are
+    shown). The tag is a hash of all of them, so any other subtree gets another tag.
+    """
+    root = Member.objects.filter(pk=member_id)
+    subtree = Q(pk=member_id)
+    if direction in ("ancestors", "both"):
+        subtree |= Q(pk__in=root.ancestors(depth).values("pk"))
+    if direction in ("descendants", "both"):
+        subtree |= Q(pk__in=root.descendants(depth).values("pk"))
+    rows = (
+        Member.objects.filter(subtree)
+        .order_by("pk", "martialrelationship__id")
+        .values_list(
+            "pk",
+            "version",
+            "children_count",
+            "martialrelationship__id",
+            "martialrelationship__married",
+            "martialrelationship__spouse__version",
+        )
+    )
+    state = hashlib.md5(
+        f"{member_id}:{direction}:{depth}".encode(), usedforsecurity=False
+    )
+    found = False
+    for row in rows:
+        found = True
+        state.update(repr(row).encode())
+    return state.hexdigest() if found else None
+
+
+def _subtree_params(request) -> tuple[int, str]:
+    direction = request.GET.get("direction", "both")
+    if direction not in DIRECTIONS:
+        raise BadRequest(f"direction must be one of {', '.join(DIRECTIONS)}.")
+    try:
+        depth = int(request.GET.get("depth", DEFAULT_DEPTH))
+    except ValueError:
+        raise BadRequest("depth must be a number.")
+    if not 0 <= depth <= MAX_DEPTH:
+        raise BadRequest(f"depth must be between 0 and {MAX_DEPTH}.")
+    return depth, direction
+
+
+def _subtree_etag(request, pk):
+    if not hasattr(request, "subtree_tag"):
+        request.subtree_tag = subtree_tag(pk, *_subtree_params(request))
+    return request.subtree_tag
+
+
+@require_GET
+@condition(etag_func=_subtree_etag)
+def member_subtree(request, pk):
+    """
+    GET /members/api/<pk>/subtree?direction=ancestors|descendants|both&depth=N
+
+    Responses are validated with the state of the subtree, so clients revalidating with
+    If-None-Match get 304 without the subtree being rebuilt until it changes.
+    """
+    depth, direction = _subtree_params(request)
+    subtree = build_subtree(pk, depth, direction)
+    if subtree is None:
+        raise Http404(f"Member {pk} does not exist.")
+    return JsonResponse(
+        {
+            "version": _subtree_etag(request, pk),
+            "direction": direction,
+            "depth": depth,
+            "member": subtree,
+        }
+    )
+
+
+@require_GET
+def relationship(request, pk, other_pk):
+    """GET /members/api/<pk>/relationship/<other_pk>: what other is to the member."""
+    try:
+        result = relationship_between(pk, other_pk)
+    except UnknownMember as error:
+        raise Http404(str(error))
+    return JsonResponse(
+        {
+            "member": result["member"].pk,
+            "other": result["other"].pk,
+            "relationship": result["relationship"],
+            "path": [
+                {"id": member.pk, "name": str(member)} for member in result["path"]
+            ],
+        }
+    )
+
+
+@require_GET
+def member_search(request):
+    """
+    GET /members/api/members?q=&sex=m|f&born_after=&born_before=&exclude=<id>&single=1&page=N
+
+    One page of members for pickers (autocomplete widgets). q matches name prefixes through
+    the search index, without q members are listed by name (member_sex_name_idx).
+    Birth date constraints take partial dates, members with unknown birth dates always match.
+    """
+    params = request.GET
+    queryset = Member.objects.all()
+    query = params.get("q", "").strip()
+    if query:
+        queryset = queryset.search(query)
+    else:
+        queryset = queryset.order_by("lastname", "firstname", "id")
+
+    sex = params.get("sex")
+    if sex:
+        if sex not in Member.Sex.values:
+            raise BadRequest(f"sex must be one of {', '.join(Member.Sex.values)}.")
+        queryset = queryset.filter(sex=sex)
+    for param, method in (
+        ("born_after", queryset.born_after),
+        ("born_before", queryset.born_before),
+    ):
+        if params.get(param):
+            date_key, _ = date_sort_key(params[param])
+            if not date_key:
+                raise BadRequest(f"{param} must be a YYYY, YYYY-MM or YYYY-MM-DD date.")
+            queryset = method(date_key)
+    try:
+        if params.get("exclude"):
+            queryset = queryset.exclude(pk=int(params["exclude"]))
+        page = int(params.get("page", 1))
+    except ValueError:
+        raise BadRequest("exclude and page must be numbers.")
+    if page < 1:
+        raise BadRequest("page must be a positive number.")
+    if params.get("single") == "1":
+        queryset = queryset.single()
+
+    start = (page - 1) * SEARCH_PAGE_SIZE
+    end = start + SEARCH_PAGE_SIZE + 1
+    rows = list(queryset.values("id", "firstname", "lastname", "birth_date")[start:end])
+    return JsonResponse(
+        {
+            "page": page,
+            "has_next": len(rows) > SEARCH_PAGE_SIZE,
+            "results": [
+                {
+                    "id": row["id"],
+                    "text": f"{row['firstname']} {row['lastname']}",
+                    "birth_date": row["birth_date"],
+                }
+                for row in rows[:SEARCH_PAGE_SIZE]
+            ],
+        }
+    )
+
+
+@require_GET
+def page_cache_stats(request):
+    """GET /members/api/page-cache: hits and misses of cached pages in this process."""
+    return JsonResponse(page_cache.stats())
+
+
+@require_POST
+def member_bulk_edit(request):
+    """
+    POST /members/api/members/bulk?dry_run=1 with a JSON list of patches, e.g.
+    [{"id": 1, "lastname": "Smith"}, {"id": 2, "death_date": "1950", "father_id": 1}]
+
+    Patches are validated together and applied in one transaction, see members.bulk_edit.
+    If any is rejected nothing is saved and the response (400) lists rejected patches
+    by their position with the reasons. dry_run=1 only validates them.
+    """
+    try:
+        patches = json.loads(request.body)
+    except ValueError:
+        raise BadRequest("Body must be JSON.")
+    if not isinstance(patches, list):
+        raise BadRequest("Body must be a list of patches.")
+    result = bulk_edit_members(patches, dry_run=request.GET.get("dry_run") == "1")
+    return JsonResponse(asdict(result), status=400 if result.rejected else 200)
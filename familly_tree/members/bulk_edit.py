@@ -0,0 +1,292 @@
+"""
+Bulk edits of existing members, e.g. corrections of names, dates or sex after an import.
+
+Patches are dicts with the member id and the fields to change. Rules which Member.save()
+checks per row (sex, date formats, birth before death, parents' sex, cycles and ancestors
+born after the member) are checked for all patches together, against the state the tree
+will have after every patch is applied:
+- patched members in one query,
+- sex of parents outside the patches in one query,
+- children and spouses of members changing sex in one query each,
+- ancestors of all new parents in one recursive query.
+Patches are applied with bulk_update in one transaction, all or nothing - if any patch is
+rejected nothing is saved and every rejected patch is returned with its reasons.
+"""
+
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Iterable, Optional
+
+from django.db import transaction
+from django.db.models import Q
+
+from .dates import age_from_keys, date_sort_key, latest_date_key
+from .models import MartialRelationship, Member
+
+TEXT_FIELDS = {"firstname": False, "lastname": False, "family_name": True}
+NULLABLE_TEXT_FIELDS = ("birth_date", "death_date", "description")
+PARENT_ID_FIELDS = ("father_id", "mother_id")
+EDITABLE_FIELDS = (*TEXT_FIELDS, "sex", *NULLABLE_TEXT_FIELDS, *PARENT_ID_FIELDS)
+PARENT_SEX = {"father_id": Member.Sex.MALE, "mother_id": Member.Sex.FEMALE}
+
+
+@dataclass
+class RejectedPatch:
+    row: int
+    id: Optional[int]
+    errors: list[str]
+
+
+@dataclass
+class BulkEditResult:
+    updated: int = 0
+    rejected: list[RejectedPatch] = field(default_factory=list)
+
+
+def bulk_edit_members(
+    patches: Iterable[dict], dry_run: bool = False, batch_size: int = 2000
+) -> BulkEditResult:
+    """
+    Validate and apply patches like {"id": 1, "lastname": "Smith", "father_id": 2}.
+    With dry_run the patches are only validated.
+    """
+    patches = list(patches)
+    result = BulkEditResult()
+    with transaction.atomic():
+        errors = {row: _patch_errors(patch) for row, patch in enumerate(patches)}
+        ids = [patch["id"] for row, patch in enumerate(patches) if not errors[row]]
+        members = Member.objects.in_bulk(ids)
+        loaded_sexes = {pk: member.sex for pk, member in members.items()}
+        rows = {}
+        for row, patch in enumerate(patches):
+            if errors[row]:
+                continue
+            if patch["id"] in rows:
+                errors[row].append(f"Member {patch['id']} is patched more than once.")
+            elif patch["id"] not in members:
+                errors[row].append(f"Member {patch['id']} does not exist.")
+            else:
+                rows[patch["id"]] = row
+                _apply(members[patch["id"]], patch)
+
+        patched = {pk: members[pk] for pk in rows}
+        for pk, reasons in _validate(patched, loaded_sexes).items():
+            errors[rows[pk]] += reasons
+
+        result.rejected = [
+            RejectedPatch(
+                row, patch.get("id") if isinstance(patch, dict) else None, errors[row]
+            )
+            for row, patch in enumerate(patches)
+            if errors[row]
+        ]
+        if result.rejected or dry_run:
+            return result
+
+        fields = {name for patch in patches for name in patch} - {"id"}
+        if fields & {"birth_date", "death_date"}:
+            fields.add("cached_age")
+        if fields & {"lastname", "family_name"}:
+            fields.add("family_name")
+        Member.objects.bulk_update(
+            patched.values(), sorted(fields), batch_size=batch_size
+        )
+        result.updated = len(patched)
+    return result
+
+
+def _patch_errors(patch) -> list[str]:
+    """Errors found in the patch alone, without queries."""
+    if not isinstance(patch, dict):
+        return ["Patch must be an object."]
+    errors = []
+    if not _is_id(patch.get("id")):
+        errors.append("id must be a member id.")
+    unknown = patch.keys() - {"id", *EDITABLE_FIELDS}
+    if unknown:
+        errors.append(f"Fields cannot be edited: {', '.join(sorted(unknown))}.")
+    for name, blank in TEXT_FIELDS.items():
+        if name in patch and not (
+            isinstance(patch[name], str) and (blank or patch[name].strip())
+        ):
+            errors.append(f"{name} must be a non-empty string.")
+    for name in NULLABLE_TEXT_FIELDS:
+        if patch.get(name) is not None and not isinstance(patch[name], str):
+            errors.append(f"{name} must be a string or null.")
+    for name in PARENT_ID_FIELDS:
+        if patch.get(name) is not None and not _is_id(patch[name]):
+            errors.append(f"{name} must be a member id or null.")
+    return errors
+
+
+def _is_id(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+def _apply(member: Member, patch: dict) -> None:
+    """Set the patched fields, normalized like Member.save() does."""
+    # family names default to the last name, corrections of the last name apply to both
+    follows_lastname = member.family_name.lower() == member.lastname.lower()
+    for name in EDITABLE_FIELDS:
+        if name in patch:
+            setattr(member, name, patch[name])
+    member.firstname = member.firstname.capitalize()
+    member.lastname = member.lastname.capitalize()
+    if not member.family_name or (
+        follows_lastname and "lastname" in patch and "family_name" not in patch
+    ):
+        member.family_name = member.lastname
+    else:
+        member.family_name = member.family_name.capitalize()
+    member.birth_date = member.birth_date or None
+    member.death_date = member.death_date or None
+    member._set_date_keys()
+    member.cached_age = age_from_keys(member.birth_date_key, member.death_date_key)
+
+
+def _validate(
+    patched: dict[int, Member], loaded_sexes: dict[int, str]
+) -> dict[int, list[str]]:
+    errors: dict[int, list[str]] = {pk: [] for pk in patched}
+    today_key, _ = date_sort_key(date.today().isoformat())
+    for pk, member in patched.items():
+        errors[pk] += _member_errors(member, today_key)
+    _validate_parents(patched, errors)
+    _validate_sex_changes(patched, loaded_sexes, errors)
+    _validate_ancestors(patched, errors)
+    return {pk: reasons for pk, reasons in errors.items() if reasons}
+
+
+def _member_errors(member: Member, today_key: int) -> list[str]:
+    """Checks of Member.clean() which need no queries."""
+    errors = []
+    if member.sex not in Member.Sex.values:
+        errors.append("Diversity not supported. Sex must be 'm' or 'f'")
+    for name in ("birth_date", "death_date"):
+        if getattr(member, name) and not getattr(member, f"{name}_key"):
+            errors.append(f"{name} must be in YYYY, YYYY-MM, or YYYY-MM-DD format.")
+    if member.birth_date_key > today_key:
+        errors.append("Birth date must be before today.")
+    if member.death_date_key and member.birth_date_key > member.death_date_key:
+        errors.append("Birth date must be before death date")
+    if member.father_id == member.pk:
+        errors.append("A member cannot be their own father.")
+    if member.mother_id == member.pk:
+        errors.append("A member cannot be their own mother.")
+    return errors
+
+
+def _validate_parents(patched: dict[int, Member], errors) -> None:
+    parent_ids = {
+        getattr(member, name) for member in patched.values() for name in PARENT_SEX
+    } - {None}
+    sexes = {pk: member.sex for pk, member in patched.items()}
+    sexes.update(
+        Member.objects.filter(pk__in=parent_ids - patched.keys()).values_list(
+            "id", "sex"
+        )
+    )
+    for pk, member in patched.items():
+        for name, sex in PARENT_SEX.items():
+            parent_id = getattr(member, name)
+            if parent_id and sexes.get(parent_id) != sex:
+                parent = name.removesuffix("_id")
+                errors[pk].append(
+                    f"Non-existent or invalid {parent}: {parent.capitalize()} must "
+                    f"exist and be {Member.Sex(sex).label.lower()}."
+                )
+
+
+def _validate_sex_changes(
+    patched: dict[int, Member], loaded_sexes: dict[int, str], errors
+) -> None:
+    """Members changing sex must not stay fathers/mothers or spouses of the same sex."""
+    changed = {
+        pk: member.sex
+        for pk, member in patched.items()
+        if member.sex != loaded_sexes[pk] and member.sex in Member.Sex.values
+    }
+    if not changed:
+        return
+    # children in the patches are checked against their new parents already
+    children = (
+        Member.objects.filter(Q(father_id__in=changed) | Q(mother_id__in=changed))
+        .exclude(pk__in=patched.keys())
+        .values_list("father_id", "mother_id")
+    )
+    for father_id, mother_id in children:
+        for parent_id, sex in ((father_id, "m"), (mother_id, "f")):
+            if changed.get(parent_id, sex) != sex:
+                message = f"{patched[parent_id]} cannot change sex, they are a parent."
+                if message not in errors[parent_id]:
+                    errors[parent_id].append(message)
+
+    spouses = MartialRelationship.objects.filter(
+        member_id__in=changed, married=True
+    ).select_related("spouse")
+    for relationship in spouses:
+        spouse = patched.get(relationship.spouse_id, relationship.spouse)
+        if changed[relationship.member_id] == spouse.sex:
+            errors[relationship.member_id].append(
+                "Same sex marriages are not allowed: "
+                f"{patched[relationship.member_id]} and {spouse}."
+            )
+
+
+def _validate_ancestors(patched: dict[int, Member], errors) -> None:
+    """
+    Reject members which would be their own ancestors or born before one of them, like
+    Member._validate_ancestor(). Ancestors of all new parents are read in one query and
+    walked with the patched parents in place of the stored ones.
+    """
+    parent_ids = {
+        getattr(member, name) for member in patched.values() for name in PARENT_SEX
+    } - {None}
+    if not parent_ids:
+        return
+    rows = Member.objects.filter(
+        pk__in=Member.objects.filter(pk__in=parent_ids).with_ancestors_pks()
+    ).values_list("id", "father_id", "mother_id", "birth_date_key")
+    tree = {pk: (father_id, mother_id, key) for pk, father_id, mother_id, key in rows}
+    names = {}
+    for pk, member in patched.items():
+        tree[pk] = (member.father_id, member.mother_id, member.birth_date_key)
+        names[pk] = repr(member)
+
+    for pk, member in patched.items():
+        if pk in (member.father_id, member.mother_id):
+            continue
+        latest_keys = [
+            latest_date_key(key, precision)
+            for key, precision in (
+                (member.birth_date_key, member.birth_date_precision),
+                (member.death_date_key, member.death_date_precision),
+            )
+            if key
+        ]
+        latest_key = min(latest_keys, default=0)
+        younger_ancestor = None
+        stack = [member.father_id, member.mother_id]
+        seen = set()
+        while stack:
+            ancestor_id = stack.pop()
+            if ancestor_id is None or ancestor_id in seen or ancestor_id not in tree:
+                continue
+            seen.add(ancestor_id)
+            if ancestor_id == pk:
+                errors[pk].append(
+                    f"Error: {member} would be their own ancestor, the parents are "
+                    "circullary connected!"
+                )
+                younger_ancestor = None
+                break
+            father_id, mother_id, birth_key = tree[ancestor_id]
+            if latest_key and birth_key > latest_key:
+                if younger_ancestor is None or birth_key > tree[younger_ancestor][2]:
+                    younger_ancestor = ancestor_id
+            stack += [father_id, mother_id]
+        if younger_ancestor is not None:
+            ancestor = names.get(younger_ancestor, f"member {younger_ancestor}")
+            errors[pk].append(
+                f"{member!r} cannot be older than it's ancestor {ancestor}!"
+            )
@@ -0,0 +1,111 @@
+from datetime import date, datetime
+from typing import Optional
+
+# Precision of a partial date, stored next to its sort key
+NO_DATE, YEAR, MONTH, DAY = 0, 1, 2, 3
+
+
+def parse_date(date_str: Optional[str]) -> Optional[date]:
+    """Parse date_str into a date object. Partial dates default to the start of the month/year."""
+    key, _ = date_sort_key(date_str)
+    return key_to_date(key)
+
+
+def date_sort_key(date_str: Optional[str]) -> tuple[int, int]:
+    """
+    Turn "YYYY", "YYYY-MM" or "YYYY-MM-DD" into a (YYYYMMDD, precision) pair.
+    Missing month/day are stored as 00, so partial dates sort before full dates of the same period.
+    Empty and invalid dates give (0, NO_DATE).
+    """
+    if not date_str:
+        return 0, NO_DATE
+    try:
+        match len(date_str):
+            case 4:
+                year, month, day, precision = int(date_str), 0, 0, YEAR
+            case 7 if date_str[4] == "-":
+                year, month, day = int(date_str[:4]), int(date_str[5:]), 0
+                precision = MONTH
+            case 10 if date_str[4] == date_str[7] == "-":
+                year, month, day = (
+                    int(date_str[:4]),
+                    int(date_str[5:7]),
+                    int(date_str[8:]),
+                )
+                precision = DAY
+            case _:
+                return 0, NO_DATE
+        date(year, month or 1, day or 1)  # validates the date
+    except ValueError:
+        return 0, NO_DATE
+    return year * 10000 + month * 100 + day, precision
+
+
+def latest_date_key(key: int, precision: int) -> int:
+    """Largest sort key a partial date can stand for, e.g. 18500000 (1850) -> 18509999."""
+    if not key:
+        return 0
+    return key + {YEAR: 9999, MONTH: 99}.get(precision, 0)
+
+
+def key_to_date(key: int) -> Optional[date]:
+    """Reverse of date_sort_key, partial dates default to the start of the month/year."""
+    if not key:
+        return None
+    return date(key // 10000, key // 100 % 100 or 1, key % 100 or 1)
+
+
+def calculate_age(
+    birth_date: Optional[str], death_date: Optional[str], today: Optional[date] = None
+) -> Optional[int]:
+    """
+    Calculate age based on birth_date and death_date.
+    The thicky part is that the age can be (in future versions) in different formats:
+    - yyyy-mm-dd
+    - yyyy-mm
+    - yyyy
+    Should display in years most of the time (but for now just full years will be enough):
+    if member.years < 2 then display in months
+    if member.years < 0 and member.months < 6 display in months with days
+    """
+    return _age_between(parse_date(birth_date), parse_date(death_date), today)
+
+
+def age_from_keys(
+    birth_date_key: int, death_date_key: int, today: Optional[date] = None
+) -> Optional[int]:
+    """Same as calculate_age, but using already parsed date sort keys."""
+    return _age_between(key_to_date(birth_date_key), key_to_date(death_date_key), today)
+
+
+def birthday_passed_between(birth_date: Optional[date], start: date, end: date) -> bool:
+    """Check if an anniversary of birth_date (which changes the age) is in (start, end]."""
+    if not birth_date:
+        return False
+    for year in range(start.year, end.year + 1):
+        try:
+            anniversary = birth_date.replace(year=year)
+        except ValueError:  # born on 29th of February, age changes on 1st of March
+            anniversary = date(year, 3, 1)
+        if start < anniversary <= end:
+            return True
+    return False
+
+
+def _age_between(
+    birth_date: Optional[date], death_date: Optional[date], today: Optional[date]
+) -> Optional[int]:
+    if not birth_date:
+        return None
+
+    # Use current date if no death_date
+    end_date = death_date or today or datetime.now().date()
+
+    # Calculate the difference in years, months, and days
+    age_years = end_date.year - birth_date.year
+    if end_date.month < birth_date.month or (
+        end_date.month == birth_date.month and end_date.day < birth_date.day
+    ):
+        age_years -= 1  # Adjust if birth date hasn't occurred yet this year
+
+    return age_years
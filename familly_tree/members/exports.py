@@ -0,0 +1,157 @@
+"""
+Streaming CSV and GEDCOM exports.
+
+Rows are read with chunked iterator() queries and yielded line by line to StreamingHttpResponse,
+so memory use does not depend on the size of the exported tree.
+"""
+
+import csv
+import heapq
+import itertools
+from typing import Iterator
+
+from django.db.models import Case, Exists, F, OuterRef, QuerySet, Value, When
+
+from .gedcom import format_date
+from .models import MartialRelationship, Member
+
+CHUNK_SIZE = 2000
+
+MEMBER_CSV_FIELDS = [
+    "id",
+    "firstname",
+    "lastname",
+    "family_name",
+    "sex",
+    "birth_date",
+    "death_date",
+    "father_id",
+    "mother_id",
+    "description",
+]
+MARRIAGE_CSV_FIELDS = ["member_id", "spouse_id", "married"]
+
+
+class Echo:
+    """File-like object returning written value, so csv.writer can feed a generator."""
+
+    def write(self, value):
+        return value
+
+
+def member_csv_rows(members: QuerySet) -> Iterator[str]:
+    writer = csv.writer(Echo())
+    yield writer.writerow(MEMBER_CSV_FIELDS)
+    rows = members.order_by("id").values_list(*MEMBER_CSV_FIELDS)
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield writer.writerow(row)
+
+
+def marriage_csv_rows(members: QuerySet) -> Iterator[str]:
+    writer = csv.writer(Echo())
+    yield writer.writerow(MARRIAGE_CSV_FIELDS)
+    for row in _marriages(members).iterator(chunk_size=CHUNK_SIZE):
+        yield writer.writerow(row)
+
+
+def gedcom_lines(members: QuerySet) -> Iterator[str]:
+    yield from [
+        "0 HEAD\n",
+        "1 SOUR FamilyTree\n",
+        "1 GEDC\n",
+        "2 VERS 5.5.1\n",
+        "2 FORM LINEAGE-LINKED\n",
+        "1 CHAR UTF-8\n",
+    ]
+    rows = members.order_by("id").values_list(
+        "id",
+        "firstname",
+        "lastname",
+        "sex",
+        "birth_date",
+        "death_date",
+        "description",
+    )
+    for member_id, firstname, lastname, sex, birth, death, description in rows.iterator(
+        chunk_size=CHUNK_SIZE
+    ):
+        yield f"0 @I{member_id}@ INDI\n"
+        yield f"1 NAME {firstname} /{lastname}/\n"
+        yield f"2 GIVN {firstname}\n"
+        yield f"2 SURN {lastname}\n"
+        yield f"1 SEX {sex.upper()}\n"
+        for tag, value in (("BIRT", birth), ("DEAT", death)):
+            if value:
+                yield f"1 {tag}\n2 DATE {format_date(value)}\n"
+        if description:
+            first_line, *other_lines = description.splitlines() or [""]
+            yield f"1 NOTE {first_line}\n"
+            for line in other_lines:
+                yield f"2 CONT {line}\n"
+
+    yield from _family_lines(members)
+    yield "0 TRLR\n"
+
+
+def _marriages(members: QuerySet) -> QuerySet:
+    exported = members.order_by().values("pk")
+    return (
+        MartialRelationship.objects.filter(member__in=exported, spouse__in=exported)
+        .order_by("member_id", "spouse_id")
+        .values_list(*MARRIAGE_CSV_FIELDS)
+    )
+
+
+def _family_lines(members: QuerySet) -> Iterator[str]:
+    """
+    GEDCOM families join couples with their children. Both children (ordered by parents)
+    and marriages (ordered by husband and wife) are streamed sorted by the same key,
+    merged and grouped, so no family has to be kept in memory. Parents which are not
+    exported are left out of the key (0) in SQL, so children stay sorted by it.
+    """
+    exported = members.order_by().values("pk")
+    children = (
+        members.exclude(father__isnull=True, mother__isnull=True)
+        .annotate(
+            husband=_exported_parent("father_id", exported),
+            wife=_exported_parent("mother_id", exported),
+        )
+        # children of members who are not exported do not form families
+        .exclude(husband=0, wife=0)
+        .order_by("husband", "wife", "id")
+        .values_list("husband", "wife", "id")
+    )
+    marriages = _marriages(members).filter(member__sex=Member.Sex.MALE)
+
+    def child_entries():
+        for husband, wife, child_id in children.iterator(chunk_size=CHUNK_SIZE):
+            yield (husband, wife), child_id, None
+
+    def marriage_entries():
+        for husband, wife, married in marriages.iterator(chunk_size=CHUNK_SIZE):
+            yield (husband, wife), None, married
+
+    entries = heapq.merge(
+        child_entries(), marriage_entries(), key=lambda entry: entry[0]
+    )
+    for family_number, ((husband, wife), family) in enumerate(
+        itertools.groupby(entries, key=lambda entry: entry[0]), start=1
+    ):
+        yield f"0 @F{family_number}@ FAM\n"
+        if husband:
+            yield f"1 HUSB @I{husband}@\n"
+        if wife:
+            yield f"1 WIFE @I{wife}@\n"
+        for _, child_id, married in family:
+            if child_id:
+                yield f"1 CHIL @I{child_id}@\n"
+            elif married is False:
+                yield "1 DIV Y\n"
+
+
+def _exported_parent(field: str, exported: QuerySet) -> Case:
+    """The parent id if the parent is exported, 0 otherwise."""
+    return Case(
+        When(Exists(exported.filter(pk=OuterRef(field))), then=F(field)),
+        default=Value(0),
+    )
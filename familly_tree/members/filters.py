@@ -1,5 +1,4 @@
 import django_filters
-from django.db.models import Count, Q
 
 from .models import Member
 
@@ -27,16 +26,17 @@ class MemberFilter(django_filters.FilterSet):
 
     age_range = django_filters.RangeFilter(method="filter_age_range", label="Age Range")
 
+    birth_year_range = django_filters.RangeFilter(
+        method="filter_birth_year_range", label="Birth Year Range"
+    )
+
     def filter_children_count_range(self, queryset, name, value):
-        queryset = queryset.annotate(
-            num_children=Count("children_father") + Count("children_mother")
-        )
         if value:
             min_value, max_value = value.start, value.stop
             if min_value is not None:
-                queryset = queryset.filter(num_children__gte=min_value)
+                queryset = queryset.filter(children_count__gte=min_value)
             if max_value is not None:
-                queryset = queryset.filter(num_children__lte=max_value)
+                queryset = queryset.filter(children_count__lte=max_value)
 
         return queryset
 
@@ -50,18 +50,25 @@ class MemberFilter(django_filters.FilterSet):
 
         return queryset
 
+    def filter_birth_year_range(self, queryset, name, value):
+        if value:
+            min_value, max_value = value.start, value.stop
+            if min_value is not None:
+                queryset = queryset.filter(birth_date_key__gte=int(min_value) * 10000)
+            if max_value is not None:
+                queryset = queryset.filter(
+                    birth_date_key__gt=0,
+                    birth_date_key__lte=int(max_value) * 10000 + 9999,
+                )
+
+        return queryset
+
     class Meta:
         model = Member
         fields = ["name", "sex", "alive", "children_count_range"]
 
     def filter_name(self, queryset, name, value):
-        cleaned_value = value.title()
-        returned_data = queryset.filter(
-            Q(firstname__icontains=cleaned_value)
-            | Q(lastname__icontains=cleaned_value)
-            | Q(family_name__icontains=cleaned_value)
-        )
-        return returned_data
+        return queryset.search(value)
 
     def filter_alive(self, queryset, name, value):
         if value == "true":
@@ -1,18 +1,62 @@
+from urllib.parse import urlencode
+
 from django import forms
+from django.urls import reverse
 
 from .models import MartialRelationship, Member
 
 
+class MemberAutocomplete(forms.Widget):
+    """
+    Picker of one member: a search box filled from the api_member_search endpoint, page by
+    page, and a hidden input with the chosen id. Pages stay small on any tree size.
+    params narrow the results, e.g. {"sex": "m", "born_before": "1900"}.
+    """
+
+    template_name = "widgets/member_autocomplete.html"
+
+    class Media:
+        js = ["autocomplete.js"]
+
+    def __init__(self, params=None, attrs=None):
+        super().__init__(attrs)
+        self.params = params or {}
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        params = {key: value for key, value in self.params.items() if value}
+        context["widget"][
+            "url"
+        ] = f"{reverse('members:api_member_search')}?{urlencode(params)}"
+        context["widget"]["label"] = self._label(context["widget"]["value"])
+        return context
+
+    @staticmethod
+    def _label(value) -> str:
+        if not value or not str(value).isdigit():
+            return ""
+        member = Member.objects.only("firstname", "lastname").filter(pk=value).first()
+        return str(member) if member else ""
+
+
 class MemberForm(forms.ModelForm):
     class Meta:
         model = Member
-        exclude = ["cached_age"]
+        exclude = ["cached_age", "children_count"]
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
         self.fields["father"].queryset = Member.objects.filter(sex=Member.Sex.MALE)
         self.fields["mother"].queryset = Member.objects.filter(sex=Member.Sex.FEMALE)
+        # parents cannot be younger than the member (save() validates the whole line)
+        params = {"exclude": self.instance.pk, "born_before": self.instance.birth_date}
+        self.fields["father"].widget = MemberAutocomplete(
+            {"sex": Member.Sex.MALE, **params}
+        )
+        self.fields["mother"].widget = MemberAutocomplete(
+            {"sex": Member.Sex.FEMALE, **params}
+        )
 
 
 class MarryMemberForm(forms.ModelForm):
@@ -26,3 +70,38 @@ class MarryMemberForm(forms.ModelForm):
 
         # Exclude the member from the spouse selection and any current spouses
         self.fields["spouse"].queryset = Member.objects.exclude(pk=member.pk)
+        opposite_sex = (
+            Member.Sex.FEMALE if member.sex == Member.Sex.MALE else Member.Sex.MALE
+        )
+        self.fields["spouse"].widget = MemberAutocomplete(
+            {"exclude": member.pk, "sex": opposite_sex, "single": "1"}
+        )
+
+
+class ChooseChildForm(forms.Form):
+    child = forms.ModelChoiceField(queryset=Member.objects.none())
+
+    def __init__(self, *args, parent: Member, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Filter out the parent (itself) and members born before itself
+        queryset = Member.objects.exclude(pk=parent.pk)
+        params = {"exclude": parent.pk}
+        if parent.birth_date_key:
+            queryset = queryset.born_after(parent.birth_date_key)
+            params["born_after"] = parent.birth_date
+        self.fields["child"].queryset = queryset
+        self.fields["child"].widget = MemberAutocomplete(params)
+
+
+class GedcomUploadForm(forms.Form):
+    file = forms.FileField(label="GEDCOM file")
+
+
+class RelationshipForm(forms.Form):
+    member = forms.IntegerField(
+        label="Member", min_value=1, widget=MemberAutocomplete()
+    )
+    other = forms.IntegerField(
+        label="Relative", min_value=1, widget=MemberAutocomplete()
+    )
@@ -0,0 +1,367 @@
+"""
+Streaming GEDCOM 5.5 import.
+
+Records are parsed one at a time and individuals are inserted with bulk_create in batches,
+so only the xref -> primary key map and compact family tuples are kept in memory.
+Parents and marriages are wired in a second bulk pass, and validations which Member.save()
+runs per row are done set-wise at the end, in a few queries per batch of imported members
+(cycles of parent links in memory).
+"""
+
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Iterable, Iterator, Optional
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+
+from .dates import age_from_keys, date_sort_key
+from .models import MAX_REPORTED_ERRORS, MartialRelationship, Member
+
+MONTHS = {
+    month: number
+    for number, month in enumerate(
+        "JAN FEB MAR APR MAY JUN JUL AUG SEP OCT NOV DEC".split(), start=1
+    )
+}
+MONTH_NAMES = {number: month for month, number in MONTHS.items()}
+DATE_QUALIFIERS = {"ABT", "CAL", "EST", "BEF", "AFT", "FROM", "TO", "BET", "INT"}
+
+
+@dataclass
+class GedcomRecord:
+    """Level 0 record with its sub-lines flattened to dotted tag paths, e.g. "BIRT.DATE"."""
+
+    tag: str
+    xref: str
+    values: dict[str, str] = field(default_factory=dict)
+    lists: dict[str, list[str]] = field(default_factory=dict)
+
+    def add(self, path: str, value: str) -> None:
+        self.values.setdefault(path, value)
+        self.lists.setdefault(path, []).append(value)
+
+
+@dataclass
+class ImportResult:
+    members: int = 0
+    families: int = 0
+    marriages: int = 0
+    seconds: float = 0.0
+
+
+def read_records(lines: Iterable[str]) -> Iterator[GedcomRecord]:
+    """Parse GEDCOM lines lazily, yielding one level 0 record at a time."""
+    record = None
+    path: list[str] = []
+    for raw_line in lines:
+        line = raw_line.strip().lstrip("\ufeff")
+        if not line:
+            continue
+        level, _, rest = line.partition(" ")
+        if not level.isdigit():
+            continue
+        level = int(level)
+
+        if level == 0:
+            if record:
+                yield record
+            record = None
+            xref, _, tag = rest.partition(" ")
+            if xref.startswith("@") and tag.split(" ")[0] in ("INDI", "FAM"):
+                record = GedcomRecord(tag.split(" ")[0], xref)
+            continue
+        if record is None:
+            continue
+
+        tag, _, value = rest.partition(" ")
+        parent_level = level - 1
+        del path[parent_level:]
+        if tag in ("CONT", "CONC") and path:
+            parent_path = ".".join(path)
+            separator = "\n" if tag == "CONT" else ""
+            record.values[parent_path] = (
+                record.values.get(parent_path, "") + separator + value
+            )
+            continue
+        path.append(tag)
+        record.add(".".join(path), value)
+
+    if record:
+        yield record
+
+
+def convert_date(value: Optional[str]) -> Optional[str]:
+    """
+    Convert GEDCOM date ("12 MAR 1850", "MAR 1850", "ABT 1850") to YYYY, YYYY-MM or YYYY-MM-DD.
+    Qualifiers are dropped and ranges use their first date. Unknown formats give None.
+    """
+    if not value:
+        return None
+    parts = [part for part in value.upper().split() if part not in DATE_QUALIFIERS]
+    if "AND" in parts:
+        parts = parts[: parts.index("AND")]
+    try:
+        match parts:
+            case [year]:
+                return f"{int(year):04d}"
+            case [month, year] if month in MONTHS:
+                return f"{int(year):04d}-{MONTHS[month]:02d}"
+            case [day, month, year, *_] if month in MONTHS:
+                return f"{int(year):04d}-{MONTHS[month]:02d}-{int(day):02d}"
+    except ValueError:
+        pass
+    return None
+
+
+def format_date(value: Optional[str]) -> Optional[str]:
+    """Reverse of convert_date: YYYY-MM-DD -> "12 MAR 1850"."""
+    if not value:
+        return None
+    year, _, rest = value.partition("-")
+    month, _, day = rest.partition("-")
+    parts = [str(int(day))] if day else []
+    if month:
+        parts.append(MONTH_NAMES[int(month)])
+    parts.append(str(int(year)))
+    return " ".join(parts)
+
+
+def parse_name(record: GedcomRecord) -> tuple[str, str]:
+    """Return (firstname, lastname) from GIVN/SURN or from the "Jan /Kowalski/" NAME value."""
+    name = record.values.get("NAME", "")
+    given, _, rest = name.partition("/")
+    surname = rest.partition("/")[0]
+    firstname = record.values.get("NAME.GIVN") or given.strip()
+    lastname = record.values.get("NAME.SURN") or surname.strip()
+    return firstname, lastname
+
+
+class GedcomImporter:
+    def __init__(self, batch_size: int = 2000):
+        self.batch_size = batch_size
+        self.errors: list[str] = []
+        self._member_ids: dict[str, int] = {}
+        # (husband xref, wife xref, children xrefs, divorced)
+        self._families: list[tuple[Optional[str], Optional[str], tuple, bool]] = []
+        self._pending: list[tuple[str, Member]] = []
+        # child id -> (father id, mother id), for the cycle check
+        self._parents: dict[int, tuple[Optional[int], Optional[int]]] = {}
+        self._today_key = date_sort_key(date.today().isoformat())[0]
+
+    def run(self, lines: Iterable[str]) -> ImportResult:
+        started = time.perf_counter()
+        result = ImportResult()
+        with transaction.atomic():
+            for record in read_records(lines):
+                if record.tag == "INDI":
+                    self._pending.append((record.xref, self._build_member(record)))
+                    if len(self._pending) >= self.batch_size:
+                        self._flush_members()
+                else:
+                    self._families.append(self._build_family(record))
+            if self._pending:
+                self._flush_members()
+            if not self._member_ids:
+                raise ValidationError("No individuals found in the GEDCOM file.")
+
+            result.members = len(self._member_ids)
+            result.families = len(self._families)
+            self._link_parents()
+            result.marriages = self._create_marriages()
+            self._validate()
+        result.seconds = time.perf_counter() - started
+        return result
+
+    def _build_member(self, record: GedcomRecord) -> Member:
+        firstname, lastname = parse_name(record)
+        birth_date = convert_date(record.values.get("BIRT.DATE"))
+        death_date = convert_date(record.values.get("DEAT.DATE"))
+        member = Member(
+            firstname=firstname.capitalize(),
+            lastname=lastname.capitalize(),
+            family_name=lastname.capitalize(),
+            sex=record.values.get("SEX", "").lower()[:1],
+            birth_date=birth_date,
+            death_date=death_date,
+            description=record.values.get("NOTE") or None,
+        )
+        for label, value in (("birth", birth_date), ("death", death_date)):
+            if value and not date_sort_key(value)[0]:
+                self._error(f"{record.xref}: invalid {label} date {value}.")
+        member._set_date_keys()
+        member.cached_age = age_from_keys(member.birth_date_key, member.death_date_key)
+        return member
+
+    @staticmethod
+    def _build_family(record: GedcomRecord) -> tuple:
+        return (
+            record.values.get("HUSB"),
+            record.values.get("WIFE"),
+            tuple(record.lists.get("CHIL", ())),
+            "DIV" in record.values,
+        )
+
+    def _flush_members(self) -> None:
+        xrefs, members = zip(*self._pending)
+        created = Member.objects.bulk_create(members)
+        self._member_ids.update(zip(xrefs, (member.pk for member in created)))
+        self._pending = []
+
+    def _link_parents(self) -> None:
+        linked, batch = set(), []
+        for husband, wife, children, _ in self._families:
+            father_id = self._member_ids.get(husband)
+            mother_id = self._member_ids.get(wife)
+            for child in children:
+                child_id = self._member_ids.get(child)
+                if child_id is None or child_id in linked:
+                    continue
+                linked.add(child_id)
+                self._parents[child_id] = (father_id, mother_id)
+                batch.append(
+                    Member(pk=child_id, father_id=father_id, mother_id=mother_id)
+                )
+                if len(batch) >= self.batch_size:
+                    Member.objects.bulk_update(batch, ["father_id", "mother_id"])
+                    batch = []
+        if batch:
+            Member.objects.bulk_update(batch, ["father_id", "mother_id"])
+
+    def _create_marriages(self) -> int:
+        """
+        Create both sides of every marriage. Members can have only one current spouse,
+        so when someone marries again without a divorce record the earlier marriage is ended.
+        Families of the same couple (also with HUSB and WIFE swapped) make one marriage,
+        the last of them tells whether it lasts.
+        """
+        couples: dict[tuple[int, int], bool] = {}
+        current: dict[int, tuple[int, int]] = {}
+        for husband, wife, _, divorced in self._families:
+            husband_id = self._member_ids.get(husband)
+            wife_id = self._member_ids.get(wife)
+            if husband_id is None or wife_id is None:
+                continue
+            if husband_id == wife_id:
+                self._error(f"{husband} cannot marry themselves.")
+                continue
+            couple = (min(husband_id, wife_id), max(husband_id, wife_id))
+            couples[couple] = not divorced
+            if divorced:
+                continue
+            for member_id in couple:
+                previous = current.get(member_id)
+                if previous and previous != couple:
+                    couples[previous] = False
+                current[member_id] = couple
+
+        relationships = []
+        for (member_id, spouse_id), married in couples.items():
+            relationships += [
+                MartialRelationship(
+                    member_id=member_id, spouse_id=spouse_id, married=married
+                ),
+                MartialRelationship(
+                    member_id=spouse_id, spouse_id=member_id, married=married
+                ),
+            ]
+            if len(relationships) >= self.batch_size:
+                MartialRelationship.objects.bulk_create(relationships)
+                relationships = []
+        MartialRelationship.objects.bulk_create(relationships)
+        return len(couples)
+
+    def _validate(self) -> None:
+        # ids of the import, not a primary key range, other members can be inserted meanwhile
+        ids = sorted(self._member_ids.values())
+        for start in range(0, len(ids), self.batch_size):
+            end = start + self.batch_size
+            self._validate_batch(ids[start:end])
+            if len(self.errors) >= MAX_REPORTED_ERRORS:
+                break
+        self._validate_cycles()
+        if self.errors:
+            raise ValidationError(self.errors[:MAX_REPORTED_ERRORS])
+
+    def _validate_batch(self, ids: list[int]) -> None:
+        imported = Member.objects.filter(pk__in=ids)
+        checks = [
+            (
+                imported.exclude(sex__in=Member.Sex.values),
+                "{} has invalid sex, must be 'm' or 'f'.",
+            ),
+            (
+                imported.filter(birth_date_key__gt=self._today_key),
+                "{} birth date must be before today.",
+            ),
+            (
+                imported.filter(
+                    death_date_key__gt=0, birth_date_key__gt=F("death_date_key")
+                ),
+                "{} birth date must be before death date.",
+            ),
+            (
+                imported.exclude(father__sex=Member.Sex.MALE).filter(
+                    father__isnull=False
+                ),
+                "{} father must be male.",
+            ),
+            (
+                imported.exclude(mother__sex=Member.Sex.FEMALE).filter(
+                    mother__isnull=False
+                ),
+                "{} mother must be female.",
+            ),
+        ]
+        for queryset, message in checks:
+            for member in queryset[:MAX_REPORTED_ERRORS]:
+                self._error(message.format(repr(member)))
+        same_sex = MartialRelationship.objects.filter(
+            member__in=ids, member__sex=F("spouse__sex")
+        ).select_related("member", "spouse")
+        for relationship in same_sex[:MAX_REPORTED_ERRORS]:
+            self._error(f"Same sex marriages are not allowed: {relationship}.")
+
+    def _validate_cycles(self) -> None:
+        """
+        Reject members which are their own ancestors (FAMC loops), which Member.save()
+        does not allow. Imported members only have imported parents, so the parent links
+        kept by _link_parents() are walked in memory.
+        """
+        # False while the member's ancestors are walked, True when done
+        state: dict[int, bool] = {}
+        cycles = []
+        for member_id in self._parents:
+            if member_id in state:
+                continue
+            state[member_id] = False
+            stack = [(member_id, self._parent_ids(member_id))]
+            while stack:
+                child_id, parent_ids = stack[-1]
+                parent_id = next(parent_ids, None)
+                if parent_id is None:
+                    state[child_id] = True
+                    stack.pop()
+                elif parent_id not in state:
+                    state[parent_id] = False
+                    stack.append((parent_id, self._parent_ids(parent_id)))
+                elif state[parent_id] is False:
+                    cycles.append((child_id, parent_id))
+        if not cycles:
+            return
+        members = Member.objects.in_bulk(
+            {pk for cycle in cycles[:MAX_REPORTED_ERRORS] for pk in cycle}
+        )
+        for child_id, parent_id in cycles[:MAX_REPORTED_ERRORS]:
+            self._error(
+                f"Error: {members[child_id]} and {members[parent_id]} are "
+                "circullary connected!"
+            )
+
+    def _parent_ids(self, member_id: int) -> Iterator[int]:
+        return (pk for pk in self._parents.get(member_id, ()) if pk is not None)
+
+    def _error(self, message: str) -> None:
+        self.errors.append(message)
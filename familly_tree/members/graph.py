@@ -0,0 +1,263 @@
+"""
+Process-wide compact FamilyGraph used by traversals (e.g. relationships) instead of the ORM.
+
+Members are addressed by dense positions in the sorted ids array. Parents are stored in
+array-backed vectors, children in CSR form (offsets into one flat array) derived from them,
+and marriages as pairs of positions, so a 1M member tree takes a few tens of MB.
+
+The graph is cached per process under TreeVersion.key. Writes made by this process patch
+a copy of the cached graph on commit, when it was up to date before them, and replace the
+cached one with it, so graphs handed out to readers never change. Anything else (writes of
+other workers, bulk operations, deletes) makes the next get_family_graph() rebuild it.
+"""
+
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Optional
+
+from django.db import transaction
+from django.dispatch import receiver
+
+from .models import (MartialRelationship, Member, TreeVersion,
+                     tree_version_bumped)
+
+NO_PARENT = -1
+CHUNK_SIZE = 5000
+
+
+class FamilyGraph:
+    def __init__(self):
+        self.ids = array("q")
+        self.father = array("i")
+        self.mother = array("i")
+        self.male = bytearray()
+        # one entry per MartialRelationship row, so every marriage is stored in both directions
+        self.pair_member = array("i")
+        self.pair_spouse = array("i")
+        self.pair_married = bytearray()
+        self._children: Optional[tuple[array, array]] = None
+        self._spouse_pairs: Optional[tuple[array, array]] = None
+
+    @classmethod
+    def load(cls) -> "FamilyGraph":
+        graph = cls()
+        rows = Member.objects.order_by("id").values_list(
+            "id", "father_id", "mother_id", "sex"
+        )
+        parent_ids = array("q")
+        for member_id, father_id, mother_id, sex in rows.iterator(
+            chunk_size=CHUNK_SIZE
+        ):
+            graph.ids.append(member_id)
+            graph.male.append(sex == Member.Sex.MALE)
+            parent_ids.append(father_id or 0)
+            parent_ids.append(mother_id or 0)
+        # parents can only be resolved to positions once every id is known
+        for position, parent_id in enumerate(parent_ids):
+            parents = graph.mother if position % 2 else graph.father
+            parents.append(graph.position(parent_id) if parent_id else NO_PARENT)
+
+        marriages = MartialRelationship.objects.order_by("id").values_list(
+            "member_id", "spouse_id", "married"
+        )
+        for member_id, spouse_id, married in marriages.iterator(chunk_size=CHUNK_SIZE):
+            member, spouse = graph.position(member_id), graph.position(spouse_id)
+            # members committed after they were read, the next version reloads them
+            if member is None or spouse is None:
+                continue
+            graph.pair_member.append(member)
+            graph.pair_spouse.append(spouse)
+            graph.pair_married.append(married)
+        return graph
+
+    def copy(self) -> "FamilyGraph":
+        """
+        Copy of the graph which can be patched without affecting readers of this one.
+        CSR indexes are shared, they are only ever replaced, never changed.
+        """
+        graph = FamilyGraph()
+        for name in (
+            "ids",
+            "father",
+            "mother",
+            "male",
+            "pair_member",
+            "pair_spouse",
+            "pair_married",
+        ):
+            setattr(graph, name, getattr(self, name)[:])
+        graph._children, graph._spouse_pairs = self._children, self._spouse_pairs
+        return graph
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def position(self, member_id: int) -> Optional[int]:
+        position = bisect_left(self.ids, member_id)
+        if position < len(self.ids) and self.ids[position] == member_id:
+            return position
+        return None
+
+    def parents(self, position: int) -> tuple[int, ...]:
+        return tuple(
+            parent
+            for parent in (self.father[position], self.mother[position])
+            if parent != NO_PARENT
+        )
+
+    def children(self, position: int) -> array:
+        offsets, children = self._children_csr()
+        start, end = offsets[position], offsets[position + 1]
+        return children[start:end]
+
+    def spouses(self, position: int) -> list[tuple[int, bool]]:
+        offsets, pairs = self._spouses_csr()
+        start, end = offsets[position], offsets[position + 1]
+        return [
+            (self.pair_spouse[pair], bool(self.pair_married[pair]))
+            for pair in pairs[start:end]
+        ]
+
+    def patch(self, change: tuple) -> bool:
+        """
+        Apply a change described by TreeVersion.bump(), False if the graph has to be rebuilt.
+        Changes the graph in place, patch a copy() of graphs which may be in use.
+        """
+        kind, *values = change
+        if kind == "member":
+            return self._patch_member(*values)
+        if kind == "marriage":
+            return self._patch_marriage(*values)
+        return False
+
+    def _patch_member(self, member_id, father_id, mother_id, sex) -> bool:
+        parents = [
+            self.position(pid) if pid else NO_PARENT for pid in (father_id, mother_id)
+        ]
+        if None in parents:
+            return False
+        position = self.position(member_id)
+        if position is None:
+            # new members are appended, so ids stay sorted
+            if self.ids and member_id < self.ids[-1]:
+                return False
+            self.ids.append(member_id)
+            self.father.append(NO_PARENT)
+            self.mother.append(NO_PARENT)
+            self.male.append(False)
+            position = len(self.ids) - 1
+            # no children or marriages yet, indexes only get an empty slot
+            self._children = _with_empty_owner(self._children)
+            self._spouse_pairs = _with_empty_owner(self._spouse_pairs)
+        if [self.father[position], self.mother[position]] != parents:
+            self.father[position], self.mother[position] = parents
+            self._children = None
+        self.male[position] = sex == Member.Sex.MALE
+        return True
+
+    def _patch_marriage(self, member_id, spouse_id, married) -> bool:
+        member, spouse = self.position(member_id), self.position(spouse_id)
+        if member is None or spouse is None:
+            return False
+        offsets, pairs = self._spouses_csr()
+        start, end = offsets[member], offsets[member + 1]
+        for pair in pairs[start:end]:
+            if self.pair_spouse[pair] == spouse:
+                self.pair_married[pair] = married
+                return True
+        self.pair_member.append(member)
+        self.pair_spouse.append(spouse)
+        self.pair_married.append(married)
+        self._spouse_pairs = None
+        return True
+
+    def _children_csr(self) -> tuple[array, array]:
+        if self._children is None:
+
+            def edges():
+                for parents in (self.father, self.mother):
+                    for child, parent in enumerate(parents):
+                        if parent != NO_PARENT:
+                            yield child, parent
+
+            self._children = _csr(len(self.ids), edges)
+        return self._children
+
+    def _spouses_csr(self) -> tuple[array, array]:
+        if self._spouse_pairs is None:
+            self._spouse_pairs = _csr(
+                len(self.ids), lambda: enumerate(self.pair_member)
+            )
+        return self._spouse_pairs
+
+
+def _csr(size: int, edges) -> tuple[array, array]:
+    """
+    Group (value, owner) pairs yielded by edges() by owner: values of owner are
+    targets[offsets[owner]:offsets[owner + 1]], in the order of edges.
+    Edges are generated twice (counting and filling) instead of being kept in a list.
+    """
+    offsets = array("i", bytes(4 * (size + 1)))
+    for _, owner in edges():
+        offsets[owner + 1] += 1
+    for owner in range(size):
+        offsets[owner + 1] += offsets[owner]
+    targets = array("i", bytes(4 * offsets[size]))
+    cursor = offsets[:-1]
+    for value, owner in edges():
+        targets[cursor[owner]] = value
+        cursor[owner] += 1
+    return offsets, targets
+
+
+def _with_empty_owner(csr: Optional[tuple[array, array]]):
+    """CSR index with one more owner without values, a new one as indexes can be shared."""
+    if csr is None:
+        return None
+    offsets, targets = csr
+    return offsets + array("i", [offsets[-1]]), targets
+
+
+class _GraphCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key: Optional[tuple] = None
+        self._graph: Optional[FamilyGraph] = None
+
+    def get(self) -> FamilyGraph:
+        key = TreeVersion.current().key
+        with self._lock:
+            if self._graph is None or self._key != key:
+                # one transaction, so members and marriages are read from the same state
+                with transaction.atomic():
+                    key = TreeVersion.current().key
+                    self._graph, self._key = FamilyGraph.load(), key
+            return self._graph
+
+    def patch(self, previous: tuple, current: tuple, changes: Optional[list]) -> None:
+        with self._lock:
+            if self._graph is None or self._key != previous:
+                return
+            graph = self._graph.copy() if changes else None
+            if graph is not None and all(graph.patch(change) for change in changes):
+                self._graph, self._key = graph, current
+            else:
+                self._graph, self._key = None, None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._graph, self._key = None, None
+
+
+_cache = _GraphCache()
+
+
+def get_family_graph() -> FamilyGraph:
+    """Return the process-wide FamilyGraph, rebuilding it if members or marriages changed."""
+    return _cache.get()
+
+
+@receiver(tree_version_bumped)
+def patch_cached_graph(sender, previous, current, changes, using, **kwargs):
+    transaction.on_commit(lambda: _cache.patch(previous, current, changes), using=using)
@@ -0,0 +1,98 @@
+"""
+Recursive CTE queries walking parent links (ancestors) or child links (descendants).
+
+lineage_sql() returns "SELECT id, generation" rows for all relatives of the seed members,
+generation being the smallest number of parent links between them (1 = parents/children).
+MemberQuerySet.ancestors()/descendants() filter members by it and annotate the generation
+with LineageGeneration, so both stay plain querysets which can be filtered, counted, combined
+and paginated. The lineage does not depend on the outer row, so SQLite builds it once per
+query (with an automatic index for the generation lookups), not once per member.
+"""
+
+from typing import Optional
+
+from django.db.models import Expression, F, IntegerField
+
+# Walks stop after this many generations even without max_depth, so cyclic data cannot
+# make the recursive query run forever.
+MAX_GENERATIONS = 1000
+
+_STEPS = {
+    # child row is already in lineage, join its parents
+    "ancestors": (
+        "JOIN {table} child ON child.id = lineage.id "
+        "JOIN {table} relative ON relative.id IN (child.father_id, child.mother_id)"
+    ),
+    # parent row is already in lineage, join its children
+    "descendants": (
+        "JOIN {table} relative "
+        "ON relative.father_id = lineage.id OR relative.mother_id = lineage.id"
+    ),
+}
+
+
+def lineage_sql(table: str, seed_sql: str, direction: str) -> str:
+    """
+    SQL of relatives of members selected by seed_sql (a query returning their ids),
+    with one placeholder for the depth limit.
+    """
+    step = _STEPS[direction].format(table=table)
+    return (
+        "WITH RECURSIVE lineage(id, generation) AS ("
+        f"SELECT id, 0 FROM {table} WHERE id IN ({seed_sql}) "
+        "UNION "
+        f"SELECT relative.id, lineage.generation + 1 FROM lineage {step} "
+        "WHERE lineage.generation < %s"
+        ") "
+        "SELECT id, MIN(generation) AS generation FROM lineage "
+        "WHERE generation > 0 GROUP BY id"
+    )
+
+
+def lineage_ids_sql(table: str, seed_sql: str, direction: str) -> str:
+    """
+    SQL of ids of the seed members and all their relatives, without generations.
+    Every member is visited once, while lineage_sql() visits a member once per distinct
+    generation it can be reached at, which adds up when pedigrees collapse (cousin marriages).
+    """
+    step = _STEPS[direction].format(table=table)
+    return (
+        "WITH RECURSIVE lineage(id) AS ("
+        f"SELECT id FROM {table} WHERE id IN ({seed_sql}) "
+        "UNION "
+        f"SELECT relative.id FROM lineage {step}"
+        ") "
+        "SELECT id FROM lineage"
+    )
+
+
+def depth_limit(max_depth: Optional[int]) -> int:
+    if max_depth is None:
+        return MAX_GENERATIONS
+    return min(max_depth, MAX_GENERATIONS)
+
+
+class LineageGeneration(Expression):
+    """
+    Generation of the current row in lineage, or NULL if it is not there.
+    Refers to the row through F("pk"), so it stays correct when the queryset is relabeled
+    (e.g. used as a subquery).
+    """
+
+    output_field = IntegerField()
+
+    def __init__(self, sql: str, params: list):
+        super().__init__()
+        self.sql, self.params = sql, params
+        self.pk = F("pk")
+
+    def get_source_expressions(self):
+        return [self.pk]
+
+    def set_source_expressions(self, exprs):
+        (self.pk,) = exprs
+
+    def as_sql(self, compiler, connection):
+        pk_sql, pk_params = compiler.compile(self.pk)
+        sql = f"(SELECT related.generation FROM ({self.sql}) related WHERE related.id = {pk_sql})"
+        return sql, [*self.params, *pk_params]
@@ -0,0 +1,54 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from members.bulk_edit import bulk_edit_members
+
+
+class Command(BaseCommand):
+    help = (
+        "Edit many members at once from a JSON file with a list of patches, e.g. "
+        '[{"id": 1, "lastname": "Smith", "death_date": "1950"}].'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path to the .json file (UTF-8).")
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only validate the patches.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Number of rows updated per query.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["path"], encoding="utf-8-sig") as file:
+                patches = json.load(file)
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        if not isinstance(patches, list):
+            raise CommandError("The file must contain a list of patches.")
+
+        result = bulk_edit_members(
+            patches, dry_run=options["dry_run"], batch_size=options["batch_size"]
+        )
+        if result.rejected:
+            lines = [
+                f"#{patch.row} (id {patch.id}): {error}"
+                for patch in result.rejected
+                for error in patch.errors
+            ]
+            raise CommandError(
+                f"Nothing saved, {len(result.rejected)} patches rejected:\n"
+                + "\n".join(lines)
+            )
+        if options["dry_run"]:
+            message = f"All {len(patches)} patches are valid, nothing saved."
+        else:
+            message = f"Updated {result.updated} members."
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from members.synthetic import generate_tree
+
+
+class Command(BaseCommand):
+    help = (
+        "Add a deterministic synthetic family tree, e.g. 10000, 100000 or 1000000 members, "
+        "with marriages, partial dates and deaths. Meant for benchmarks, not real data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("size", type=int, help="Number of members to create.")
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Seed of the generator, the same seed always gives the same tree.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Number of rows inserted per bulk_create call.",
+        )
+
+    def handle(self, *args, **options):
+        if options["size"] < 1:
+            raise CommandError("size must be a positive number.")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be a positive number.")
+
+        result = generate_tree(
+            options["size"], seed=options["seed"], batch_size=options["batch_size"]
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {result.members} members and {result.marriages} marriages "
+                f"in {result.seconds:.2f}s."
+            )
+        )
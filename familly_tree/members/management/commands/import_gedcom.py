@@ -0,0 +1,34 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from members.gedcom import GedcomImporter
+
+
+class Command(BaseCommand):
+    help = "Import individuals, parents and marriages from a GEDCOM file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path to the .ged file (UTF-8).")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Number of rows inserted or updated per query.",
+        )
+
+    def handle(self, *args, **options):
+        importer = GedcomImporter(batch_size=options["batch_size"])
+        try:
+            with open(options["path"], encoding="utf-8-sig", errors="replace") as file:
+                result = importer.run(file)
+        except OSError as error:
+            raise CommandError(error)
+        except ValidationError as error:
+            raise CommandError("Import aborted:\n" + "\n".join(error.messages))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {result.members} members, {result.families} families and "
+                f"{result.marriages} marriages in {result.seconds:.2f}s."
+            )
+        )
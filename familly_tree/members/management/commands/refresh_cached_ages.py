@@ -0,0 +1,77 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from members.dates import age_from_keys, birthday_passed_between, key_to_date
+from members.models import Member
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalculate Member.cached_age in chunks and write only the changed rows. "
+        "Meant to be run nightly, e.g. with --birthdays-since set to the previous run date."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Number of members read and written per database round trip.",
+        )
+        parser.add_argument(
+            "--living-only",
+            action="store_true",
+            help="Skip dead members, whose age does not change with time.",
+        )
+        parser.add_argument(
+            "--birthdays-since",
+            type=date.fromisoformat,
+            help="Only refresh living members with a birthday after this date (YYYY-MM-DD).",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        since = options["birthdays_since"]
+        today = date.today()
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be a positive number.")
+        if since and since > today:
+            raise CommandError("--birthdays-since cannot be in the future.")
+
+        queryset = (
+            Member.objects.exclude(birth_date_key=0, cached_age__isnull=True)
+            .only("id", "birth_date_key", "death_date_key", "cached_age")
+            .order_by()
+        )
+        if options["living_only"] or since:
+            queryset = queryset.filter(death_date__isnull=True)
+
+        started = time.perf_counter()
+        scanned = updated = 0
+        changed = []
+        for member in queryset.iterator(chunk_size=chunk_size):
+            scanned += 1
+            if since and not birthday_passed_between(
+                key_to_date(member.birth_date_key), since, today
+            ):
+                continue
+            age = age_from_keys(member.birth_date_key, member.death_date_key, today)
+            if age != member.cached_age:
+                member.cached_age = age
+                changed.append(member)
+            if len(changed) >= chunk_size:
+                updated += Member.objects.bulk_update(changed, ["cached_age"])
+                changed = []
+        if changed:
+            updated += Member.objects.bulk_update(changed, ["cached_age"])
+
+        elapsed = time.perf_counter() - started
+        throughput = scanned / elapsed if elapsed else scanned
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Scanned {scanned} members, updated {updated} in {elapsed:.2f}s "
+                f"({throughput:.0f} members/s)."
+            )
+        )
@@ -0,0 +1,37 @@
+import sqlite3
+import time
+from contextlib import closing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database to the local read replica file "
+        "(DATABASE_REPLICA_NAME). A stand-in for replication when trying the replica "
+        "profile locally, e.g. run it every few seconds."
+    )
+
+    def handle(self, *args, **options):
+        target = settings.DATABASE_REPLICA_NAME
+        if not target:
+            raise CommandError("DATABASE_REPLICA_NAME is not set.")
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.vendor != "sqlite":
+            raise CommandError("Only SQLite databases can be copied, use replication.")
+        if connection.in_atomic_block:
+            # the backup would wait for the transaction forever
+            raise CommandError("Cannot copy the database inside a transaction.")
+
+        started = time.perf_counter()
+        connection.ensure_connection()
+        # online backup, writers of the primary are not blocked for the whole copy
+        with closing(sqlite3.connect(target)) as replica:
+            connection.connection.backup(replica, pages=1024)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Copied the database to {target} in {time.perf_counter() - started:.2f}s."
+            )
+        )
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:32
+
+from django.db import migrations, models
+from django.db.models import F, Func, OuterRef, Subquery
+
+
+def recount_children(apps, schema_editor):
+    Member = apps.get_model("members", "Member")
+
+    def count_children(parent_field):
+        return Subquery(
+            Member.objects.filter(**{parent_field: OuterRef("pk")})
+            .order_by()
+            .annotate(total=Func(F("pk"), function="COUNT"))
+            .values("total")
+        )
+
+    Member.objects.update(
+        children_count=count_children("father") + count_children("mother")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("members", "0012_member_cached_age"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="member",
+            options={"base_manager_name": "objects"},
+        ),
+        migrations.AddField(
+            model_name="member",
+            name="children_count",
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(recount_children, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:35
+
+from datetime import date
+
+from django.db import migrations, models
+
+
+def date_sort_key(date_str):
+    """Frozen copy of members.dates.date_sort_key() as of this migration."""
+    if not date_str:
+        return 0, 0
+    try:
+        match len(date_str):
+            case 4:
+                year, month, day, precision = int(date_str), 0, 0, 1
+            case 7 if date_str[4] == "-":
+                year, month, day, precision = int(date_str[:4]), int(date_str[5:]), 0, 2
+            case 10 if date_str[4] == date_str[7] == "-":
+                year, month, day = (
+                    int(date_str[:4]),
+                    int(date_str[5:7]),
+                    int(date_str[8:]),
+                )
+                precision = 3
+            case _:
+                return 0, 0
+        date(year, month or 1, day or 1)
+    except ValueError:
+        return 0, 0
+    return year * 10000 + month * 100 + day, precision
+
+
+def fill_date_sort_keys(apps, schema_editor):
+    Member = apps.get_model("members", "Member")
+    fields = [
+        "birth_date_key",
+        "birth_date_precision",
+        "death_date_key",
+        "death_date_precision",
+    ]
+    members = []
+    for member in Member.objects.only("birth_date", "death_date").iterator():
+        member.birth_date_key, member.birth_date_precision = date_sort_key(
+            member.birth_date
+        )
+        member.death_date_key, member.death_date_precision = date_sort_key(
+            member.death_date
+        )
+        members.append(member)
+        if len(members) >= 2000:
+            Member.objects.bulk_update(members, fields)
+            members = []
+    Member.objects.bulk_update(members, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("members", "0013_member_children_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="member",
+            name="birth_date_key",
+            field=models.IntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="member",
+            name="birth_date_precision",
+            field=models.PositiveSmallIntegerField(
+                choices=[(0, "No date"), (1, "Year"), (2, "Month"), (3, "Day")],
+                default=0,
+                editable=False,
+            ),
+        ),
+        migrations.AddField(
+            model_name="member",
+            name="death_date_key",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="member",
+            name="death_date_precision",
+            field=models.PositiveSmallIntegerField(
+                choices=[(0, "No date"), (1, "Year"), (2, "Month"), (3, "Day")],
+                default=0,
+                editable=False,
+            ),
+        ),
+        migrations.RunPython(fill_date_sort_keys, migrations.RunPython.noop),
+    ]
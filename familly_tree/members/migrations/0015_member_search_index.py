@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copies of the members.search statements as of this migration
+CREATE_SEARCH_TABLE_SQL = [
+    "CREATE VIRTUAL TABLE members_member_fts USING fts5("
+    "firstname, lastname, family_name, content='members_member', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "INSERT INTO members_member_fts(members_member_fts) VALUES ('rebuild')",
+]
+
+SEARCH_TRIGGERS_SQL = [
+    "DROP TRIGGER IF EXISTS members_member_fts_insert",
+    "DROP TRIGGER IF EXISTS members_member_fts_delete",
+    "DROP TRIGGER IF EXISTS members_member_fts_update",
+    "CREATE TRIGGER members_member_fts_insert AFTER INSERT ON members_member BEGIN "
+    "INSERT INTO members_member_fts(rowid, firstname, lastname, family_name) "
+    "VALUES (new.id, new.firstname, new.lastname, new.family_name); "
+    "END",
+    "CREATE TRIGGER members_member_fts_delete AFTER DELETE ON members_member BEGIN "
+    "INSERT INTO members_member_fts(members_member_fts, rowid, firstname, lastname, "
+    "family_name) VALUES ('delete', old.id, old.firstname, old.lastname, old.family_name); "
+    "END",
+    "CREATE TRIGGER members_member_fts_update "
+    "AFTER UPDATE OF firstname, lastname, family_name ON members_member BEGIN "
+    "INSERT INTO members_member_fts(members_member_fts, rowid, firstname, lastname, "
+    "family_name) VALUES ('delete', old.id, old.firstname, old.lastname, old.family_name); "
+    "INSERT INTO members_member_fts(rowid, firstname, lastname, family_name) "
+    "VALUES (new.id, new.firstname, new.lastname, new.family_name); "
+    "END",
+]
+
+DROP_SEARCH_TABLE_SQL = [
+    "DROP TRIGGER IF EXISTS members_member_fts_insert",
+    "DROP TRIGGER IF EXISTS members_member_fts_delete",
+    "DROP TRIGGER IF EXISTS members_member_fts_update",
+    "DROP TABLE IF EXISTS members_member_fts",
+]
+
+
+def run_on_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("members", "0014_member_date_sort_keys"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MemberSearchIndex",
+            fields=[
+                (
+                    "member",
+                    models.OneToOneField(
+                        db_column="rowid",
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        related_name="search_index",
+                        serialize=False,
+                        to="members.member",
+                    ),
+                ),
+                ("document", models.TextField(db_column="members_member_fts")),
+                ("rank", models.FloatField()),
+            ],
+            options={
+                "db_table": "members_member_fts",
+                "managed": False,
+            },
+        ),
+        migrations.RunPython(
+            run_on_sqlite(CREATE_SEARCH_TABLE_SQL + SEARCH_TRIGGERS_SQL),
+            run_on_sqlite(DROP_SEARCH_TABLE_SQL),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def create_tree_version(apps, schema_editor):
+    TreeVersion = apps.get_model("members", "TreeVersion")
+    TreeVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("members", "0015_member_search_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TreeVersion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version", models.PositiveBigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(create_tree_version, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def remove_duplicate_marriages(apps, schema_editor):
+    """
+    Keep the first row of every (member, spouse) pair and, for members with several
+    current marriages, only the latest one as married, so the constraints can be added.
+    Both rows of a couple are changed together, so no marriage is left one-sided.
+    """
+    MartialRelationship = apps.get_model("members", "MartialRelationship")
+    seen, duplicates, couples = set(), [], {}
+    rows = MartialRelationship.objects.order_by("id").values_list(
+        "id", "member_id", "spouse_id", "married"
+    )
+    for pk, member_id, spouse_id, is_married in rows.iterator():
+        if (member_id, spouse_id) in seen:
+            duplicates.append(pk)
+            continue
+        seen.add((member_id, spouse_id))
+        couple = couples.setdefault(frozenset((member_id, spouse_id)), [[], 0])
+        couple[0].append(pk)
+        if is_married:
+            couple[1] = pk
+    MartialRelationship.objects.filter(pk__in=duplicates).delete()
+    taken, married, divorced = set(), [], []
+    # the latest marriage of every member wins
+    for couple, (pks, latest) in sorted(
+        couples.items(), key=lambda item: item[1][1], reverse=True
+    ):
+        if latest and not couple & taken:
+            taken |= couple
+            married += pks
+        else:
+            divorced += pks
+    MartialRelationship.objects.filter(pk__in=divorced).update(married=False)
+    MartialRelationship.objects.filter(pk__in=married).update(married=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("members", "0016_tree_version"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_marriages, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="martialrelationship",
+            name="member",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="martialrelationship",
+                to="members.member",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="member",
+            index=models.Index(
+                fields=["sex", "lastname", "firstname"], name="member_sex_name_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="member",
+            index=models.Index(
+                condition=models.Q(("death_date__isnull", True)),
+                fields=["id"],
+                name="member_alive_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="member",
+            index=models.Index(fields=["cached_age"], name="member_age_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="martialrelationship",
+            constraint=models.UniqueConstraint(
+                fields=("member", "spouse"), name="member_marriage_unique"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="martialrelationship",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("married", True)),
+                fields=("member",),
+                name="member_single_marriage_unique",
+            ),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:17
+
+from django.db import migrations, models
+
+# Frozen copy of members.search.SEARCH_TRIGGERS_SQL as of this migration
+SEARCH_TRIGGERS_SQL = [
+    "DROP TRIGGER IF EXISTS members_member_fts_insert",
+    "DROP TRIGGER IF EXISTS members_member_fts_delete",
+    "DROP TRIGGER IF EXISTS members_member_fts_update",
+    "CREATE TRIGGER members_member_fts_insert AFTER INSERT ON members_member BEGIN "
+    "INSERT INTO members_member_fts(rowid, firstname, lastname, family_name) "
+    "VALUES (new.id, new.firstname, new.lastname, new.family_name); "
+    "END",
+    "CREATE TRIGGER members_member_fts_delete AFTER DELETE ON members_member BEGIN "
+    "INSERT INTO members_member_fts(members_member_fts, rowid, firstname, lastname, "
+    "family_name) VALUES ('delete', old.id, old.firstname, old.lastname, old.family_name); "
+    "END",
+    "CREATE TRIGGER members_member_fts_update "
+    "AFTER UPDATE OF firstname, lastname, family_name ON members_member BEGIN "
+    "INSERT INTO members_member_fts(members_member_fts, rowid, firstname, lastname, "
+    "family_name) VALUES ('delete', old.id, old.firstname, old.lastname, old.family_name); "
+    "INSERT INTO members_member_fts(rowid, firstname, lastname, family_name) "
+    "VALUES (new.id, new.firstname, new.lastname, new.family_name); "
+    "END",
+]
+
+
+def recreate_search_triggers(apps, schema_editor):
+    # adding or removing the column remakes members_member on SQLite, which drops its triggers
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for statement in SEARCH_TRIGGERS_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("members", "0017_marriage_constraints_and_indexes"),
+    ]
+
+    operations = [
+        # operations are reversed in the opposite order, so this runs after RemoveField
+        migrations.RunPython(migrations.RunPython.noop, recreate_search_triggers),
+        migrations.AddField(
+            model_name="member",
+            name="version",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(recreate_search_triggers, migrations.RunPython.noop),
+    ]
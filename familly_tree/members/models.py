@@ -1,10 +1,249 @@
 from dataclasses import dataclass
 from datetime import date, datetime
-from typing import Optional
+from typing import Iterable, Optional
 
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models import Q, QuerySet
+from django.db import connections, models, transaction
+from django.db.models import (Case, F, Func, OuterRef, Q, QuerySet, Subquery,
+                              When)
+from django.db.models.expressions import RawSQL
+from django.dispatch import Signal
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from . import dates
+from .dates import age_from_keys, date_sort_key, latest_date_key, parse_date
+from .lineage import (LineageGeneration, depth_limit, lineage_ids_sql,
+                      lineage_sql)
+from .search import SEARCH_TABLE, Match, build_match_query, search_tokens
+
+PARENT_FIELDS = {"father", "father_id", "mother", "mother_id"}
+DATE_FIELDS = {"birth_date", "death_date"}
+MAX_REPORTED_ERRORS = 20
+
+
+# Sent after TreeVersion.bump() with keys of the version before and after the write and
+# the changes it made, if they are known, so in-process caches can be patched on commit.
+tree_version_bumped = Signal()
+
+
+class TreeVersion(models.Model):
+    """
+    Single row counter bumped by every write to members or marriages, in the same transaction.
+    Lets derived data (e.g. JSON subtrees) be validated with ETag/Last-Modified in one query.
+    """
+
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    @property
+    def key(self) -> tuple:
+        """
+        Identifies the state of the tree. updated_at is a part of it because a rolled back
+        transaction can leave the counter at a value which was already seen with other data.
+        """
+        return self.version, self.updated_at
+
+    @classmethod
+    def lock(cls, using: Optional[str] = None) -> None:
+        """
+        Take the write lock (row lock on other databases) in the current transaction, so
+        what a write checks cannot change before it is done. Call bump() once it succeeded.
+        """
+        manager = cls.objects.using(using)
+        if not manager.filter(pk=1).update(version=F("version")):
+            manager.get_or_create(pk=1)
+
+    @classmethod
+    def bump(cls, using: Optional[str] = None, changes: Optional[list] = None) -> None:
+        """
+        Increment the version. changes describe the write, when it is simple enough to patch:
+        ("member", id, father_id, mother_id, sex) or ("marriage", member_id, spouse_id, married).
+        """
+        manager = cls.objects.using(using)
+        while True:
+            previous = manager.filter(pk=1).first() or manager.create(pk=1)
+            current = cls(pk=1, version=previous.version + 1, updated_at=timezone.now())
+            # compare-and-swap, so the previous key is exactly the state this write started from
+            if manager.filter(pk=1, version=previous.version).update(
+                version=current.version, updated_at=current.updated_at
+            ):
+                break
+        tree_version_bumped.send(
+            sender=cls,
+            previous=previous.key,
+            current=current.key,
+            changes=changes,
+            using=using or "default",
+        )
+
+    @classmethod
+    def current(cls) -> "TreeVersion":
+        return cls.objects.filter(pk=1).first() or cls(pk=1)
+
+
+class MemberQuerySet(QuerySet):
+    """
+    Keeps the denormalized Member.children_count, date sort keys and versions in sync for bulk
+    operations that bypass Member.save() (update, bulk_create, bulk_update, related managers).
+    """
+
+    def bump_versions(self) -> int:
+        """Mark members in the queryset as changed, so their cached fragments are not used."""
+        return super().update(version=F("version") + 1)
+
+    def recount_children(self) -> int:
+        """Recalculate children_count of every member in the queryset."""
+
+        def count_children(parent_field):
+            return Subquery(
+                Member.objects.filter(**{parent_field: OuterRef("pk")})
+                .order_by()
+                .annotate(total=Func(F("pk"), function="COUNT"))
+                .values("total")
+            )
+
+        return super().update(
+            children_count=count_children("father") + count_children("mother")
+        )
+
+    def update(self, **kwargs):
+        for field in DATE_FIELDS & kwargs.keys():
+            if kwargs[field] is None or isinstance(kwargs[field], str):
+                key, precision = date_sort_key(kwargs[field])
+                kwargs.setdefault(f"{field}_key", key)
+                kwargs.setdefault(f"{field}_precision", precision)
+        kwargs.setdefault("version", F("version") + 1)
+
+        with transaction.atomic(using=self.db):
+            if not PARENT_FIELDS & kwargs.keys():
+                rows = super().update(**kwargs)
+                TreeVersion.bump(using=self.db)
+                return rows
+
+            parent_ids = self._parent_ids()
+            rows = super().update(**kwargs)
+            for field in PARENT_FIELDS & kwargs.keys():
+                parent = kwargs[field]
+                parent_ids.add(parent.pk if isinstance(parent, Member) else parent)
+            self.model.objects.filter(pk__in=parent_ids - {None}).recount_children()
+            TreeVersion.bump(using=self.db)
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj._set_date_keys()
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            parent_ids = {pid for obj in objs for pid in (obj.father_id, obj.mother_id)}
+            if parent_ids - {None}:
+                self.model.objects.filter(pk__in=parent_ids - {None}).recount_children()
+            TreeVersion.bump(using=self.db)
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        fields = list(fields)
+        for field in DATE_FIELDS & set(fields):
+            fields += [f"{field}_key", f"{field}_precision"]
+            for obj in objs:
+                obj._set_date_keys()
+
+        # the rows are written with the plain QuerySet.update(), so versions are bumped and
+        # children recounted once here, not once per batch
+        plain = QuerySet(self.model, using=self.db)
+        with transaction.atomic(using=self.db):
+            # objects may be partial (e.g. Member(pk=..., father_id=...)), so no obj.version
+            self.filter(pk__in=[obj.pk for obj in objs]).bump_versions()
+            if not PARENT_FIELDS & set(fields):
+                rows = plain.bulk_update(objs, fields, *args, **kwargs)
+                TreeVersion.bump(using=self.db)
+                return rows
+
+            parent_ids = self.filter(pk__in=[obj.pk for obj in objs])._parent_ids()
+            rows = plain.bulk_update(objs, fields, *args, **kwargs)
+            parent_ids.update(
+                pid for obj in objs for pid in (obj.father_id, obj.mother_id)
+            )
+            self.model.objects.filter(pk__in=parent_ids - {None}).recount_children()
+            TreeVersion.bump(using=self.db)
+        return rows
+
+    def search(self, text: str) -> "MemberQuerySet":
+        """
+        Members with all words of text as prefixes of their names, best matches first.
+        Uses the FTS5 index on SQLite, falls back to icontains on other databases.
+        """
+        if not search_tokens(text):
+            return self.none()
+        if connections[self.db].vendor == "sqlite":
+            return self.filter(
+                search_index__document__match=build_match_query(text)
+            ).order_by("search_index__rank")
+
+        queryset = self
+        for token in search_tokens(text):
+            queryset = queryset.filter(
+                Q(firstname__icontains=token)
+                | Q(lastname__icontains=token)
+                | Q(family_name__icontains=token)
+            )
+        return queryset
+
+    def born_after(self, date_key: int) -> "MemberQuerySet":
+        """Members born after date_key (see dates.date_sort_key) or with unknown birth date."""
+        return self.filter(Q(birth_date_key=0) | Q(birth_date_key__gt=date_key))
+
+    def born_before(self, date_key: int) -> "MemberQuerySet":
+        """Members born before date_key or with unknown birth date."""
+        return self.filter(Q(birth_date_key=0) | Q(birth_date_key__lt=date_key))
+
+    def single(self) -> "MemberQuerySet":
+        """Members without a current marriage."""
+        return self.exclude(
+            pk__in=MartialRelationship.objects.filter(married=True).values("member_id")
+        )
+
+    def ancestors(self, max_depth: Optional[int] = None) -> "MemberQuerySet":
+        """
+        Parents, grandparents etc. of members in the queryset, annotated with generation
+        (1 for parents). Runs as one WITH RECURSIVE query.
+        """
+        return self._lineage("ancestors", max_depth)
+
+    def descendants(self, max_depth: Optional[int] = None) -> "MemberQuerySet":
+        """Children, grandchildren etc. of members in the queryset, annotated with generation."""
+        return self._lineage("descendants", max_depth)
+
+    def _lineage(self, direction: str, max_depth: Optional[int]) -> "MemberQuerySet":
+        seed_sql, seed_params = self.order_by().values("pk").query.sql_with_params()
+        sql = lineage_sql(self.model._meta.db_table, seed_sql, direction)
+        params = [*seed_params, depth_limit(max_depth)]
+        return self.model.objects.filter(
+            pk__in=RawSQL(f"SELECT id FROM ({sql}) related", params)
+        ).annotate(generation=LineageGeneration(sql, params))
+
+    def with_ancestors_pks(self) -> RawSQL:
+        """Subquery of ids of members in the queryset and all their ancestors."""
+        return self._lineage_pks("ancestors")
+
+    def with_descendants_pks(self) -> RawSQL:
+        """Subquery of ids of members in the queryset and all their descendants."""
+        return self._lineage_pks("descendants")
+
+    def _lineage_pks(self, direction: str) -> RawSQL:
+        seed_sql, seed_params = self.order_by().values("pk").query.sql_with_params()
+        sql = lineage_ids_sql(self.model._meta.db_table, seed_sql, direction)
+        return RawSQL(sql, seed_params)
+
+    def _parent_ids(self) -> set[Optional[int]]:
+        parent_ids = set()
+        for father_id, mother_id in self.values_list(
+            "father_id", "mother_id"
+        ).distinct():
+            parent_ids.update((father_id, mother_id))
+        return parent_ids
 
 
 class Member(models.Model):
@@ -12,6 +251,12 @@ class Member(models.Model):
         MALE = "m", "Male"
         FEMALE = "f", "Female"
 
+    class DatePrecision(models.IntegerChoices):
+        NONE = dates.NO_DATE, "No date"
+        YEAR = dates.YEAR, "Year"
+        MONTH = dates.MONTH, "Month"
+        DAY = dates.DAY, "Day"
+
     firstname = models.CharField(max_length=255)
     lastname = models.CharField(max_length=255)
     family_name = models.CharField(max_length=255, blank=True)
@@ -36,6 +281,46 @@ class Member(models.Model):
     )
 
     cached_age = models.IntegerField(null=True, blank=True)
+    children_count = models.PositiveIntegerField(default=0, db_index=True)
+
+    # YYYYMMDD (00 for unknown month/day, 0 for no date) derived from the partial date strings
+    birth_date_key = models.IntegerField(default=0, db_index=True, editable=False)
+    birth_date_precision = models.PositiveSmallIntegerField(
+        choices=DatePrecision, default=DatePrecision.NONE, editable=False
+    )
+    death_date_key = models.IntegerField(default=0, editable=False)
+    death_date_precision = models.PositiveSmallIntegerField(
+        choices=DatePrecision, default=DatePrecision.NONE, editable=False
+    )
+    # incremented by every change of the member or its marriages, part of the cache keys
+    # of its template fragments (templatetags.family_tree_tags)
+    version = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = MemberQuerySet.as_manager()
+
+    class Meta:
+        # related managers (e.g. children_father.add()) go through MemberQuerySet as well
+        base_manager_name = "objects"
+        indexes = [
+            # father/mother dropdowns: one sex, ordered by name, read straight from the index
+            models.Index(
+                fields=["sex", "lastname", "firstname"], name="member_sex_name_idx"
+            ),
+            # "alive" filter pages in id order, only the living members are indexed
+            models.Index(
+                fields=["id"],
+                condition=Q(death_date__isnull=True),
+                name="member_alive_idx",
+            ),
+            models.Index(fields=["cached_age"], name="member_age_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if {"father_id", "mother_id"} <= set(field_names):
+            instance._loaded_parent_ids = (instance.father_id, instance.mother_id)
+        return instance
 
     def __repr__(self):
         born = f" born {self.birth_date}" if self.birth_date else ""
@@ -60,8 +345,52 @@ class Member(models.Model):
             self.family_name = self.lastname
         else:
             self.family_name = self.family_name.capitalize()
-        self.cached_age = self.__calculate_age()
-        super().save(*args, **kwargs)
+        self.cached_age = age_from_keys(self.birth_date_key, self.death_date_key)
+        adding = self._state.adding
+        if not adding:
+            # incremented in the database, the loaded value can be outdated
+            loaded_version = self.version
+            self.version = F("version") + 1
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "version"}
+        with transaction.atomic():
+            loaded_parent_ids = self._get_loaded_parent_ids()
+            try:
+                super().save(*args, **kwargs)
+            except BaseException:
+                if not adding:
+                    self.version = loaded_version
+                raise
+            if not adding:
+                self.refresh_from_db(fields=["version"])
+            self._recount_parents_children(loaded_parent_ids)
+            TreeVersion.bump(
+                changes=[("member", self.pk, self.father_id, self.mother_id, self.sex)]
+            )
+
+    def _set_date_keys(self) -> None:
+        self.birth_date_key, self.birth_date_precision = date_sort_key(self.birth_date)
+        self.death_date_key, self.death_date_precision = date_sort_key(self.death_date)
+
+    def _get_loaded_parent_ids(self) -> tuple[Optional[int], Optional[int]]:
+        if hasattr(self, "_loaded_parent_ids"):
+            return self._loaded_parent_ids
+        if self._state.adding:
+            return None, None
+        # parents were deferred when the member was loaded
+        return (
+            Member.objects.filter(pk=self.pk)
+            .values_list("father_id", "mother_id")
+            .first()
+        ) or (None, None)
+
+    def _recount_parents_children(self, loaded_parent_ids) -> None:
+        """Update children_count of both previous and current parents if they changed."""
+        parent_ids = (self.father_id, self.mother_id)
+        if loaded_parent_ids != parent_ids:
+            changed_ids = set(loaded_parent_ids) ^ set(parent_ids)
+            Member.objects.filter(pk__in=changed_ids - {None}).recount_children()
+        self._loaded_parent_ids = parent_ids
 
     @property
     def age(self) -> int:
@@ -85,16 +414,37 @@ class Member(models.Model):
         mother_filter = Q(mother__isnull=False, mother=self.mother)
         return Member.objects.filter(father_filter | mother_filter).exclude(id=self.pk)
 
+    def ancestors(self, max_depth: Optional[int] = None) -> MemberQuerySet:
+        return Member.objects.filter(pk=self.pk).ancestors(max_depth)
+
+    def descendants(self, max_depth: Optional[int] = None) -> MemberQuerySet:
+        return Member.objects.filter(pk=self.pk).descendants(max_depth)
+
     @property
     def since_death(self) -> int:
         """Follows the same logic as age propery, but using death_date"""
         raise NotImplementedError
 
-    @property
+    @cached_property
     def spouses(self) -> list["SpouseData"]:
-        """Return all the spouses."""
+        """
+        Return all the spouses. Loaded once per instance, MartialRelationship.spouses_for()
+        fills it for many members at once and marry()/divorce() reset it.
+        """
         return MartialRelationship.spouses(self)
 
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._clear_spouses()
+
+    def _clear_spouses(self) -> None:
+        self.__dict__.pop("spouses", None)
+
+    def _marriages_changed(self) -> None:
+        self._clear_spouses()
+        # bumped in the database, loaded again when needed
+        self.__dict__.pop("version", None)
+
     @property
     def current_spouse(self) -> Optional["Member"]:
         current_spouses = [
@@ -133,6 +483,7 @@ class Member(models.Model):
                     "death_date must be in YYYY, YYYY-MM, or YYYY-MM-DD format."
                 )
 
+        self._set_date_keys()
         self.__is_birthdate_before_death_date()
 
     def _validate_father_and_mother(self) -> None:
@@ -170,17 +521,57 @@ class Member(models.Model):
             raise ValidationError("Diversity not supported. Sex must be 'm' or 'f'")
 
     def _validate_ancestor(self) -> None:
-        pass
+        """
+        Reject parents which would make the member their own ancestor, or an ancestor born
+        after the member was born or died. Parents and all their ancestors are checked
+        with one recursive query, which returns only offending rows.
+        """
+        parent_ids = [pid for pid in (self.father_id, self.mother_id) if pid]
+        # ancestor must be born after the latest day the member's partial dates can mean
+        latest_keys = [
+            latest_date_key(key, precision)
+            for key, precision in (
+                (self.birth_date_key, self.birth_date_precision),
+                (self.death_date_key, self.death_date_precision),
+            )
+            if key
+        ]
+        offending = Q()
+        if self.pk:
+            offending |= Q(pk=self.pk)
+        if latest_keys:
+            offending |= Q(birth_date_key__gt=min(latest_keys))
+        if not parent_ids or not offending:
+            return
+
+        parents = Member.objects.filter(pk__in=parent_ids)
+        ancestor = (
+            Member.objects.filter(pk__in=parents.with_ancestors_pks())
+            .filter(offending)
+            .order_by(Case(When(pk=self.pk, then=0), default=1), "-birth_date_key")
+            .first()
+        )
+        if ancestor is None:
+            return
+        if ancestor.pk == self.pk:
+            descendants = Member.objects.filter(pk=self.pk).with_descendants_pks()
+            parent = parents.filter(pk__in=descendants).first()
+            raise ValidationError(
+                f"Error: {self} and {parent} are circullary connected!"
+            )
+        raise ValidationError(
+            f"{self!r} cannot be older than it's ancestor {ancestor!r}!"
+        )
 
     def __is_birthdate_before_death_date(self) -> None:
-        if not self.birth_date or not self.death_date:
+        if not self.birth_date_key or not self.death_date_key:
             return
-        if self.birth_date > self.death_date:
+        if self.birth_date_key > self.death_date_key:
             raise ValidationError("Birth date must be before death date")
 
     def _is_birthday_before_today(self) -> bool:
         today = date.today()
-        parsed_date = self.__parse_date(str(self.birth_date))
+        parsed_date = parse_date(self.birth_date)
         if parsed_date is None:
             return False
         return today <= parsed_date
@@ -199,47 +590,26 @@ class Member(models.Model):
                 raise ValueError
         return True
 
-    def __calculate_age(self) -> Optional[int]:
-        """
-        Calculate age based on birth_date and death_date.
-        The thicky part is that the age can be (in future versions) in different formats:
-        - yyyy-mm-dd
-        - yyyy-mm
-        - yyyy
-        Should display in years most of the time (but for now just full years will be enough):
-        if member.years < 2 then display in months
-        if member.years < 0 and member.months < 6 display in months with days
-        """
-        birth_date = self.__parse_date(str(self.birth_date))
-        if not birth_date:
-            return None
 
-        death_date = (
-            self.__parse_date(str(self.death_date)) or datetime.now().date()
-        )  # Use current date if no death_date
+class MemberSearchIndex(models.Model):
+    """Read-only view of the FTS5 name index, see members.search."""
 
-        # Calculate the difference in years, months, and days
-        age_years = death_date.year - birth_date.year
-        if death_date.month < birth_date.month or (
-            death_date.month == birth_date.month and death_date.day < birth_date.day
-        ):
-            age_years -= 1  # Adjust if birth date hasn't occurred yet this year
+    member = models.OneToOneField(
+        Member,
+        primary_key=True,
+        db_column="rowid",
+        on_delete=models.DO_NOTHING,
+        related_name="search_index",
+    )
+    # hidden FTS5 column named after the table, used as the left side of MATCH
+    document = models.TextField(db_column=SEARCH_TABLE)
+    rank = models.FloatField()
 
-        return age_years
+    document.register_lookup(Match)
 
-    def __parse_date(self, date_str) -> datetime.date:
-        """Parse date_str into a date object. Partial dates default to the start of the month/year."""
-        if not date_str:
-            return None
-        try:
-            if len(date_str) == 10:  # "YYYY-MM-DD"
-                return datetime.strptime(date_str, "%Y-%m-%d").date()
-            elif len(date_str) == 7:  # "YYYY-MM"
-                return datetime.strptime(date_str, "%Y-%m").date()
-            elif len(date_str) == 4:  # "YYYY"
-                return datetime.strptime(date_str, "%Y").date()
-        except ValueError:
-            return None
+    class Meta:
+        managed = False
+        db_table = SEARCH_TABLE
 
 
 @dataclass
@@ -255,19 +625,80 @@ class MartialRelationship(models.Model):
     married=False - Two members are divorced.
     """
 
+    # indexed by member_marriage_unique, which starts with member
     member = models.ForeignKey(
-        Member, on_delete=models.CASCADE, related_name="martialrelationship"
+        Member,
+        on_delete=models.CASCADE,
+        related_name="martialrelationship",
+        db_index=False,
     )
     spouse = models.ForeignKey(
         Member, on_delete=models.CASCADE, related_name="spouse_relationships"
     )
     married = models.BooleanField(default=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["member", "spouse"], name="member_marriage_unique"
+            ),
+            # also the index for "is already married" checks
+            models.UniqueConstraint(
+                fields=["member"],
+                condition=Q(married=True),
+                name="member_single_marriage_unique",
+            ),
+        ]
+
     @staticmethod
     def spouses(member: Member) -> list[SpouseData]:
-        relationships = MartialRelationship.objects.filter(member=member)
+        relationships = (
+            MartialRelationship.objects.filter(member=member)
+            .select_related("spouse")
+            .order_by("id")
+        )
         return [SpouseData(rel.spouse, rel.married) for rel in relationships]
 
+    @staticmethod
+    def spouses_for(members: Iterable[Member]) -> dict[int, list[SpouseData]]:
+        """
+        Current and former spouses of many members in one query, by member id.
+        Also stored as member.spouses of each given instance.
+        """
+        members = list(members)
+        relationships = MartialRelationship._relationships_of(members)
+        return MartialRelationship._set_spouses(members, relationships)
+
+    @staticmethod
+    async def aspouses_for(members: Iterable[Member]) -> dict[int, list[SpouseData]]:
+        """spouses_for() for async views."""
+        members = list(members)
+        relationships = MartialRelationship._relationships_of(members)
+        return MartialRelationship._set_spouses(
+            members, [rel async for rel in relationships]
+        )
+
+    @staticmethod
+    def _relationships_of(members: list[Member]) -> QuerySet:
+        return (
+            MartialRelationship.objects.filter(
+                member_id__in=[member.pk for member in members]
+            )
+            .select_related("spouse")
+            .order_by("id")
+        )
+
+    @staticmethod
+    def _set_spouses(
+        members: list[Member], relationships: Iterable["MartialRelationship"]
+    ) -> dict[int, list[SpouseData]]:
+        spouses = {member.pk: [] for member in members}
+        for rel in relationships:
+            spouses[rel.member_id].append(SpouseData(rel.spouse, rel.married))
+        for member in members:
+            member.__dict__["spouses"] = spouses[member.pk]
+        return spouses
+
     @staticmethod
     def current_spouse(member: Member) -> Optional[Member]:
         spouse = MartialRelationship.objects.filter(member=member, married=True)
@@ -275,47 +706,143 @@ class MartialRelationship(models.Model):
 
     @staticmethod
     def marry(member: Member, spouse: Member):
-        """Marry a spouse."""
+        """
+        Marry a spouse. Runs in one transaction which starts with TreeVersion.lock(),
+        so it holds the write lock before reading marriages. The version is bumped only
+        when the marriage is saved, so rejected marriages leave caches alone.
+        """
         if member == spouse:
             raise ValidationError(f"{member} cannot marry themselves.")
         if member.sex == spouse.sex:
             raise ValidationError("Same sex marriages are not allowed")
-        if any(s.married for s in member.spouses):
-            raise ValidationError(
-                f"Impossible marriage because {member} is already married."
+        with transaction.atomic():
+            TreeVersion.lock()
+            relationships = list(
+                MartialRelationship.objects.filter(
+                    member__in=[member, spouse]
+                ).values_list("member_id", "spouse_id", "married")
             )
-        if any(s.married for s in spouse.spouses):
-            raise ValidationError(
-                f"Impossible marriage because {spouse} is already married."
-            )
-        if any(1 for s in member.spouses if s.spouse == spouse):
-            MartialRelationship.objects.filter(
-                member=member, spouse=spouse, married=False
-            ).update(married=True)
-            MartialRelationship.objects.filter(
-                member=spouse, spouse=member, married=False
-            ).update(married=True)
-        else:
-            MartialRelationship.objects.create(
-                member=member, spouse=spouse, married=True
+            currently_married = {pk for pk, _, married in relationships if married}
+            for person in (member, spouse):
+                if person.pk in currently_married:
+                    raise ValidationError(
+                        f"Impossible marriage because {person} is already married."
+                    )
+            # a divorced couple is renewed, also when only one of its rows is left
+            pairs = [(member, spouse), (spouse, member)]
+            existing = {(pk, spouse_id) for pk, spouse_id, _ in relationships}
+            missing = [(a, b) for a, b in pairs if (a.pk, b.pk) not in existing]
+            if len(missing) < len(pairs):
+                MartialRelationship._between(member, spouse).update(married=True)
+            MartialRelationship.objects.bulk_create(
+                [MartialRelationship(member=a, spouse=b) for a, b in missing]
             )
-            MartialRelationship.objects.create(
-                member=spouse, spouse=member, married=True
+            Member.objects.filter(pk__in=[member.pk, spouse.pk]).bump_versions()
+            TreeVersion.bump(
+                changes=[
+                    ("marriage", member.pk, spouse.pk, True),
+                    ("marriage", spouse.pk, member.pk, True),
+                ]
             )
+        member._marriages_changed()
+        spouse._marriages_changed()
 
     @staticmethod
     def divorce(member: Member, spouse: "Member"):
-        """Divorce a spouse."""
-        if member.current_spouse != spouse:
-            raise ValidationError(
-                f"{member} cannot divorce with {spouse} because the are not married"
+        """Divorce a spouse, in one transaction holding the write lock like marry()."""
+        with transaction.atomic():
+            TreeVersion.lock()
+            divorced = MartialRelationship._between(
+                member, spouse, married=True
+            ).update(married=False)
+            if divorced != 2:
+                raise ValidationError(
+                    f"{member} cannot divorce with {spouse} because the are not married"
+                )
+            Member.objects.filter(pk__in=[member.pk, spouse.pk]).bump_versions()
+            TreeVersion.bump(
+                changes=[
+                    ("marriage", member.pk, spouse.pk, False),
+                    ("marriage", spouse.pk, member.pk, False),
+                ]
+            )
+        member._marriages_changed()
+        spouse._marriages_changed()
+
+    @staticmethod
+    def bulk_marry(
+        couples: Iterable[tuple[Member, Member]], batch_size: int = 2000
+    ) -> int:
+        """
+        Marry many couples at once, e.g. for imports. Rules of marry() are checked set-wise
+        with a few queries, all errors are raised together and nothing is saved then.
+        Returns the number of marriages.
+        """
+        couples = [(member.pk, spouse.pk) for member, spouse in couples]
+        member_ids = [pk for couple in couples for pk in couple]
+        errors = []
+        with transaction.atomic():
+            TreeVersion.lock()
+            members = Member.objects.in_bulk(member_ids)
+            married = set(
+                MartialRelationship.objects.filter(
+                    member_id__in=member_ids, married=True
+                ).values_list("member_id", flat=True)
+            )
+            divorced = set(
+                MartialRelationship.objects.filter(
+                    member_id__in=member_ids, spouse_id__in=member_ids, married=False
+                ).values_list("member_id", "spouse_id", "pk")
             )
-        MartialRelationship.objects.filter(
-            member=member, spouse=spouse, married=True
-        ).update(married=False)
-        MartialRelationship.objects.filter(
-            member=spouse, spouse=member, married=True
-        ).update(married=False)
+            seen = set()
+            for member_id, spouse_id in couples:
+                member, spouse = members.get(member_id), members.get(spouse_id)
+                if member is None or spouse is None:
+                    errors.append(
+                        f"Member {member_id if member is None else spouse_id} does not exist."
+                    )
+                    continue
+                if member_id == spouse_id:
+                    errors.append(f"{member} cannot marry themselves.")
+                elif member.sex == spouse.sex:
+                    errors.append(
+                        f"Same sex marriages are not allowed: {member} and {spouse}."
+                    )
+                for person in (member, spouse):
+                    if person.pk in married or person.pk in seen:
+                        errors.append(
+                            f"Impossible marriage because {person} is already married."
+                        )
+                    seen.add(person.pk)
+            if errors:
+                raise ValidationError(errors[:MAX_REPORTED_ERRORS])
+
+            renewed = {(a, b): pk for a, b, pk in divorced}
+            to_update, to_create = [], []
+            for member_id, spouse_id in couples:
+                for a, b in ((member_id, spouse_id), (spouse_id, member_id)):
+                    if (a, b) in renewed:
+                        to_update.append(renewed[(a, b)])
+                    else:
+                        to_create.append(MartialRelationship(member_id=a, spouse_id=b))
+            MartialRelationship.objects.filter(pk__in=to_update).update(married=True)
+            MartialRelationship.objects.bulk_create(to_create, batch_size=batch_size)
+            Member.objects.filter(pk__in=member_ids).bump_versions()
+            TreeVersion.bump(
+                changes=[
+                    ("marriage", a, b, True)
+                    for member_id, spouse_id in couples
+                    for a, b in ((member_id, spouse_id), (spouse_id, member_id))
+                ]
+            )
+        return len(couples)
+
+    @staticmethod
+    def _between(member: Member, spouse: Member, **filters) -> QuerySet:
+        """Both rows of a couple."""
+        return MartialRelationship.objects.filter(
+            Q(member=member, spouse=spouse) | Q(member=spouse, spouse=member), **filters
+        )
 
     def __str__(self):
         return f"{self.member} and {self.spouse} are{' not' if not self.married else ''} married"
@@ -0,0 +1,241 @@
+"""
+Whole-response cache of pages browsed anonymously (members list, details and tree).
+
+Responses are stored under the generations of all pages and of their scope ("members",
+"tree" or "details:<id>"). Writes replace the generations of the pages showing what changed,
+so stale responses are never found again and expire with PAGE_CACHE_TIMEOUT:
+- a saved member - its page, pages of relatives showing it ((grand)parents, siblings,
+  (grand)children, spouses), the list and the tree,
+- a marriage - pages of both spouses and the list (spouse column),
+- bulk queryset operations, including unlinking children of a deleted member - all pages.
+Writes bypassing model signals (marry(), divorce(), bulk operations) are caught with
+tree_version_bumped.
+Generations are replaced right away and again on commit, so pages rendered by other
+requests before the commit are not kept.
+
+Pages are cached unless PAGE_CACHE_ENABLED is False. Generations must be seen by every
+process serving the pages, so a deployment running several processes has to share the
+default cache between them (file based, memcached, redis, database) or turn pages off.
+
+Hits and misses are counted per page in the process, see stats().
+"""
+
+import hashlib
+import threading
+import uuid
+from collections import Counter
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import MartialRelationship, Member, tree_version_bumped
+
+ALL_PAGES = "all"
+DEFAULT_TIMEOUT = 60 * 5
+CACHED_METHODS = ("GET", "HEAD")
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def cached_page(scope: str):
+    """
+    Cache responses of a view for anonymous clients, scope is formatted with the view
+    kwargs, e.g. "details:{pk}". Works with sync and async views.
+    """
+    page = scope.split(":")[0]
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+
+            async def wrapper(request, *args, **kwargs):
+                if not _cacheable(request):
+                    return await view(request, *args, **kwargs)
+                page_scope = scope.format(**kwargs)
+                key = _response_key(request, await _agenerations(page_scope))
+                response = await cache.aget(key)
+                if response is not None:
+                    return _hit(page, response)
+                return _miss(page, key, request, await view(request, *args, **kwargs))
+
+        else:
+
+            def wrapper(request, *args, **kwargs):
+                if not _cacheable(request):
+                    return view(request, *args, **kwargs)
+                key = _response_key(request, _generations(scope.format(**kwargs)))
+                response = cache.get(key)
+                if response is not None:
+                    return _hit(page, response)
+                return _miss(page, key, request, view(request, *args, **kwargs))
+
+        return wraps(view)(wrapper)
+
+    return decorator
+
+
+def stats() -> dict[str, dict[str, int]]:
+    """Hits and misses of cached pages in this process, by page."""
+    with _stats_lock:
+        counts = dict(_stats)
+    pages = sorted({page for page, _ in counts})
+    return {
+        page: {result: counts.get((page, result), 0) for result in ("hits", "misses")}
+        for page in pages
+    }
+
+
+def reset_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
+
+
+def invalidate(scopes: set[str], using: str = DEFAULT_DB_ALIAS) -> None:
+    """Make cached responses of the scopes (or ALL_PAGES) unreachable."""
+    keys = [_generation_key(scope) for scope in scopes]
+    _replace_generations(keys)
+    if connections[using].in_atomic_block:
+        transaction.on_commit(lambda: _replace_generations(keys), using=using)
+
+
+def enabled() -> bool:
+    """Whether pages are cached, see the module docstring."""
+    return getattr(settings, "PAGE_CACHE_ENABLED", True)
+
+
+def _cacheable(request) -> bool:
+    return (
+        request.method in CACHED_METHODS
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and enabled()
+    )
+
+
+def _generation_key(scope: str) -> str:
+    return f"page-generation:{scope}"
+
+
+def _replace_generations(keys: list[str]) -> None:
+    cache.set_many({key: uuid.uuid4().hex for key in keys}, None)
+
+
+def _generations(scope: str) -> list[str]:
+    keys = [_generation_key(ALL_PAGES), _generation_key(scope)]
+    generations = cache.get_many(keys)
+    if len(generations) < len(keys):
+        # add() keeps a generation set meanwhile by an invalidation
+        for key in keys:
+            cache.add(key, uuid.uuid4().hex, None)
+        generations = cache.get_many(keys)
+    return [generations.get(key, "") for key in keys]
+
+
+async def _agenerations(scope: str) -> list[str]:
+    keys = [_generation_key(ALL_PAGES), _generation_key(scope)]
+    generations = await cache.aget_many(keys)
+    if len(generations) < len(keys):
+        for key in keys:
+            await cache.aadd(key, uuid.uuid4().hex, None)
+        generations = await cache.aget_many(keys)
+    return [generations.get(key, "") for key in keys]
+
+
+def _response_key(request, generations: list[str]) -> str:
+    path = hashlib.md5(request.get_full_path().encode(), usedforsecurity=False)
+    return f"page:{'.'.join(generations)}:{path.hexdigest()}"
+
+
+def _count(page: str, result: str) -> None:
+    with _stats_lock:
+        _stats[page, result] += 1
+
+
+def _hit(page: str, response):
+    _count(page, "hits")
+    response["X-Page-Cache"] = "hit"
+    return response
+
+
+def _miss(page: str, key: str, request, response):
+    _count(page, "misses")
+    response["X-Page-Cache"] = "miss"
+    if response.status_code != 200 or response.streaming:
+        return response
+
+    def store(response):
+        # pages with cookies or CSRF tokens belong to one client
+        if response.cookies or request.META.get("CSRF_COOKIE_NEEDS_UPDATE"):
+            return
+        timeout = getattr(settings, "PAGE_CACHE_TIMEOUT", DEFAULT_TIMEOUT)
+        cache.set(key, response, timeout)
+
+    if callable(getattr(response, "render", None)) and not response.is_rendered:
+        response.add_post_render_callback(store)
+    else:
+        store(response)
+    return response
+
+
+def _member_pages(member: Member) -> set[str]:
+    """Pages of the member and of relatives showing it, with previous parents."""
+    parent_ids = {
+        member.father_id,
+        member.mother_id,
+        *getattr(member, "_loaded_parent_ids", ()),
+    } - {None}
+    grandparents = Member.objects.filter(pk__in=parent_ids).values_list(
+        "father_id", "mother_id"
+    )
+    # children and grandchildren of the member and of its parents (siblings, and nephews
+    # which are invalidated needlessly but cost no extra query)
+    descendants = (
+        Member.objects.filter(pk__in={member.pk, *parent_ids})
+        .descendants(max_depth=2)
+        .values_list("id", flat=True)
+    )
+    spouses = MartialRelationship.objects.filter(member_id=member.pk).values_list(
+        "spouse_id", flat=True
+    )
+    ids = {
+        member.pk,
+        *parent_ids,
+        *(pk for pair in grandparents for pk in pair),
+        *descendants,
+        *spouses,
+    } - {None}
+    return {f"details:{pk}" for pk in ids}
+
+
+def _marriage_pages(member_id: int, spouse_id: int) -> set[str]:
+    return {f"details:{member_id}", f"details:{spouse_id}", "members"}
+
+
+@receiver(post_save, sender=Member)
+def invalidate_member_pages(sender, instance, using, **kwargs):
+    invalidate(_member_pages(instance) | {"members", "tree"}, using)
+
+
+@receiver(post_save, sender=MartialRelationship)
+@receiver(post_delete, sender=MartialRelationship)
+def invalidate_marriage_pages(sender, instance, using, **kwargs):
+    invalidate(_marriage_pages(instance.member_id, instance.spouse_id), using)
+
+
+@receiver(tree_version_bumped)
+def invalidate_bulk_write_pages(sender, changes, using, **kwargs):
+    """Writes which do not send model signals."""
+    if changes is None:
+        invalidate({ALL_PAGES}, using)
+        return
+    scopes = set()
+    for kind, *values in changes:
+        if kind == "marriage":
+            member_id, spouse_id, _ = values
+            scopes |= _marriage_pages(member_id, spouse_id)
+    if scopes:
+        invalidate(scopes, using)
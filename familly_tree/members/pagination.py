@@ -0,0 +1,128 @@
+from functools import cached_property
+from typing import Optional
+
+from django.db.models import Q, QuerySet
+from django.http import Http404
+
+
+class KeysetPage:
+    """Single page of a keyset paginated queryset."""
+
+    def __init__(
+        self, object_list: list, ordering: tuple[str, ...], has_next, has_previous
+    ):
+        self.object_list = object_list
+        self.ordering = ordering
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self) -> bool:
+        return self._has_next
+
+    def has_previous(self) -> bool:
+        return self._has_previous
+
+    def has_other_pages(self) -> bool:
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self) -> Optional[str]:
+        if not self.has_next():
+            return None
+        return self._cursor_for(self.object_list[-1])
+
+    @property
+    def previous_cursor(self) -> Optional[str]:
+        if not self.has_previous():
+            return None
+        return self._cursor_for(self.object_list[0])
+
+    def _cursor_for(self, obj) -> str:
+        return ",".join(str(getattr(obj, field)) for field in self.ordering)
+
+
+class KeysetPaginator:
+    """
+    Keyset (seek) pagination - instead of OFFSET each page continues from the sort key of the
+    last (or first) row of the previous page, so every page costs the same index range scan.
+    The last field in `ordering` must be unique (e.g. primary key) to keep the order stable.
+    Only ascending integer fields are supported as sort keys.
+    """
+
+    def __init__(self, queryset: QuerySet, per_page: int, ordering=("id",)):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+
+    @cached_property
+    def count(self) -> int:
+        """Total number of rows, counted without ordering or annotations of a page."""
+        return self.queryset.order_by().count()
+
+    async def acount(self) -> int:
+        """count for async views, also cached as count."""
+        if "count" not in self.__dict__:
+            self.__dict__["count"] = await self.queryset.order_by().acount()
+        return self.count
+
+    def page(self, after: Optional[str] = None, before: Optional[str] = None):
+        queryset, backwards = self._page_queryset(after, before)
+        return self._page(list(queryset), after, backwards)
+
+    async def apage(self, after: Optional[str] = None, before: Optional[str] = None):
+        queryset, backwards = self._page_queryset(after, before)
+        return self._page([row async for row in queryset], after, backwards)
+
+    def _page_queryset(
+        self, after: Optional[str], before: Optional[str]
+    ) -> tuple[QuerySet, bool]:
+        """Rows of the page and one more, which tells whether there are further pages."""
+        backwards = bool(before)
+        queryset = self.queryset
+        if before or after:
+            queryset = self._seek(before or after, backwards=backwards)
+        prefix = "-" if backwards else ""
+        ordering = [f"{prefix}{field}" for field in self.ordering]
+        return queryset.order_by(*ordering)[: self.per_page + 1], backwards
+
+    def _page(self, rows: list, after: Optional[str], backwards: bool) -> KeysetPage:
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if backwards:
+            return KeysetPage(rows[::-1], self.ordering, True, has_more)
+        return KeysetPage(rows, self.ordering, has_more, bool(after))
+
+    def _seek(self, cursor: str, backwards: bool) -> QuerySet:
+        values = self._parse_cursor(cursor)
+        lookup = "lt" if backwards else "gt"
+        inclusive_lookup = "lte" if backwards else "gte"
+
+        *leading_fields, unique_field = self.ordering
+        *leading_values, unique_value = values
+        # a >= x AND (a > x OR id > y) keeps the leading column as a plain index range
+        queryset = self.queryset
+        tie_breaker = Q(**{f"{unique_field}__{lookup}": unique_value})
+        for field, value in reversed(list(zip(leading_fields, leading_values))):
+            tie_breaker = Q(**{f"{field}__{lookup}": value}) | (
+                Q(**{field: value}) & tie_breaker
+            )
+        if leading_fields:
+            queryset = queryset.filter(
+                **{f"{leading_fields[0]}__{inclusive_lookup}": leading_values[0]}
+            )
+        return queryset.filter(tie_breaker)
+
+    def _parse_cursor(self, cursor: str) -> list[int]:
+        try:
+            values = [int(value) for value in cursor.split(",")]
+        except ValueError:
+            raise Http404("Invalid page cursor.")
+        if len(values) != len(self.ordering):
+            raise Http404("Invalid page cursor.")
+        return values
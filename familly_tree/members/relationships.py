@@ -0,0 +1,244 @@
+"""
+Naming how two members are related.
+
+Blood relationships are found with a bidirectional search up the parent links of both
+members, which meets at their closest common ancestor. In-law relationships go through
+one marriage on either side. Everything runs on the cached FamilyGraph, without queries.
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+from .graph import FamilyGraph, get_family_graph
+from .models import Member
+
+ORDINALS = [
+    "first",
+    "second",
+    "third",
+    "fourth",
+    "fifth",
+    "sixth",
+    "seventh",
+    "eighth",
+    "ninth",
+    "tenth",
+]
+TIMES = {1: "once", 2: "twice"}
+ORDINAL_SUFFIXES = {1: "st", 2: "nd", 3: "rd"}
+
+
+class UnknownMember(LookupError):
+    """A member id which is not in the family tree."""
+
+    def __init__(self, member_id: int):
+        super().__init__(f"Member {member_id} does not exist.")
+        self.member_id = member_id
+
+
+@dataclass
+class Relationship:
+    """What the second member is to the first one, with ids of members connecting them."""
+
+    name: str
+    path: list[int]
+
+
+@dataclass
+class _BloodLine:
+    up: int  # generations from the first member to the common ancestor
+    down: int  # generations from the second member to the common ancestor
+    half: bool
+    # indices from the first member, through the ancestor, to the second
+    path: list[int]
+
+
+def relationship_between(member_id: int, other_id: int) -> dict:
+    """
+    Relationship of two members ready for templates and JSON, with members on the path.
+    Raises UnknownMember for unknown ids.
+    """
+    relationship = find_relationship(get_family_graph(), member_id, other_id)
+    path = relationship.path if relationship else [member_id, other_id]
+    members = Member.objects.only("id", "firstname", "lastname").in_bulk(path)
+    for pk in path:
+        # deleted after the graph was loaded
+        if pk not in members:
+            raise UnknownMember(pk)
+    return {
+        "member": members[member_id],
+        "other": members[other_id],
+        "relationship": relationship.name if relationship else None,
+        "path": [members[pk] for pk in path] if relationship else [],
+    }
+
+
+def find_relationship(
+    graph: FamilyGraph, member_id: int, other_id: int
+) -> Optional[Relationship]:
+    """Return what other is to member, or None when they are not related."""
+    start, target = graph.position(member_id), graph.position(other_id)
+    if start is None or target is None:
+        raise UnknownMember(member_id if start is None else other_id)
+    if start == target:
+        return Relationship("same person", [member_id])
+
+    candidates = []
+    for spouse, married in graph.spouses(start):
+        if spouse == target:
+            name = _gendered(graph, target, "husband", "wife")
+            return Relationship(
+                name if married else f"ex-{name}", [member_id, other_id]
+            )
+
+    line = _blood_line(graph, start, target)
+    if line:
+        name = _blood_name(line, graph.male[target])
+        return Relationship(name, [graph.ids[position] for position in line.path])
+
+    # other is a blood relative of member's spouse
+    for spouse, _ in graph.spouses(start):
+        line = _blood_line(graph, spouse, target)
+        if line:
+            name = _spouse_relative_name(graph, spouse, line, graph.male[target])
+            candidates.append((name, [start, *line.path]))
+    # other is a spouse of member's blood relative
+    for spouse, _ in graph.spouses(target):
+        line = _blood_line(graph, start, spouse)
+        if line:
+            name = _relative_spouse_name(graph, spouse, line, graph.male[target])
+            candidates.append((name, [*line.path, target]))
+
+    if not candidates:
+        return None
+    name, path = min(candidates, key=lambda candidate: len(candidate[1]))
+    return Relationship(name, [graph.ids[position] for position in path])
+
+
+def _blood_line(graph: FamilyGraph, start: int, target: int) -> Optional[_BloodLine]:
+    """
+    Expand ancestors of both members one generation at a time, always on the side with
+    the smaller frontier. A side stops once its depth alone cannot beat the best meeting.
+    """
+    # position -> (generations, the child it was reached from)
+    reached = ({start: (0, None)}, {target: (0, None)})
+    frontiers = [[start], [target]]
+    depths = [0, 0]
+    # (generations from start, generations from target, common ancestor)
+    meetings: list[tuple[int, int, int]] = []
+
+    def can_improve(side: int) -> bool:
+        best = min((up + down for up, down, _ in meetings), default=None)
+        return best is None or depths[side] + 1 < best
+
+    while open_sides := [s for s in (0, 1) if frontiers[s] and can_improve(s)]:
+        side = min(open_sides, key=lambda s: len(frontiers[s]))
+        depths[side] += 1
+        next_frontier = []
+        for child in frontiers[side]:
+            for parent in graph.parents(child):
+                if parent in reached[side]:
+                    continue
+                reached[side][parent] = (depths[side], child)
+                next_frontier.append(parent)
+                if parent in reached[1 - side]:
+                    other_depth = reached[1 - side][parent][0]
+                    if side == 0:
+                        meetings.append((depths[side], other_depth, parent))
+                    else:
+                        meetings.append((other_depth, depths[side], parent))
+        frontiers[side] = next_frontier
+
+    if not meetings:
+        return None
+    up, down, ancestor = min(meetings, key=lambda meeting: meeting[0] + meeting[1])
+    path = _walk_down(reached[0], ancestor)[::-1] + _walk_down(reached[1], ancestor)[1:]
+    return _BloodLine(up, down, _is_half(graph, path, up), path)
+
+
+def _is_half(graph: FamilyGraph, path: list[int], up: int) -> bool:
+    """Half relatives descend from different known partners of the common ancestor."""
+    if not 0 < up < len(path) - 1:
+        return False
+    ancestor, start_child, target_child = path[up], path[up - 1], path[up + 1]
+    other_parents = [
+        set(graph.parents(child)) - {ancestor} for child in (start_child, target_child)
+    ]
+    return all(other_parents) and other_parents[0] != other_parents[1]
+
+
+def _walk_down(reached: dict, ancestor: int) -> list[int]:
+    path, position = [], ancestor
+    while position is not None:
+        path.append(position)
+        position = reached[position][1]
+    return path
+
+
+def _blood_name(line: _BloodLine, male: bool) -> str:
+    """Name of the second member for the first one, e.g. "second cousin once removed"."""
+    up, down = line.up, line.down
+    half = "half-" if line.half else ""
+    if down == 0:
+        parent = "father" if male else "mother"
+        return parent if up == 1 else _great(up - 2, f"grand{parent}")
+    if up == 0:
+        child = "son" if male else "daughter"
+        return child if down == 1 else _great(down - 2, f"grand{child}")
+    if up == down == 1:
+        return half + ("brother" if male else "sister")
+    if down == 1:
+        return half + _great(up - 2, "uncle" if male else "aunt")
+    if up == 1:
+        return half + _great(down - 2, "nephew" if male else "niece")
+
+    degree, removed = min(up, down) - 1, abs(up - down)
+    name = f"{half}{_ordinal(degree)} cousin"
+    if removed:
+        name += f" {TIMES.get(removed, f'{removed} times')} removed"
+    return name
+
+
+def _spouse_relative_name(
+    graph: FamilyGraph, spouse: int, line: _BloodLine, male: bool
+) -> str:
+    if line.down == 0 and line.up == 1:
+        return f"{'father' if male else 'mother'}-in-law"
+    if (line.up, line.down) == (1, 1):
+        return f"{'brother' if male else 'sister'}-in-law"
+    if line.up == 0 and line.down == 1:
+        return "stepson" if male else "stepdaughter"
+    return f"{_gendered(graph, spouse, 'husband', 'wife')}'s {_blood_name(line, male)}"
+
+
+def _relative_spouse_name(
+    graph: FamilyGraph, spouse: int, line: _BloodLine, male: bool
+) -> str:
+    if line.up == 0 and line.down == 1:
+        return f"{'son' if male else 'daughter'}-in-law"
+    if (line.up, line.down) == (1, 1):
+        return f"{'brother' if male else 'sister'}-in-law"
+    if line.down == 0 and line.up == 1:
+        return "stepfather" if male else "stepmother"
+    relative = _blood_name(line, graph.male[spouse])
+    return f"{relative}'s {'husband' if male else 'wife'}"
+
+
+def _gendered(graph: FamilyGraph, position: int, male: str, female: str) -> str:
+    return male if graph.male[position] else female
+
+
+def _great(count: int, name: str) -> str:
+    return "great-" * count + name
+
+
+def _ordinal(number: int) -> str:
+    if number <= len(ORDINALS):
+        return ORDINALS[number - 1]
+    # 11th, 12th and 13th, but 21st, 22nd and 23rd
+    suffix = (
+        "th"
+        if number % 100 in (11, 12, 13)
+        else ORDINAL_SUFFIXES.get(number % 10, "th")
+    )
+    return f"{number}{suffix}"
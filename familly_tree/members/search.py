@@ -0,0 +1,74 @@
+"""
+Full-text name search backed by an SQLite FTS5 table (members_member_fts).
+
+The FTS table uses members_member as external content and is kept in sync by triggers,
+so saves, deletes and bulk operations are all indexed without any Python code.
+Django recreates a table when altering some of its columns on SQLite, which drops its triggers,
+so migrations remaking members_member have to create the triggers again (from a frozen copy
+of SEARCH_TRIGGERS_SQL, like migrations 0015 and 0018).
+"""
+
+import re
+
+from django.db.models import Lookup
+
+SEARCH_TABLE = "members_member_fts"
+SEARCH_COLUMNS = ("firstname", "lastname", "family_name")
+
+_columns = ", ".join(SEARCH_COLUMNS)
+_new_values = ", ".join(f"new.{column}" for column in SEARCH_COLUMNS)
+_old_values = ", ".join(f"old.{column}" for column in SEARCH_COLUMNS)
+
+CREATE_SEARCH_TABLE_SQL = [
+    f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+    f"{_columns}, content='members_member', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')",
+]
+
+SEARCH_TRIGGERS_SQL = [
+    f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_update",
+    f"CREATE TRIGGER {SEARCH_TABLE}_insert AFTER INSERT ON members_member BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, {_columns}) VALUES (new.id, {_new_values}); "
+    "END",
+    f"CREATE TRIGGER {SEARCH_TABLE}_delete AFTER DELETE ON members_member BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {_columns}) "
+    f"VALUES ('delete', old.id, {_old_values}); "
+    "END",
+    f"CREATE TRIGGER {SEARCH_TABLE}_update AFTER UPDATE OF {_columns} ON members_member "
+    "BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {_columns}) "
+    f"VALUES ('delete', old.id, {_old_values}); "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, {_columns}) VALUES (new.id, {_new_values}); "
+    "END",
+]
+
+DROP_SEARCH_TABLE_SQL = [
+    f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_update",
+    f"DROP TABLE IF EXISTS {SEARCH_TABLE}",
+]
+
+
+def search_tokens(text: str) -> list[str]:
+    return re.findall(r"\w+", text)
+
+
+def build_match_query(text: str) -> str:
+    """
+    Build FTS5 query matching all words of text as prefixes, in any of the name columns.
+    E.g. "jan kowal" -> '"jan"* "kowal"*' which finds "Jan Kowalski".
+    """
+    return " ".join(f'"{token}"*' for token in search_tokens(text))
+
+
+class Match(Lookup):
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", lhs_params + rhs_params
@@ -0,0 +1,30 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import MartialRelationship, Member, TreeVersion
+
+
+@receiver(post_delete, sender=Member)
+def recount_parents_children_on_delete(sender, instance, **kwargs):
+    parent_ids = {instance.father_id, instance.mother_id} - {None}
+    if parent_ids:
+        Member.objects.filter(pk__in=parent_ids).recount_children()
+    TreeVersion.bump()
+
+
+@receiver(post_save, sender=MartialRelationship)
+def bump_tree_version_on_marriage_save(sender, instance, **kwargs):
+    Member.objects.filter(
+        pk__in=[instance.member_id, instance.spouse_id]
+    ).bump_versions()
+    TreeVersion.bump(
+        changes=[("marriage", instance.member_id, instance.spouse_id, instance.married)]
+    )
+
+
+@receiver(post_delete, sender=MartialRelationship)
+def bump_tree_version_on_marriage_delete(sender, instance, **kwargs):
+    Member.objects.filter(
+        pk__in=[instance.member_id, instance.spouse_id]
+    ).bump_versions()
+    TreeVersion.bump()
@@ -0,0 +1,77 @@
+// Member pickers rendered by forms.MemberAutocomplete, results come from api_member_search.
+(function () {
+  const DELAY_MS = 200;
+
+  function setUp(picker) {
+    const hidden = picker.querySelector("input[type=hidden]");
+    const query = picker.querySelector(".member-autocomplete-query");
+    const results = picker.querySelector(".member-autocomplete-results");
+    let timer = null;
+    let request = 0;
+
+    function choose(member) {
+      hidden.value = member.id;
+      query.value = member.text;
+      results.replaceChildren();
+    }
+
+    function show(data, page) {
+      if (page === 1) {
+        results.replaceChildren();
+      }
+      for (const member of data.results) {
+        const item = document.createElement("li");
+        const button = document.createElement("button");
+        button.type = "button";
+        button.textContent = member.birth_date
+          ? `${member.text} (${member.birth_date})`
+          : member.text;
+        button.addEventListener("click", () => choose(member));
+        item.append(button);
+        results.append(item);
+      }
+      if (data.has_next) {
+        const item = document.createElement("li");
+        const more = document.createElement("button");
+        more.type = "button";
+        more.textContent = "More...";
+        more.addEventListener("click", () => {
+          item.remove();
+          load(page + 1);
+        });
+        item.append(more);
+        results.append(item);
+      }
+    }
+
+    function load(page) {
+      const current = ++request;
+      const url = new URL(picker.dataset.url, window.location.origin);
+      url.searchParams.set("q", query.value);
+      url.searchParams.set("page", page);
+      fetch(url)
+        .then((response) => response.json())
+        .then((data) => {
+          // answers to older keystrokes are dropped
+          if (current === request) {
+            show(data, page);
+          }
+        });
+    }
+
+    query.addEventListener("input", () => {
+      hidden.value = "";
+      clearTimeout(timer);
+      timer = setTimeout(() => load(1), DELAY_MS);
+    });
+    query.addEventListener("focus", () => {
+      if (!results.children.length) {
+        load(1);
+      }
+    });
+  }
+
+  document.addEventListener("DOMContentLoaded", () => {
+    document.querySelectorAll(".member-autocomplete").forEach(setUp);
+  });
+})();
@@ -0,0 +1,277 @@
+"""
+Deterministic synthetic family trees, e.g. for benchmarks of large datasets.
+
+Trees grow generation by generation from a group of founders: members marry each other or
+spouses from outside of the tree, couples get children 20-45 years after their own birth,
+some couples divorce and members born long enough before LAST_YEAR die. Dates have mixed
+precision (missing, year, month or day). The same size and seed always give the same tree.
+
+Members are written with bulk_create in batches, so only the current generation is kept
+in memory, as light tuples.
+"""
+
+import random
+import time
+from dataclasses import dataclass
+from typing import NamedTuple, Optional
+
+from django.db import transaction
+
+from .dates import age_from_keys
+from .models import MartialRelationship, Member, TreeVersion
+
+FIRST_NAMES = {
+    Member.Sex.MALE: (
+        "Adam",
+        "Bartosz",
+        "Jan",
+        "Jakub",
+        "Kacper",
+        "Marek",
+        "Michal",
+        "Piotr",
+        "Stanislaw",
+        "Tomasz",
+        "Wojciech",
+        "Zbigniew",
+    ),
+    Member.Sex.FEMALE: (
+        "Agnieszka",
+        "Anna",
+        "Barbara",
+        "Ewa",
+        "Jadwiga",
+        "Katarzyna",
+        "Maria",
+        "Marta",
+        "Natalia",
+        "Olga",
+        "Teresa",
+        "Zofia",
+    ),
+}
+LASTNAMES = (
+    "Nowak",
+    "Kowalski",
+    "Wisniewski",
+    "Wojcik",
+    "Kowalczyk",
+    "Kaminski",
+    "Lewandowski",
+    "Zielinski",
+    "Szymanski",
+    "Wozniak",
+    "Dabrowski",
+    "Kozlowski",
+    "Jankowski",
+    "Mazur",
+    "Kwiatkowski",
+    "Krawczyk",
+    "Piotrowski",
+    "Grabowski",
+    "Nowakowski",
+    "Pawlowski",
+)
+
+FIRST_YEAR = 1750
+LAST_YEAR = 2020
+MEMBERS_PER_FOUNDER = 25
+MARRIAGE_RATE = 0.85
+# share of marriages with a spouse from outside of the tree (no parents)
+OUTSIDE_SPOUSE_RATE = 0.3
+DIVORCE_RATE = 0.05
+# weights of 0, 1, 2... children of a couple
+CHILDREN_WEIGHTS = (15, 15, 30, 20, 10, 6, 4)
+
+
+class _Person(NamedTuple):
+    pk: int
+    sex: str
+    lastname: str
+    born: int
+
+
+class _Pending(NamedTuple):
+    sex: str
+    lastname: str
+    born: int
+    father_id: Optional[int] = None
+    mother_id: Optional[int] = None
+
+
+@dataclass
+class SyntheticTree:
+    members: int = 0
+    marriages: int = 0
+    seconds: float = 0.0
+
+
+class TreeGenerator:
+    def __init__(self, size: int, seed: int = 0, batch_size: int = 2000):
+        self.size = size
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+        self._created = 0
+        self._marriages = 0
+        self._pending_marriages: list[MartialRelationship] = []
+
+    def run(self) -> SyntheticTree:
+        started = time.perf_counter()
+        result = SyntheticTree()
+        with transaction.atomic():
+            generation = self._create(self._founders())
+            while self._created < self.size:
+                couples = self._marry(generation)
+                children = self._children(couples)
+                # every line died out or reached LAST_YEAR, start another family
+                generation = self._create(children or self._founders())
+            self._flush_marriages()
+            TreeVersion.bump()
+        result.members = self._created
+        result.marriages = self._marriages
+        result.seconds = time.perf_counter() - started
+        return result
+
+    def _founders(self) -> list[_Pending]:
+        count = max(2, self.size // MEMBERS_PER_FOUNDER)
+        return [
+            _Pending(
+                sex=Member.Sex.MALE if number % 2 else Member.Sex.FEMALE,
+                lastname=self.random.choice(LASTNAMES),
+                born=FIRST_YEAR + self.random.randint(0, 30),
+            )
+            for number in range(count)
+        ]
+
+    def _marry(self, generation: list[_Person]) -> list[tuple[_Person, _Person]]:
+        """Pair members of one generation, with each other or with new outside spouses."""
+        men, women, outside = [], [], []
+        for person in generation:
+            if self.random.random() >= MARRIAGE_RATE:
+                continue
+            if self.random.random() < OUTSIDE_SPOUSE_RATE:
+                outside.append(person)
+            else:
+                (men if person.sex == Member.Sex.MALE else women).append(person)
+        self.random.shuffle(women)
+        couples = []
+        for husband, wife in zip(men, women):
+            # children take their father's lastname, so this keeps most siblings apart
+            if husband.lastname == wife.lastname:
+                outside += [husband, wife]
+            else:
+                couples.append((husband, wife))
+        paired = min(len(men), len(women))
+        outside += men[paired:] + women[paired:]
+
+        spouses = self._create(
+            [
+                _Pending(
+                    sex=(
+                        Member.Sex.FEMALE
+                        if person.sex == Member.Sex.MALE
+                        else Member.Sex.MALE
+                    ),
+                    lastname=self.random.choice(LASTNAMES),
+                    born=min(person.born + self.random.randint(-5, 5), LAST_YEAR),
+                )
+                for person in outside
+            ]
+        )
+        for person, spouse in zip(outside, spouses):
+            couples.append(
+                (person, spouse) if person.sex == Member.Sex.MALE else (spouse, person)
+            )
+        for husband, wife in couples:
+            married = self.random.random() >= DIVORCE_RATE
+            self._pending_marriages += [
+                MartialRelationship(
+                    member_id=husband.pk, spouse_id=wife.pk, married=married
+                ),
+                MartialRelationship(
+                    member_id=wife.pk, spouse_id=husband.pk, married=married
+                ),
+            ]
+            if len(self._pending_marriages) >= self.batch_size:
+                self._flush_marriages()
+        return couples
+
+    def _children(self, couples: list[tuple[_Person, _Person]]) -> list[_Pending]:
+        children = []
+        counts = range(len(CHILDREN_WEIGHTS))
+        for husband, wife in couples:
+            (count,) = self.random.choices(counts, CHILDREN_WEIGHTS)
+            for _ in range(count):
+                born = max(husband.born, wife.born) + self.random.randint(20, 45)
+                if born > LAST_YEAR:
+                    continue
+                children.append(
+                    _Pending(
+                        sex=self.random.choice(Member.Sex.values),
+                        lastname=husband.lastname,
+                        born=born,
+                        father_id=husband.pk,
+                        mother_id=wife.pk,
+                    )
+                )
+        return children
+
+    def _create(self, pending: list[_Pending]) -> list[_Person]:
+        """Save members until the tree reaches its size, return the saved ones."""
+        pending = pending[: self.size - self._created]
+        created = []
+        for start in range(0, len(pending), self.batch_size):
+            end = start + self.batch_size
+            batch = pending[start:end]
+            members = Member.objects.bulk_create(
+                [self._build_member(person) for person in batch]
+            )
+            created += [
+                _Person(member.pk, person.sex, person.lastname, person.born)
+                for member, person in zip(members, batch)
+            ]
+        self._created += len(created)
+        return created
+
+    def _build_member(self, person: _Pending) -> Member:
+        # at least a year, so the death date is after any birth date in the birth year
+        died = person.born + self.random.randint(1, 95)
+        member = Member(
+            firstname=self.random.choice(FIRST_NAMES[person.sex]),
+            lastname=person.lastname,
+            family_name=person.lastname,
+            sex=person.sex,
+            birth_date=self._partial_date(person.born),
+            death_date=(
+                self._partial_date(died, allow_empty=False)
+                if died <= LAST_YEAR
+                else None
+            ),
+            father_id=person.father_id,
+            mother_id=person.mother_id,
+        )
+        member._set_date_keys()
+        member.cached_age = age_from_keys(member.birth_date_key, member.death_date_key)
+        return member
+
+    def _partial_date(self, year: int, allow_empty: bool = True) -> Optional[str]:
+        roll = self.random.random()
+        if allow_empty and roll < 0.1:
+            return None
+        if roll < 0.5:
+            return f"{year:04d}"
+        month = self.random.randint(1, 12)
+        if roll < 0.7:
+            return f"{year:04d}-{month:02d}"
+        return f"{year:04d}-{month:02d}-{self.random.randint(1, 28):02d}"
+
+    def _flush_marriages(self) -> None:
+        if self._pending_marriages:
+            MartialRelationship.objects.bulk_create(self._pending_marriages)
+            self._marriages += len(self._pending_marriages) // 2
+            self._pending_marriages = []
+
+
+def generate_tree(size: int, seed: int = 0, batch_size: int = 2000) -> SyntheticTree:
+    """Create a synthetic tree of size members, see the module docstring."""
+    return TreeGenerator(size, seed=seed, batch_size=batch_size).run()
@@ -1,9 +1,49 @@
+"""
+Member links and spouses are cached with keys containing Member.version, which is bumped by
+every change of a member or its marriages, so cached fragments never have to be deleted.
+"""
+
+import hashlib
+
 from django import template
+from django.core.cache import cache
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 
+from members.tree import render_forest
+
 register = template.Library()
 
+# versioned keys are never stale, the timeout only lets unused fragments go
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+# id reversed into the details url once, then replaced by ids of members
+DETAILS_URL_PLACEHOLDER = 2147483647
+
+
+def member_links(members) -> dict[int, str]:
+    """
+    Links to details of members by their ids, reading and storing all of them with one
+    cache call each.
+    """
+    keys = {f"member-link:{member.pk}:{member.version}": member for member in members}
+    cached = cache.get_many(keys)
+    missing = {}
+    for key, member in keys.items():
+        if key not in cached:
+            url = reverse("members:details", args=[member.pk])
+            missing[key] = f'<a href="{url}">{member}</a>'
+    if missing:
+        cache.set_many(missing, FRAGMENT_CACHE_TIMEOUT)
+    links = {**cached, **missing}
+    return {member.pk: links[key] for key, member in keys.items()}
+
+
+def _spouses_key(member, spouses) -> str:
+    # spouse versions, so renamed spouses are not served from cache
+    versions = ",".join(f"{data.spouse.pk}.{data.spouse.version}" for data in spouses)
+    digest = hashlib.md5(versions.encode(), usedforsecurity=False).hexdigest()
+    return f"member-spouses:{member.pk}:{member.version}:{digest}"
+
 
 @register.simple_tag
 def display_family_member(member, title, link_url=None):
@@ -14,8 +54,8 @@ def display_family_member(member, title, link_url=None):
     :param link_url: The URL to link a missing family member (if any)
     """
     if member:
-        url = reverse("members:details", args=[member.pk])
-        html_output = f'<div class="member-{title.lower()}">{title}: <br><a href="{url}">{member}</a></div>'
+        link = member_links([member])[member.pk]
+        html_output = f'<div class="member-{title.lower()}">{title}: <br>{link}</div>'
     else:
         # Display a button if the member is missing
         button_html = (
@@ -35,29 +75,40 @@ def display_family_member(member, title, link_url=None):
 
 
 @register.simple_tag
-def display_family_member_spouses(member):  # TODO: write tests!
+def display_family_member_spouses(member, spouses=None):  # TODO: write tests!
+    """
+    Display current and former spouses of a member.
+    :param spouses: Already fetched SpouseData list, to avoid querying member.spouses again
+    """
     class_name = "member-spouse"
     plural_title = "spouses"
     title = "spouse"
 
-    if member.spouses:
+    if spouses is None:
+        spouses = member.spouses
+
+    key = _spouses_key(member, spouses)
+    html_output = cache.get(key)
+    if html_output is not None:
+        return mark_safe(html_output)
+
+    if spouses:
         items = []
-        for spouse_data in member.spouses:
-            spouse = spouse_data.spouse
+        links = member_links(spouse_data.spouse for spouse_data in spouses)
+        for spouse_data in spouses:
+            link = links[spouse_data.spouse.pk]
             married = spouse_data.married
-            url = reverse("members:details", args=[spouse.pk])
             title = "Spouse"
             if married:
                 items.append(
-                    f'<div class="{class_name}">{title.title()}: <br><a href="{url}">{spouse}</a></div>'
+                    f'<div class="{class_name}">{title.title()}: <br>{link}</div>'
                 )
             else:
-                items.append(
-                    f'<div class="{class_name}">Ex-{title}: <br><a href="{url}">{spouse}</a></div>'
-                )
+                items.append(f'<div class="{class_name}">Ex-{title}: <br>{link}</div>')
         html_output = "".join(items)
     else:
         html_output = f'<div class="{class_name}">No {plural_title} listed.</div>'
+    cache.set(key, html_output, FRAGMENT_CACHE_TIMEOUT)
     return mark_safe(html_output)
 
 
@@ -66,9 +117,9 @@ def display_family_members_list(members, title):
     """Display a list of family members with a title, or a default message if empty."""
     lowered_title = title.lower()
     if members:
+        links = member_links(members)
         items = [
-            f'<div class="member-{lowered_title}">{title}: <br>'
-            f'<a href="{reverse("members:details", args=[member.id])}">{member}</a></div>'
+            f'<div class="member-{lowered_title}">{title}: <br>{links[member.pk]}</div>'
             for member in members
         ]
         html_output = "".join(items)
@@ -97,3 +148,13 @@ def map(value, arg):
 def flatten(value):
     """Flattens a list of lists into a single list."""
     return [item for sublist in value for item in sublist]
+
+
+@register.simple_tag
+def tree_nodes(roots):
+    """List items of the whole forest, see members.tree.render_forest."""
+    # the details url differs only by the id, so it is reversed once with a placeholder id
+    placeholder = str(DETAILS_URL_PLACEHOLDER)
+    url = reverse("members:details", args=[placeholder])
+    prefix, suffix = url.rsplit(placeholder, 1)
+    return render_forest(roots, lambda pk: f"{prefix}{pk}{suffix}")
@@ -0,0 +1,10 @@
+import pytest
+from django.core.cache import cache
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # ids are reused after test transactions are rolled back, which keeps cached fragments
+    # of members with the same id and version
+    yield
+    cache.clear()
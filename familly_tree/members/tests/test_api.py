@@ -0,0 +1,246 @@
+import pytest
+from django.urls import reverse
+
+from members.api import SEARCH_PAGE_SIZE
+from members.models import MartialRelationship, Member, TreeVersion
+from members.tests.factories import (create_and_save_man,
+                                     create_and_save_member,
+                                     create_and_save_woman)
+
+
+def subtree_url(member):
+    return reverse("members:api_member_subtree", args=[member.pk])
+
+
+@pytest.fixture
+def family(db):
+    grandfather = create_and_save_man(firstname="Grandfather")
+    father = create_and_save_man(firstname="Father", father=grandfather)
+    mother = create_and_save_woman(firstname="Mother")
+    MartialRelationship.marry(father, mother)
+    child = create_and_save_man(firstname="Child", father=father, mother=mother)
+    grandchild = create_and_save_woman(firstname="Grandchild", father=child)
+    return {
+        "grandfather": grandfather,
+        "father": father,
+        "mother": mother,
+        "child": child,
+        "grandchild": grandchild,
+    }
+
+
+def test_subtree_descendants(client, family):
+    response = client.get(
+        subtree_url(family["father"]), {"direction": "descendants", "depth": 1}
+    )
+
+    assert response.status_code == 200
+    member = response.json()["member"]
+    assert member["firstname"] == "Father"
+    assert [spouse["firstname"] for spouse in member["spouses"]] == ["Mother"]
+    assert [child["firstname"] for child in member["children"]] == ["Child"]
+    # edge of the requested depth is not expanded
+    assert "children" not in member["children"][0]
+    assert member["children"][0]["children_count"] == 1
+    assert "father" not in member
+
+
+def test_subtree_ancestors(client, family):
+    response = client.get(
+        subtree_url(family["child"]), {"direction": "ancestors", "depth": 2}
+    )
+
+    member = response.json()["member"]
+    assert member["father"]["firstname"] == "Father"
+    assert member["mother"]["firstname"] == "Mother"
+    assert member["father"]["father"]["firstname"] == "Grandfather"
+    assert member["mother"]["father"] is None
+    assert "children" not in member
+
+
+def test_subtree_queries_per_generation(client, family, django_assert_num_queries):
+    for _ in range(5):
+        create_and_save_man(father=family["child"])
+
+    # subtree state (ETag), root, 2 generations of ancestors, 1 of descendants (grandchildren
+    # have no children, so the next generation is not queried) and spouses
+    with django_assert_num_queries(6):
+        response = client.get(
+            subtree_url(family["child"]), {"direction": "both", "depth": 2}
+        )
+    assert len(response.json()["member"]["children"]) == 6
+
+
+def test_subtree_conditional_get(client, family, django_assert_num_queries):
+    response = client.get(subtree_url(family["child"]))
+    etag = response["ETag"]
+
+    with django_assert_num_queries(1):
+        response = client.get(
+            subtree_url(family["child"]), headers={"if-none-match": etag}
+        )
+    assert response.status_code == 304
+
+    create_and_save_woman(father=family["child"])
+
+    response = client.get(subtree_url(family["child"]), headers={"if-none-match": etag})
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+
+
+def revalidate(client, member, etag, **params) -> int:
+    return client.get(
+        subtree_url(member), params, headers={"if-none-match": etag}
+    ).status_code
+
+
+def test_subtree_etag_ignores_changes_outside_of_subtree(client, family):
+    great_grandchild = create_and_save_man(mother=family["grandchild"])
+    params = {"direction": "descendants", "depth": 1}
+    etag = client.get(subtree_url(family["child"]), params)["ETag"]
+
+    family["grandfather"].firstname = "Renamed"
+    family["grandfather"].save()
+    create_and_save_member()
+    # below the edge, only children counts of the edge nodes are shown
+    create_and_save_member(father=great_grandchild)
+
+    assert revalidate(client, family["child"], etag, **params) == 304
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        lambda family: family["grandchild"].save(),
+        lambda family: family["mother"].save(),
+        lambda family: MartialRelationship.marry(
+            family["child"], create_and_save_woman()
+        ),
+        lambda family: create_and_save_member(mother=family["grandchild"]),
+        lambda family: family["grandchild"].delete(),
+        lambda family: Member.objects.filter(pk=family["child"].pk).update(
+            description="Changed"
+        ),
+    ],
+)
+def test_subtree_etag_changes_with_subtree(client, family, change):
+    params = {"direction": "both", "depth": 1}
+    etag = client.get(subtree_url(family["child"]), params)["ETag"]
+
+    change(family)
+
+    assert revalidate(client, family["child"], etag, **params) == 200
+
+
+def test_subtree_etag_changes_when_a_child_is_replaced(client, family):
+    params = {"direction": "descendants", "depth": 1}
+    family["grandchild"].save()
+    etag = client.get(subtree_url(family["child"]), params)["ETag"]
+
+    # the same number of children, with the same versions and children counts
+    family["grandchild"].father = create_and_save_man()
+    family["grandchild"].save()
+    replacement = create_and_save_woman()
+    replacement.father = family["child"]
+    replacement.save()
+
+    assert revalidate(client, family["child"], etag, **params) == 200
+    response = client.get(subtree_url(family["child"]), params)
+    assert [node["id"] for node in response.json()["member"]["children"]] == [
+        replacement.pk
+    ]
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        lambda family: family["child"].save(),
+        lambda family: Member.objects.filter(pk=family["child"].pk).update(
+            firstname="Changed"
+        ),
+        lambda family: MartialRelationship.divorce(family["father"], family["mother"]),
+        lambda family: family["grandchild"].delete(),
+    ],
+)
+def test_tree_version_is_bumped_by_changes(family, change):
+    version = TreeVersion.current().version
+
+    change(family)
+
+    assert TreeVersion.current().version > version
+
+
+@pytest.mark.parametrize(
+    "params", [{"depth": "x"}, {"depth": 100}, {"direction": "sideways"}]
+)
+def test_subtree_invalid_parameters(client, family, params):
+    response = client.get(subtree_url(family["child"]), params)
+    assert response.status_code == 400
+
+
+def test_subtree_of_missing_member(client, db):
+    response = client.get(reverse("members:api_member_subtree", args=[1000]))
+    assert response.status_code == 404
+
+
+def search(client, **params) -> list[int]:
+    response = client.get(reverse("members:api_member_search"), params)
+    assert response.status_code == 200
+    return [result["id"] for result in response.json()["results"]]
+
+
+def test_member_search_by_name_prefix(client, db):
+    jan = create_and_save_man(firstname="Jan", lastname="Kowalski")
+    create_and_save_woman(firstname="Anna", lastname="Nowak")
+
+    assert search(client, q="kowal") == [jan.pk]
+    assert search(client, q="ja kow") == [jan.pk]
+
+
+def test_member_search_constraints(client, family):
+    single_woman = create_and_save_woman(firstname="Single", birth_date="1950")
+    older_woman = create_and_save_woman(firstname="Older", birth_date="1850")
+    unknown_woman = create_and_save_woman(firstname="Unknown")
+
+    assert set(search(client, sex="f", born_after="1900")) == {
+        family["grandchild"].pk,
+        family["mother"].pk,
+        single_woman.pk,
+        unknown_woman.pk,
+    }
+    assert older_woman.pk not in search(client, born_after="1900")
+    assert set(search(client, sex="f", born_before="1900")) == {
+        family["grandchild"].pk,
+        family["mother"].pk,
+        older_woman.pk,
+        unknown_woman.pk,
+    }
+    assert family["mother"].pk not in search(client, sex="f", single="1")
+    assert family["child"].pk not in search(client, exclude=family["child"].pk)
+
+
+def test_member_search_pages(client, db, django_assert_num_queries):
+    members = [
+        create_and_save_member(firstname="Same", lastname="Name")
+        for _ in range(SEARCH_PAGE_SIZE + 2)
+    ]
+    url = reverse("members:api_member_search")
+
+    with django_assert_num_queries(1):
+        first = client.get(url, {"q": "same"}).json()
+    second = client.get(url, {"page": 2}).json()
+
+    assert first["has_next"] and not second["has_next"]
+    assert len(first["results"]) == SEARCH_PAGE_SIZE
+    assert [result["id"] for result in second["results"]] == [
+        member.pk for member in members[SEARCH_PAGE_SIZE:]
+    ]
+
+
+@pytest.mark.parametrize(
+    "params",
+    [{"sex": "x"}, {"born_after": "1900-13"}, {"page": 0}, {"exclude": "abc"}],
+)
+def test_member_search_invalid_parameters(client, db, params):
+    response = client.get(reverse("members:api_member_search"), params)
+    assert response.status_code == 400
@@ -0,0 +1,180 @@
+"""
+Benchmarks of the main views and operations on a synthetic tree (members.synthetic).
+
+Deselected by default, run with:
+    pytest -m benchmark [--benchmark-size 100000] [--benchmark-update]
+
+Every case records the median wall time and the number of queries and compares them with
+benchmarks.json, per tree size. The number of queries must not grow, the time may grow up
+to SLOWDOWN_TOLERANCE times (plus a few milliseconds), as machines differ.
+--benchmark-update stores the results as the new baseline.
+"""
+
+import json
+import statistics
+import time
+from pathlib import Path
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.urls import reverse
+
+from members.models import MartialRelationship, Member
+from members.synthetic import generate_tree
+
+pytestmark = pytest.mark.benchmark
+
+BASELINE_PATH = Path(__file__).with_name("benchmarks.json")
+SEED = 0
+REPEAT = 5
+SLOWDOWN_TOLERANCE = 2.0
+SLACK_SECONDS = 0.005
+
+FILTERS = {
+    "name": {"name": "Nowak"},
+    "sex": {"sex": Member.Sex.FEMALE},
+    "alive": {"alive": "true"},
+    "age_range": {"age_range_min": 20, "age_range_max": 40},
+    "children_count_range": {"children_count_range_min": 3},
+    "birth_year_range": {"birth_year_range_min": 1850, "birth_year_range_max": 1900},
+}
+
+
+@pytest.fixture(autouse=True)
+def render_pages(settings):
+    # measure the views, not responses served from the page cache
+    settings.PAGE_CACHE_ENABLED = False
+
+
+@pytest.fixture(scope="module")
+def synthetic_tree(request, django_db_setup, django_db_blocker):
+    """Generate the tree once for the module, committed, so every test can read it."""
+    with django_db_blocker.unblock():
+        generate_tree(request.config.getoption("benchmark_size"), seed=SEED)
+        family = (
+            Member.objects.filter(children_count__gte=2, father__isnull=False)
+            .exclude(martialrelationship=None)
+            .order_by("id")
+            .first()
+        )
+        singles = {
+            sex: list(
+                Member.objects.filter(sex=sex, martialrelationship=None).order_by("id")[
+                    : REPEAT + 1
+                ]
+            )
+            for sex in Member.Sex.values
+        }
+        yield {
+            "member": family,
+            "couples": list(zip(singles[Member.Sex.MALE], singles[Member.Sex.FEMALE])),
+        }
+        call_command("flush", interactive=False, verbosity=0)
+
+
+@pytest.fixture(scope="session")
+def benchmark_results(request):
+    results = {}
+    yield results
+    if results and request.config.getoption("benchmark_update"):
+        baseline = _load_baseline()
+        size = str(request.config.getoption("benchmark_size"))
+        baseline.setdefault(size, {}).update(results)
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+
+
+@pytest.fixture
+def check_benchmark(request, benchmark_results):
+    def check(name, function):
+        result = _measure(function)
+        benchmark_results[name] = result
+        if request.config.getoption("benchmark_update"):
+            return
+        size = str(request.config.getoption("benchmark_size"))
+        baseline = _load_baseline().get(size, {}).get(name)
+        if baseline is None:
+            pytest.skip(f"No baseline of {name} for {size} members.")
+        assert result["queries"] <= baseline["queries"], (name, result, baseline)
+        limit = baseline["seconds"] * SLOWDOWN_TOLERANCE + SLACK_SECONDS
+        assert result["seconds"] <= limit, (name, result, baseline)
+
+    return check
+
+
+def _measure(function) -> dict:
+    queries = 0
+
+    # connection.queries is reset by every request of the test client
+    def count(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    # the first call warms up caches and counts queries
+    with connection.execute_wrapper(count):
+        function()
+    times = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return {"seconds": round(statistics.median(times), 4), "queries": queries}
+
+
+def _load_baseline() -> dict:
+    if not BASELINE_PATH.exists():
+        return {}
+    return json.loads(BASELINE_PATH.read_text())
+
+
+def _get(client, url, params=None):
+    def get():
+        response = client.get(url, params or {})
+        assert response.status_code == 200
+        return b"".join(response) if response.streaming else response.content
+
+    return get
+
+
+def test_all_members(synthetic_tree, client, db, check_benchmark):
+    check_benchmark("all_members", _get(client, reverse("members:members")))
+
+
+def test_all_members_by_birth_date(synthetic_tree, client, db, check_benchmark):
+    url = reverse("members:members")
+    check_benchmark(
+        "all_members_by_birth_date", _get(client, url, {"order": "birth_date"})
+    )
+
+
+@pytest.mark.parametrize("name", FILTERS)
+def test_member_filter(synthetic_tree, client, db, check_benchmark, name):
+    url = reverse("members:members")
+    check_benchmark(f"filter_{name}", _get(client, url, FILTERS[name]))
+
+
+def test_details(synthetic_tree, client, db, check_benchmark):
+    url = reverse("members:details", args=[synthetic_tree["member"].pk])
+    check_benchmark("details", _get(client, url))
+
+
+def test_tree(synthetic_tree, client, db, check_benchmark):
+    check_benchmark("tree", _get(client, reverse("members:tree")))
+
+
+def test_choose_child(synthetic_tree, client, db, check_benchmark):
+    url = reverse("members:choose_child", args=[synthetic_tree["member"].pk])
+    check_benchmark("choose_child", _get(client, url))
+
+
+def test_marry(synthetic_tree, db, check_benchmark):
+    couples = iter(synthetic_tree["couples"])
+    check_benchmark("marry", lambda: MartialRelationship.marry(*next(couples)))
+
+
+def test_member_search(synthetic_tree, client, db, check_benchmark):
+    url = reverse("members:api_member_search")
+    check_benchmark(
+        "member_search", _get(client, url, {"q": "Nowak An", "born_after": "1900"})
+    )
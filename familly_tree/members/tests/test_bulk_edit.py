@@ -0,0 +1,192 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+
+from members.bulk_edit import bulk_edit_members
+from members.models import MartialRelationship, Member
+from members.tests.factories import create_and_save_man, create_and_save_woman
+
+
+@pytest.fixture
+def family(db):
+    people = {"grandfather": create_and_save_man(birth_date="1900")}
+    people["father"] = create_and_save_man(
+        birth_date="1930", father_id=people["grandfather"].pk
+    )
+    people["mother"] = create_and_save_woman(birth_date="1932")
+    MartialRelationship.marry(people["father"], people["mother"])
+    people["child"] = create_and_save_man(
+        lastname="smyth", birth_date="1960", father_id=people["father"].pk
+    )
+    people["stranger"] = create_and_save_woman(birth_date="1961")
+    return people
+
+
+def rejected(result) -> dict:
+    return {patch.id: patch.errors for patch in result.rejected}
+
+
+def test_bulk_edit_applies_patches(family, django_assert_max_num_queries):
+    patches = [
+        {"id": family["child"].pk, "lastname": "smith", "mother_id": None},
+        {"id": family["stranger"].pk, "death_date": "2000-05", "father_id": None},
+        {"id": family["mother"].pk, "description": "Fixed after import"},
+    ]
+    patches[0]["mother_id"] = family["mother"].pk
+
+    with django_assert_max_num_queries(5):
+        assert not bulk_edit_members(patches, dry_run=True).rejected
+    result = bulk_edit_members(patches)
+
+    assert result.updated == 3 and not result.rejected
+    child = Member.objects.get(pk=family["child"].pk)
+    assert (child.lastname, child.family_name) == ("Smith", "Smith")
+    assert child.mother_id == family["mother"].pk
+    stranger = Member.objects.get(pk=family["stranger"].pk)
+    assert (stranger.death_date_key, stranger.cached_age) == (20000500, 39)
+    assert Member.objects.get(pk=family["mother"].pk).children_count == 1
+    assert Member.objects.get(pk=family["mother"].pk).description == (
+        "Fixed after import"
+    )
+
+
+def test_bulk_edit_rejects_patches_with_reasons(family):
+    father, mother = family["father"], family["mother"]
+    patches = [
+        {"id": family["child"].pk, "birth_date": "1960-13", "death_date": "1959"},
+        {"id": family["stranger"].pk, "father_id": mother.pk, "age": 3},
+        {"id": mother.pk, "sex": "m"},
+        {"id": family["grandfather"].pk, "father_id": family["grandfather"].pk},
+        {"id": father.pk, "birth_date": "1890"},
+        {"id": 0},
+        {"id": father.pk + 1000, "firstname": ""},
+    ]
+
+    result = bulk_edit_members(patches)
+
+    assert result.updated == 0
+    assert [patch.row for patch in result.rejected] == list(range(len(patches)))
+    errors = rejected(result)
+    assert errors[family["child"].pk] == [
+        "birth_date must be in YYYY, YYYY-MM, or YYYY-MM-DD format."
+    ]
+    assert errors[family["stranger"].pk] == ["Fields cannot be edited: age."]
+    assert errors[mother.pk] == [
+        f"Same sex marriages are not allowed: {mother} and {father}."
+    ]
+    assert errors[family["grandfather"].pk] == ["A member cannot be their own father."]
+    assert "cannot be older than it's ancestor" in errors[father.pk][0]
+    assert errors[0] == ["id must be a member id."]
+    assert errors[father.pk + 1000] == ["firstname must be a non-empty string."]
+    # nothing is saved
+    assert Member.objects.get(pk=father.pk).birth_date == "1930"
+
+
+def test_bulk_edit_rejects_patches_which_are_not_objects(family):
+    patches = [["x"], [1, 2], "id", None, {"id": family["child"].pk, "sex": "f"}]
+
+    result = bulk_edit_members(patches)
+
+    assert result.updated == 0
+    assert [(patch.row, patch.id, patch.errors) for patch in result.rejected] == [
+        (row, None, ["Patch must be an object."]) for row in range(4)
+    ]
+
+
+def test_bulk_edit_validates_parents_set_wise(family):
+    father, child = family["father"], family["child"]
+
+    result = bulk_edit_members(
+        [
+            {"id": family["stranger"].pk, "father_id": father.pk, "mother_id": 1},
+            {"id": father.pk, "sex": "f"},
+            {"id": child.pk, "father_id": None, "mother_id": father.pk},
+        ]
+    )
+
+    errors = rejected(result)
+    assert errors[family["stranger"].pk] == [
+        "Non-existent or invalid father: Father must exist and be male.",
+        "Non-existent or invalid mother: Mother must exist and be female.",
+    ]
+    # the child moves to the father's new role in the same edit, the marriage stays
+    assert errors[father.pk] == [
+        f"Same sex marriages are not allowed: {father} and {family['mother']}."
+    ]
+    assert child.pk not in errors
+
+
+def test_bulk_edit_sees_patches_of_each_other(family):
+    grandfather, child = family["grandfather"], family["child"]
+
+    cycle = bulk_edit_members(
+        [
+            {"id": grandfather.pk, "father_id": family["stranger"].pk},
+            {"id": family["stranger"].pk, "sex": "m", "father_id": child.pk},
+        ]
+    )
+    swap = bulk_edit_members(
+        [
+            {"id": family["stranger"].pk, "sex": "m", "birth_date": "1930"},
+            {"id": child.pk, "father_id": family["stranger"].pk},
+        ]
+    )
+
+    assert set(rejected(cycle)) == {grandfather.pk, family["stranger"].pk}
+    assert swap.updated == 2
+    assert Member.objects.get(pk=family["father"].pk).children_count == 0
+
+
+def test_bulk_edit_view(client, family):
+    url = reverse("members:api_member_bulk_edit")
+    patches = [{"id": family["child"].pk, "firstname": "abel"}]
+
+    dry_run = client.post(
+        f"{url}?dry_run=1", json.dumps(patches), content_type="application/json"
+    )
+    response = client.post(url, json.dumps(patches), content_type="application/json")
+    invalid = client.post(
+        url,
+        json.dumps([{"id": family["child"].pk, "sex": "x"}]),
+        content_type="application/json",
+    )
+    malformed = client.post(url, "{", content_type="application/json")
+    not_objects = client.post(
+        url, json.dumps([["x"], [1, 2]]), content_type="application/json"
+    )
+
+    assert dry_run.json() == {"updated": 0, "rejected": []}
+    assert response.json() == {"updated": 1, "rejected": []}
+    assert Member.objects.get(pk=family["child"].pk).firstname == "Abel"
+    assert invalid.status_code == 400
+    assert invalid.json()["rejected"] == [
+        {
+            "row": 0,
+            "id": family["child"].pk,
+            "errors": ["Diversity not supported. Sex must be 'm' or 'f'"],
+        }
+    ]
+    assert malformed.status_code == 400
+    assert not_objects.status_code == 400
+    assert [patch["row"] for patch in not_objects.json()["rejected"]] == [0, 1]
+    assert client.get(url).status_code == 405
+
+
+def test_bulk_edit_command(family, tmp_path):
+    path = tmp_path / "patches.json"
+    path.write_text(json.dumps([{"id": family["child"].pk, "death_date": "2020"}]))
+    out = StringIO()
+
+    call_command("bulk_edit_members", str(path), "--dry-run", stdout=out)
+    call_command("bulk_edit_members", str(path), stdout=out)
+
+    assert "All 1 patches are valid" in out.getvalue()
+    assert "Updated 1 members." in out.getvalue()
+    assert Member.objects.get(pk=family["child"].pk).death_date == "2020"
+
+    path.write_text(json.dumps([{"id": family["child"].pk, "death_date": "1950"}]))
+    with pytest.raises(CommandError, match="Birth date must be before death date"):
+        call_command("bulk_edit_members", str(path))
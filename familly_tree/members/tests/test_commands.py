@@ -0,0 +1,56 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from freezegun import freeze_time
+
+from members.models import Member
+from members.tests.factories import create_and_save_member
+
+
+def refresh_cached_ages(*args) -> str:
+    out = StringIO()
+    call_command("refresh_cached_ages", *args, stdout=out)
+    return out.getvalue()
+
+
+@pytest.fixture
+def members_saved_in_2020(db):
+    with freeze_time("2020-06-15"):
+        return {
+            "living": create_and_save_member(birth_date="2000-06-10"),
+            "birthday_later": create_and_save_member(birth_date="2000-12-24"),
+            "dead": create_and_save_member(birth_date="1900", death_date="1950"),
+            "unknown": create_and_save_member(birth_date=None),
+        }
+
+
+@freeze_time("2024-06-15")
+def test_refresh_cached_ages_updates_changed_rows_only(members_saved_in_2020):
+    output = refresh_cached_ages("--chunk-size", "1")
+
+    ages = dict(Member.objects.values_list("id", "cached_age"))
+    assert ages[members_saved_in_2020["living"].pk] == 24
+    assert ages[members_saved_in_2020["birthday_later"].pk] == 23
+    assert ages[members_saved_in_2020["dead"].pk] == 50
+    assert ages[members_saved_in_2020["unknown"].pk] is None
+    assert "Scanned 3 members, updated 2" in output
+
+
+@freeze_time("2024-06-15")
+def test_refresh_cached_ages_living_only(members_saved_in_2020):
+    Member.objects.filter(pk=members_saved_in_2020["dead"].pk).update(cached_age=1)
+
+    refresh_cached_ages("--living-only")
+
+    assert Member.objects.get(pk=members_saved_in_2020["dead"].pk).cached_age == 1
+
+
+@freeze_time("2024-06-15")
+def test_refresh_cached_ages_birthdays_since(members_saved_in_2020):
+    output = refresh_cached_ages("--birthdays-since", "2024-06-01")
+
+    ages = dict(Member.objects.values_list("id", "cached_age"))
+    assert ages[members_saved_in_2020["living"].pk] == 24
+    assert ages[members_saved_in_2020["birthday_later"].pk] == 19
+    assert "updated 1" in output
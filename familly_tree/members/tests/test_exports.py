@@ -0,0 +1,151 @@
+import csv
+import io
+
+import pytest
+from django.urls import reverse
+
+from members.gedcom import GedcomImporter, format_date
+from members.models import MartialRelationship, Member
+from members.tests.factories import create_and_save_man, create_and_save_woman
+from members.tests.test_gedcom import GEDCOM
+
+
+def download(client, filename, **params):
+    response = client.get(reverse("members:export", args=[filename]), params)
+    assert response.status_code == 200
+    assert response.streaming
+    return b"".join(response.streaming_content).decode()
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("1850-03-02", "2 MAR 1850"),
+        ("1850-03", "MAR 1850"),
+        ("0850", "850"),
+        (None, None),
+    ],
+)
+def test_format_date(value, expected):
+    assert format_date(value) == expected
+
+
+def test_members_csv(db, client):
+    father = create_and_save_man(firstname="Jan", birth_date="1950-01-01")
+    child = create_and_save_woman(firstname="Anna", father=father)
+
+    rows = list(csv.DictReader(io.StringIO(download(client, "members.csv"))))
+
+    assert [row["firstname"] for row in rows] == ["Jan", "Anna"]
+    assert rows[0]["birth_date"] == "1950-01-01"
+    assert rows[1]["father_id"] == str(father.id)
+    assert rows[1]["id"] == str(child.id)
+
+
+def test_members_csv_uses_member_filter(db, client):
+    create_and_save_man(firstname="Jan")
+    create_and_save_woman(firstname="Anna")
+
+    rows = list(csv.DictReader(io.StringIO(download(client, "members.csv", sex="f"))))
+
+    assert [row["firstname"] for row in rows] == ["Anna"]
+
+
+def test_marriages_csv_only_contains_exported_members(db, client):
+    husband = create_and_save_man()
+    wife = create_and_save_woman()
+    MartialRelationship.marry(husband, wife)
+
+    both = list(csv.reader(io.StringIO(download(client, "marriages.csv"))))
+    only_women = list(
+        csv.reader(io.StringIO(download(client, "marriages.csv", sex="f")))
+    )
+
+    assert both[1:] == [
+        [str(husband.id), str(wife.id), "True"],
+        [str(wife.id), str(husband.id), "True"],
+    ]
+    assert only_women[1:] == []
+
+
+def test_gedcom_export_round_trip(db, client):
+    GedcomImporter().run(GEDCOM.splitlines())
+    exported = download(client, "tree.ged")
+    assert exported.startswith("0 HEAD\n")
+    assert exported.endswith("0 TRLR\n")
+
+    def snapshot():
+        return {
+            "members": sorted(
+                Member.objects.values_list(
+                    "firstname",
+                    "lastname",
+                    "sex",
+                    "birth_date",
+                    "death_date",
+                    "description",
+                    "father__firstname",
+                    "mother__firstname",
+                )
+            ),
+            "marriages": sorted(
+                MartialRelationship.objects.values_list(
+                    "member__firstname", "spouse__firstname", "married"
+                )
+            ),
+        }
+
+    before = snapshot()
+    MartialRelationship.objects.all().delete()
+    Member.objects.all().delete()
+    GedcomImporter().run(exported.splitlines())
+
+    assert snapshot() == before
+
+
+def test_gedcom_export_skips_parents_outside_of_filter(db, client):
+    father = create_and_save_man(firstname="Jan")
+    create_and_save_woman(firstname="Anna", father=father)
+
+    exported = download(client, "tree.ged", sex="f")
+
+    assert "INDI" in exported
+    assert f"@I{father.id}@" not in exported
+
+
+def test_gedcom_export_groups_partially_exported_families_once(db, client):
+    fathers = [create_and_save_man(), create_and_save_man()]
+    mothers = [create_and_save_woman(), create_and_save_woman()]
+    # sorted by father first, daughters of the first mother are not adjacent
+    for father, mother in [(0, 0), (0, 1), (1, 0)]:
+        create_and_save_woman(father=fathers[father], mother=mothers[mother])
+
+    exported = download(client, "tree.ged", sex="f")
+
+    families = exported.split(" FAM\n")[1:]
+    assert [family.count("1 CHIL") for family in families] == [2, 1]
+    assert exported.count(f"1 WIFE @I{mothers[0].id}@") == 1
+    assert "HUSB" not in exported
+
+
+def test_export_queries_do_not_depend_on_number_of_members(
+    db, client, django_assert_num_queries
+):
+    father = create_and_save_man()
+    mother = create_and_save_woman()
+    MartialRelationship.marry(father, mother)
+    for _ in range(5):
+        create_and_save_man(father=father, mother=mother)
+
+    with django_assert_num_queries(3):
+        download(client, "tree.ged")
+
+
+def test_unknown_export_returns_404(db, client):
+    response = client.get(reverse("members:export", args=["members.xml"]))
+    assert response.status_code == 404
+
+
+def test_invalid_filter_returns_400(db, client):
+    response = client.get(reverse("members:export", args=["members.csv"]), {"sex": "x"})
+    assert response.status_code == 400
@@ -106,3 +106,36 @@ class TestMemberFilter:
             sample_data[2],
             sample_data[4],
         ]
+
+    def test_filter_birth_year_range(self, sample_data):
+        filter_range = MemberFilter(
+            {"birth_year_range_min": 1950, "birth_year_range_max": 1974},
+            queryset=Member.objects.all(),
+        )
+        filtered = filter_range.qs.order_by("id")
+        assert list(filtered) == [sample_data[1], sample_data[3], sample_data[4]]
+
+    @pytest.mark.parametrize(
+        "value, expected_indexes",
+        [
+            ("jo", [0, 2]),
+            ("doe jan", [1]),
+            ("SMI", [0, 1]),
+            ("tay swi", [3]),
+            ("xyz", []),
+            ("?!", []),
+        ],
+    )
+    def test_filter_name_prefix_search(self, sample_data, value, expected_indexes):
+        filter = MemberFilter({"name": value}, queryset=Member.objects.all())
+        filtered = filter.qs.order_by("id")
+        assert list(filtered) == [sample_data[i] for i in expected_indexes]
+
+    def test_search_index_follows_changes(self, sample_data):
+        john = sample_data[0]
+        john.firstname = "Jonathan"
+        john.save()
+        sample_data[2].delete()
+
+        assert list(Member.objects.search("jonat")) == [john]
+        assert list(Member.objects.search("alice")) == []
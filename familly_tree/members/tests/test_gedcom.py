@@ -0,0 +1,178 @@
+from io import StringIO
+
+import pytest
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from freezegun import freeze_time
+
+from members.gedcom import GedcomImporter, convert_date
+from members.models import MartialRelationship, Member
+
+GEDCOM = """0 HEAD
+1 CHAR UTF-8
+0 @I1@ INDI
+1 NAME Jan /Kowalski/
+1 SEX M
+1 BIRT
+2 DATE 12 MAR 1850
+1 DEAT
+2 DATE 1910
+0 @I2@ INDI
+1 NAME Anna /Nowak/
+1 SEX F
+1 BIRT
+2 DATE ABT 1855
+1 NOTE First line
+2 CONT second line
+0 @I3@ INDI
+1 NAME Piotr /Kowalski/
+1 SEX M
+1 BIRT
+2 DATE MAY 1880
+0 @I4@ INDI
+1 NAME Maria /Wisniewska/
+1 SEX F
+0 @F1@ FAM
+1 HUSB @I1@
+1 WIFE @I2@
+1 CHIL @I3@
+0 @F2@ FAM
+1 HUSB @I3@
+1 WIFE @I4@
+1 DIV Y
+0 TRLR
+"""
+
+
+def import_gedcom(text, batch_size=2):
+    return GedcomImporter(batch_size=batch_size).run(text.splitlines())
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("12 MAR 1850", "1850-03-12"),
+        ("MAR 1850", "1850-03"),
+        ("1850", "1850"),
+        ("ABT 850", "0850"),
+        ("BET 1850 AND 1860", "1850"),
+        ("sometime", None),
+        (None, None),
+    ],
+)
+def test_convert_date(value, expected):
+    assert convert_date(value) == expected
+
+
+@freeze_time("2024-06-15")
+def test_import_gedcom(db):
+    result = import_gedcom(GEDCOM)
+
+    assert (result.members, result.families, result.marriages) == (4, 2, 2)
+    jan = Member.objects.get(firstname="Jan")
+    anna = Member.objects.get(firstname="Anna")
+    piotr = Member.objects.get(firstname="Piotr")
+    maria = Member.objects.get(firstname="Maria")
+    assert (jan.birth_date, jan.death_date, jan.age) == ("1850-03-12", "1910", 59)
+    assert anna.description == "First line\nsecond line"
+    assert (piotr.father, piotr.mother, piotr.birth_date) == (jan, anna, "1880-05")
+    assert jan.children_count == 1 and anna.children_count == 1
+    assert jan.current_spouse == anna
+    assert piotr.current_spouse is None
+    assert MartialRelationship.objects.filter(member=maria, married=False).count() == 1
+    assert list(Member.objects.search("kowal")) != []
+
+
+def test_import_gedcom_validates_set_wise_and_rolls_back(db):
+    invalid = GEDCOM.replace(
+        "1 NAME Jan /Kowalski/\n1 SEX M", "1 NAME Jan /Kowalski/\n1 SEX F"
+    )
+
+    with pytest.raises(ValidationError) as error:
+        import_gedcom(invalid)
+
+    messages = " ".join(error.value.messages)
+    assert "father must be male" in messages
+    assert "Same sex marriages are not allowed" in messages
+    assert Member.objects.count() == 0
+
+
+def test_import_gedcom_rejects_parent_cycles(db):
+    # I3 is the father of I1, who is his own grandfather then
+    looped = GEDCOM.replace("0 TRLR", "0 @F3@ FAM\n1 HUSB @I3@\n1 CHIL @I1@\n0 TRLR")
+
+    with pytest.raises(ValidationError, match="circullary connected"):
+        import_gedcom(looped)
+
+    assert Member.objects.count() == 0
+
+
+def test_import_gedcom_merges_families_of_the_same_couple(db):
+    # F1 seen from the wife's side, then divorced
+    repeated = GEDCOM.replace(
+        "0 TRLR", "0 @F3@ FAM\n1 HUSB @I2@\n1 WIFE @I1@\n1 DIV Y\n0 TRLR"
+    )
+
+    result = import_gedcom(repeated)
+
+    assert result.marriages == 2
+    jan = Member.objects.get(firstname="Jan")
+    assert list(
+        MartialRelationship.objects.filter(member=jan).values_list("married", flat=True)
+    ) == [False]
+    assert MartialRelationship.objects.count() == 4
+
+
+def test_import_gedcom_rejects_marriage_with_oneself(client, db):
+    looped = GEDCOM.replace("0 TRLR", "0 @F3@ FAM\n1 HUSB @I3@\n1 WIFE @I3@\n0 TRLR")
+
+    with pytest.raises(ValidationError, match="@I3@ cannot marry themselves."):
+        import_gedcom(looped)
+    response = client.post(
+        reverse("members:import_gedcom"),
+        {"file": SimpleUploadedFile("tree.ged", looped.encode())},
+    )
+
+    assert response.status_code == 200
+    assert "@I3@ cannot marry themselves." in response.content.decode()
+    assert Member.objects.count() == 0
+
+
+def test_import_gedcom_validates_only_imported_members(db, monkeypatch):
+    flush_members = GedcomImporter._flush_members
+    inserted = []
+
+    def flush_with_concurrent_insert(importer):
+        flush_members(importer)
+        # rows added by another writer between the batches of the import
+        if not inserted:
+            inserted.extend(
+                Member.objects.bulk_create([Member(firstname="X", sex="x")])
+            )
+
+    monkeypatch.setattr(GedcomImporter, "_flush_members", flush_with_concurrent_insert)
+
+    assert import_gedcom(GEDCOM).members == 4
+    assert Member.objects.filter(pk=inserted[0].pk).exists()
+
+
+def test_import_gedcom_view(client, db):
+    upload = SimpleUploadedFile("tree.ged", GEDCOM.encode())
+
+    response = client.post(reverse("members:import_gedcom"), {"file": upload})
+
+    assert response.status_code == 200
+    assert response.context["result"].members == 4
+    assert Member.objects.count() == 4
+
+
+def test_import_gedcom_command(db, tmp_path):
+    path = tmp_path / "tree.ged"
+    path.write_text(GEDCOM, encoding="utf-8")
+    out = StringIO()
+
+    call_command("import_gedcom", str(path), "--batch-size", "3", stdout=out)
+
+    assert "Imported 4 members, 2 families and 2 marriages" in out.getvalue()
@@ -0,0 +1,125 @@
+import pytest
+
+from members.graph import FamilyGraph, get_family_graph
+from members.models import MartialRelationship, Member
+from members.tests.factories import create_and_save_man, create_and_save_woman
+
+
+@pytest.fixture
+def couple_with_children(db):
+    father = create_and_save_man()
+    mother = create_and_save_woman()
+    MartialRelationship.marry(father, mother)
+    children = [
+        create_and_save_man(father=father, mother=mother),
+        create_and_save_woman(father=father, mother=mother),
+    ]
+    return father, mother, children
+
+
+def test_family_graph(couple_with_children):
+    father, mother, children = couple_with_children
+
+    graph = get_family_graph()
+
+    father_position = graph.position(father.pk)
+    mother_position = graph.position(mother.pk)
+    child_positions = [graph.position(child.pk) for child in children]
+    assert len(graph) == 4
+    assert graph.male[father_position] and not graph.male[mother_position]
+    assert list(graph.children(father_position)) == child_positions
+    assert list(graph.children(mother_position)) == child_positions
+    assert graph.parents(child_positions[0]) == (father_position, mother_position)
+    assert graph.spouses(father_position) == [(mother_position, True)]
+    assert graph.position(100000) is None
+
+
+def test_family_graph_is_cached(couple_with_children, django_assert_num_queries):
+    graph = get_family_graph()
+
+    with django_assert_num_queries(1):
+        assert get_family_graph() is graph
+
+
+def test_family_graph_is_patched_by_own_writes(
+    couple_with_children, django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    father, mother, children = couple_with_children
+    graph = get_family_graph()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        grandchild = create_and_save_woman(father=children[0])
+        MartialRelationship.divorce(father, mother)
+
+    with django_assert_num_queries(1):
+        patched = get_family_graph()
+    child_position = patched.position(children[0].pk)
+    assert list(patched.children(child_position)) == [patched.position(grandchild.pk)]
+    assert patched.spouses(patched.position(father.pk)) == [
+        (patched.position(mother.pk), False)
+    ]
+    # graphs already handed out to readers are not changed by the patches
+    assert patched is not graph and len(graph) == 4
+    assert list(graph.children(child_position)) == []
+    assert graph.spouses(graph.position(father.pk)) == [
+        (graph.position(mother.pk), True)
+    ]
+
+
+def test_family_graph_skips_marriages_of_members_it_did_not_read(
+    couple_with_children, monkeypatch
+):
+    order_by = MartialRelationship.objects.order_by
+
+    def order_by_after_concurrent_marriage(*fields):
+        # a couple committed between reading members and marriages
+        monkeypatch.undo()
+        MartialRelationship.marry(create_and_save_man(), create_and_save_woman())
+        return order_by(*fields)
+
+    monkeypatch.setattr(
+        MartialRelationship.objects, "order_by", order_by_after_concurrent_marriage
+    )
+
+    graph = FamilyGraph.load()
+
+    assert len(graph) == 4
+    assert len(graph.pair_member) == 2
+
+
+def test_family_graph_keeps_children_index_when_parents_do_not_change(
+    couple_with_children, django_capture_on_commit_callbacks
+):
+    father, mother, children = couple_with_children
+    children_index = get_family_graph()._children_csr()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        children[0].firstname = "Renamed"
+        children[0].save()
+        single = create_and_save_man()
+
+    graph = get_family_graph()
+    assert graph._children_csr()[1] is children_index[1]
+    assert list(graph.children(graph.position(single.pk))) == []
+    assert len(graph.children(graph.position(father.pk))) == 2
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        lambda family: Member.objects.filter(pk=family[2][0].pk).update(father=None),
+        lambda family: family[2][1].delete(),
+    ],
+)
+def test_family_graph_is_rebuilt_after_other_changes(
+    couple_with_children, django_capture_on_commit_callbacks, change
+):
+    father, _, children = couple_with_children
+    graph = get_family_graph()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        change(couple_with_children)
+
+    rebuilt = get_family_graph()
+    assert rebuilt is not graph
+    assert len(rebuilt.children(rebuilt.position(father.pk))) == 1
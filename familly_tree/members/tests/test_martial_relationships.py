@@ -1,7 +1,10 @@
 import pytest
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.urls import reverse
 
-from members.models import MartialRelationship, SpouseData
+from members.models import (MartialRelationship, Member, SpouseData,
+                            tree_version_bumped)
 from members.tests.factories import (create_and_save_man,
                                      create_and_save_member,
                                      create_and_save_woman)
@@ -118,6 +121,42 @@ def test_second_marriage_with_the_same_person_without_divorce(db):
     assert woman.current_spouse == man
 
 
+def test_rejected_marriage_does_not_bump_the_tree_version(db):
+    woman = create_and_save_woman()
+    man = create_and_save_man()
+    MartialRelationship.marry(woman, man)
+    bumps = []
+
+    def receiver(**kwargs):
+        bumps.append(kwargs["changes"])
+
+    tree_version_bumped.connect(receiver)
+    try:
+        with pytest.raises(ValidationError):
+            MartialRelationship.marry(man, woman)
+    finally:
+        tree_version_bumped.disconnect(receiver)
+
+    assert bumps == []
+
+
+def test_marriage_renews_a_divorce_with_one_row_left(db):
+    woman = create_and_save_woman()
+    man = create_and_save_man()
+    MartialRelationship.marry(woman, man)
+    MartialRelationship.divorce(woman, man)
+    # one-sided row left by an earlier bug
+    MartialRelationship.objects.filter(member=man).delete()
+
+    MartialRelationship.marry(man, woman)
+
+    assert set(
+        MartialRelationship.objects.values_list("member_id", "spouse_id", "married")
+    ) == {(woman.pk, man.pk, True), (man.pk, woman.pk, True)}
+    assert man.current_spouse == woman
+    assert woman.current_spouse == man
+
+
 def test_second_divorce_with_the_same_person(db):
     man = create_and_save_man()
     woman = create_and_save_woman()
@@ -174,3 +213,157 @@ def test_married_multiple_times(db):
     assert second_wife.spouses == [
         SpouseData(husband, True)
     ], f"{second_wife} should be married with {husband}"
+
+
+def test_spouses_are_loaded_once(db, django_assert_num_queries):
+    man = create_and_save_man()
+    woman = create_and_save_woman()
+    MartialRelationship.marry(man, woman)
+
+    with django_assert_num_queries(1):
+        assert [data.spouse for data in man.spouses] == [woman]
+        assert man.current_spouse == woman
+
+
+def test_spouses_are_reset_by_marry_and_divorce(db):
+    man = create_and_save_man()
+    woman = create_and_save_woman()
+    assert man.spouses == []
+
+    MartialRelationship.marry(man, woman)
+    assert man.current_spouse == woman
+
+    MartialRelationship.divorce(man, woman)
+    assert man.current_spouse is None
+    assert woman.spouses == [SpouseData(man, False)]
+
+
+def test_spouses_for(db, django_assert_num_queries):
+    men = [create_and_save_man() for _ in range(3)]
+    women = [create_and_save_woman() for _ in range(2)]
+    MartialRelationship.marry(men[0], women[0])
+    MartialRelationship.divorce(men[0], women[0])
+    MartialRelationship.marry(men[1], women[0])
+    members = Member.objects.order_by("id")
+
+    # members and all their spouses
+    with django_assert_num_queries(2):
+        members = list(members)
+        spouses = MartialRelationship.spouses_for(members)
+
+    with django_assert_num_queries(0):
+        current = {member.pk: member.current_spouse for member in members}
+    assert spouses[men[0].pk] == [SpouseData(women[0], False)]
+    assert spouses[women[1].pk] == []
+    assert current == {
+        men[0].pk: None,
+        men[1].pk: women[0],
+        men[2].pk: None,
+        women[0].pk: men[1],
+        women[1].pk: None,
+    }
+
+
+def test_all_members_spouse_column(client, db):
+    man = create_and_save_man()
+    woman = create_and_save_woman()
+    MartialRelationship.marry(man, woman)
+
+    response = client.get(reverse("members:members"))
+
+    assert response.content.decode().count(str(woman)) == 2
+
+
+def test_marry_and_divorce_use_fixed_number_of_queries(
+    db, django_assert_max_num_queries
+):
+    man = create_and_save_man()
+    woman = create_and_save_woman()
+
+    # savepoint, lock, marriages, write, member versions, version bump (read and update), release
+    with django_assert_max_num_queries(8):
+        MartialRelationship.marry(man, woman)
+    with django_assert_max_num_queries(7):
+        MartialRelationship.divorce(man, woman)
+    with django_assert_max_num_queries(8):
+        MartialRelationship.marry(man, woman)
+
+    assert MartialRelationship.objects.filter(married=True).count() == 2
+
+
+def test_failed_divorce_changes_nothing(db):
+    man = create_and_save_man()
+    woman = create_and_save_woman()
+    MartialRelationship.marry(man, woman)
+    # one-sided row left by an earlier bug
+    MartialRelationship.objects.filter(member=woman).update(married=False)
+
+    with pytest.raises(ValidationError):
+        MartialRelationship.divorce(man, woman)
+
+    assert list(
+        MartialRelationship.objects.order_by("id").values_list("married", flat=True)
+    ) == [True, False]
+
+
+def test_bulk_marry(db, django_assert_max_num_queries):
+    men = [create_and_save_man() for _ in range(3)]
+    women = [create_and_save_woman() for _ in range(3)]
+    MartialRelationship.marry(men[0], women[0])
+    MartialRelationship.divorce(men[0], women[0])
+
+    with django_assert_max_num_queries(11):
+        count = MartialRelationship.bulk_marry(zip(men, women))
+
+    assert count == 3
+    for man, woman in zip(men, women):
+        assert man.current_spouse == woman
+        assert woman.current_spouse == man
+    assert MartialRelationship.objects.count() == 6
+
+
+def test_bulk_marry_checks_all_couples(db):
+    husband = create_and_save_man()
+    wife = create_and_save_woman()
+    MartialRelationship.marry(husband, wife)
+    single_man = create_and_save_man()
+    single_woman = create_and_save_woman()
+    other_man = create_and_save_man()
+
+    with pytest.raises(ValidationError) as error:
+        MartialRelationship.bulk_marry(
+            [
+                (husband, single_woman),
+                (single_man, other_man),
+                (other_man, single_woman),
+            ]
+        )
+
+    assert error.value.messages == [
+        f"Impossible marriage because {husband} is already married.",
+        f"Same sex marriages are not allowed: {single_man} and {other_man}.",
+        f"Impossible marriage because {other_man} is already married.",
+        f"Impossible marriage because {single_woman} is already married.",
+    ]
+    assert MartialRelationship.objects.count() == 2
+
+
+def test_couple_is_stored_once(db):
+    man = create_and_save_man()
+    woman = create_and_save_woman()
+    MartialRelationship.marry(man, woman)
+    MartialRelationship.divorce(man, woman)
+
+    with pytest.raises(IntegrityError), transaction.atomic():
+        MartialRelationship.objects.create(member=man, spouse=woman, married=False)
+
+
+def test_member_has_one_current_marriage_in_the_database(db):
+    man = create_and_save_man()
+    woman = create_and_save_woman()
+    other_woman = create_and_save_woman()
+    MartialRelationship.marry(man, woman)
+
+    with pytest.raises(IntegrityError), transaction.atomic():
+        MartialRelationship.objects.create(member=man, spouse=other_woman)
+    MartialRelationship.objects.create(member=man, spouse=other_woman, married=False)
@@ -2,7 +2,7 @@ import pytest
 from django.core.exceptions import ValidationError
 from freezegun import freeze_time
 
-from members.models import Member
+from members.models import Member, TreeVersion
 from members.tests.factories import (MemberFactory, create_and_save_man,
                                      create_and_save_member,
                                      create_and_save_woman)
@@ -325,12 +325,57 @@ def test_circular_connections(db):
 
     with pytest.raises(
         ValidationError,
-        match=f"Error: {grandx3father} and {child} are circullary connected!",
+        match=f"Error: {grandx3father} and {father} are circullary connected!",
     ):
         grandx3father.father_id = child.father.pk
         grandx3father.save()
 
 
+def test_circular_connection_through_the_youngest_descendant(db):
+    grandfather = create_and_save_man()
+    father = create_and_save_man(father_id=grandfather.pk)
+    child = create_and_save_man(father_id=father.pk)
+
+    grandfather.father_id = child.pk
+    with pytest.raises(
+        ValidationError,
+        match=f"Error: {grandfather} and {child} are circullary connected!",
+    ):
+        grandfather.save()
+
+
+def test_circular_connection_through_mother(db):
+    grandmother = create_and_save_woman()
+    mother = create_and_save_woman(mother=grandmother)
+    daughter = create_and_save_woman(mother=mother)
+
+    grandmother.mother = daughter
+    with pytest.raises(
+        ValidationError,
+        match=f"Error: {grandmother} and {daughter} are circullary connected!",
+    ):
+        grandmother.save()
+
+
+def test_ancestor_born_in_the_same_year_with_partial_dates(db):
+    grandfather = create_and_save_man(birth_date="1900-06")
+    father = create_and_save_man(father=grandfather)
+
+    create_and_save_man(father=father, birth_date="1900")
+
+
+def test_ancestor_validation_is_one_query(db, django_assert_num_queries):
+    ancestor = create_and_save_man(birth_date="1700")
+    for _ in range(30):
+        ancestor = create_and_save_man(father=ancestor)
+    member = create_and_save_man(birth_date="2000")
+    member.father = ancestor
+
+    # parents' sex check and ancestors check
+    with django_assert_num_queries(2):
+        member.clean()
+
+
 def test_siblings(db):
     parent = create_and_save_man(firstname="John")
     daughter = create_and_save_woman(father_id=parent.pk, firstname="Joanna")
@@ -349,3 +394,184 @@ def test_siblings_property_no_parent_set(db):
 
     assert list(member1.siblings) == []
     assert list(member2.siblings) == []
+
+
+def test_children_count_follows_parent_changes(db):
+    father = create_and_save_man()
+    mother = create_and_save_woman()
+    other_father = create_and_save_man()
+    child = create_and_save_man(father_id=father.pk, mother_id=mother.pk)
+
+    father.refresh_from_db()
+    mother.refresh_from_db()
+    assert (father.children_count, mother.children_count) == (1, 1)
+
+    child.refresh_from_db()
+    child.father_id = other_father.pk
+    child.save()
+
+    father.refresh_from_db()
+    other_father.refresh_from_db()
+    assert (father.children_count, other_father.children_count) == (0, 1)
+
+    child.delete()
+
+    mother.refresh_from_db()
+    other_father.refresh_from_db()
+    assert (mother.children_count, other_father.children_count) == (0, 0)
+
+
+def test_save_reads_back_the_incremented_version(db, django_assert_num_queries):
+    member = create_and_save_member()
+    Member.objects.filter(pk=member.pk).update(description="Changed elsewhere")
+
+    member.save()
+    member.save(update_fields=["firstname"])
+
+    # incremented in the database, so the concurrent update is not lost
+    assert Member.objects.get(pk=member.pk).version == 3
+    with django_assert_num_queries(0):
+        assert member.version == 3
+
+
+def test_children_count_follows_bulk_operations(db):
+    father = create_and_save_man()
+    mother = create_and_save_woman()
+
+    children = Member.objects.bulk_create(
+        [MemberFactory.build(father_id=father.pk) for _ in range(3)]
+    )
+    father.refresh_from_db()
+    assert father.children_count == 3
+
+    Member.objects.filter(pk__in=[c.pk for c in children[:2]]).update(mother=mother)
+    mother.refresh_from_db()
+    assert mother.children_count == 2
+
+    for child in children:
+        child.father_id = None
+    versions = Member.objects.filter(pk__in=[c.pk for c in children]).values_list(
+        "pk", "version"
+    )
+    before, tree_version = dict(versions), TreeVersion.current().version
+    Member.objects.bulk_update(children, ["father_id"], batch_size=2)
+    father.refresh_from_db()
+    assert father.children_count == 0
+    # versions are bumped once per bulk_update, not once per batch
+    assert dict(versions.all()) == {pk: version + 1 for pk, version in before.items()}
+    assert TreeVersion.current().version == tree_version + 1
+
+    mother.children_mother.add(children[2])
+    mother.refresh_from_db()
+    assert mother.children_count == 3
+
+    Member.objects.filter(pk__in=[c.pk for c in children]).delete()
+    mother.refresh_from_db()
+    assert mother.children_count == 0
+
+
+@pytest.mark.parametrize(
+    "birth_date, expected_key, expected_precision",
+    [
+        (None, 0, Member.DatePrecision.NONE),
+        ("1850", 18500000, Member.DatePrecision.YEAR),
+        ("1850-03", 18500300, Member.DatePrecision.MONTH),
+        ("1850-03-09", 18500309, Member.DatePrecision.DAY),
+    ],
+)
+def test_birth_date_sort_key(db, birth_date, expected_key, expected_precision):
+    member = create_and_save_member(birth_date=birth_date)
+
+    assert member.birth_date_key == expected_key
+    assert member.birth_date_precision == expected_precision
+
+    Member.objects.filter(pk=member.pk).update(birth_date="1900-01-02")
+    member.refresh_from_db()
+    assert member.birth_date_key == 19000102
+    assert member.birth_date_precision == Member.DatePrecision.DAY
+
+
+@pytest.fixture
+def three_generations(db):
+    grandfather = create_and_save_man(firstname="Grandfather")
+    grandmother = create_and_save_woman(firstname="Grandmother")
+    father = create_and_save_man(
+        firstname="Father", father=grandfather, mother=grandmother
+    )
+    uncle = create_and_save_man(firstname="Uncle", father=grandfather)
+    child = create_and_save_woman(firstname="Child", father=father)
+    cousin = create_and_save_man(firstname="Cousin", father=uncle)
+    return grandfather, grandmother, father, uncle, child, cousin
+
+
+def test_descendants(three_generations, django_assert_num_queries):
+    grandfather, *_ = three_generations
+
+    with django_assert_num_queries(1):
+        descendants = list(
+            grandfather.descendants()
+            .order_by("generation", "firstname")
+            .values_list("firstname", "generation")
+        )
+
+    assert descendants == [
+        ("Father", 1),
+        ("Uncle", 1),
+        ("Child", 2),
+        ("Cousin", 2),
+    ]
+    assert grandfather.descendants(max_depth=1).count() == 2
+    assert grandfather.descendants().filter(generation=2, sex="f").get().firstname == (
+        "Child"
+    )
+
+
+def test_ancestors(three_generations):
+    *_, child, cousin = three_generations
+
+    ancestors = child.ancestors().order_by("generation", "firstname")
+
+    assert [(m.firstname, m.generation) for m in ancestors] == [
+        ("Father", 1),
+        ("Grandfather", 2),
+        ("Grandmother", 2),
+    ]
+    assert list(child.ancestors(max_depth=0)) == []
+    assert set(
+        Member.objects.filter(pk__in=[child.pk, cousin.pk])
+        .ancestors(max_depth=1)
+        .values_list("firstname", flat=True)
+    ) == {"Father", "Uncle"}
+
+
+def test_lineage_can_be_combined(three_generations):
+    grandfather, *_ = three_generations
+    stranger = create_and_save_man(firstname="Stranger")
+
+    combined = grandfather.descendants(max_depth=1) | Member.objects.filter(
+        pk=stranger.pk
+    )
+
+    assert sorted(combined.values_list("firstname", "generation")) == [
+        ("Father", 1),
+        ("Stranger", None),
+        ("Uncle", 1),
+    ]
+
+
+def test_lineage_can_be_used_as_subquery(three_generations):
+    grandfather, grandmother, *_ = three_generations
+
+    grandmothers_grandchildren = grandmother.descendants().filter(generation=2)
+
+    assert list(
+        Member.objects.filter(pk__in=grandmothers_grandchildren).values_list(
+            "firstname", flat=True
+        )
+    ) == ["Child"]
+    assert list(
+        grandfather.descendants()
+        .exclude(pk__in=grandmother.descendants())
+        .values_list("firstname", flat=True)
+        .order_by("firstname")
+    ) == ["Cousin", "Uncle"]
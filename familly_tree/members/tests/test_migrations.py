@@ -0,0 +1,44 @@
+import pytest
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+
+@pytest.fixture
+def migrate(transactional_db):
+    def migrate(target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([("members", target)])
+        return executor.loader.project_state([("members", target)]).apps
+
+    yield migrate
+    migrate(MigrationExecutor(connection).loader.graph.leaf_nodes("members")[0][1])
+
+
+def test_duplicate_marriages_are_divorced_on_both_sides(migrate):
+    apps = migrate("0016_tree_version")
+    Member = apps.get_model("members", "Member")
+    MartialRelationship = apps.get_model("members", "MartialRelationship")
+    husband = Member.objects.create(firstname="Husband", sex="m")
+    first_wife = Member.objects.create(firstname="First", sex="f")
+    second_wife = Member.objects.create(firstname="Second", sex="f")
+    for member, spouse in [
+        (husband, first_wife),
+        (first_wife, husband),
+        (husband, second_wife),
+        (second_wife, husband),
+        (second_wife, husband),
+    ]:
+        MartialRelationship.objects.create(member=member, spouse=spouse, married=True)
+
+    apps = migrate("0017_marriage_constraints_and_indexes")
+    MartialRelationship = apps.get_model("members", "MartialRelationship")
+
+    assert set(
+        MartialRelationship.objects.values_list("member_id", "spouse_id", "married")
+    ) == {
+        (husband.pk, first_wife.pk, False),
+        (first_wife.pk, husband.pk, False),
+        (husband.pk, second_wife.pk, True),
+        (second_wife.pk, husband.pk, True),
+    }
@@ -0,0 +1,182 @@
+import pytest
+from django.conf import settings
+from django.urls import reverse
+
+from members import page_cache
+from members.models import MartialRelationship, Member
+from members.tests.factories import (create_and_save_man,
+                                     create_and_save_member,
+                                     create_and_save_woman)
+
+
+@pytest.fixture(autouse=True)
+def shared_cache(settings, tmp_path):
+    # a cache shared by processes, like a deployment with CACHE_DIR
+    settings.CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": str(tmp_path),
+        }
+    }
+
+
+@pytest.fixture(autouse=True)
+def reset_stats():
+    page_cache.reset_stats()
+
+
+@pytest.fixture
+def family(db):
+    people = {"grandfather": create_and_save_man()}
+    people["father"] = create_and_save_man(father_id=people["grandfather"].pk)
+    people["mother"] = create_and_save_woman()
+    MartialRelationship.marry(people["father"], people["mother"])
+    people["member"] = create_and_save_man(
+        father_id=people["father"].pk, mother_id=people["mother"].pk
+    )
+    people["sibling"] = create_and_save_woman(father_id=people["father"].pk)
+    people["wife"] = create_and_save_woman()
+    MartialRelationship.marry(people["member"], people["wife"])
+    people["child"] = create_and_save_man(father_id=people["member"].pk)
+    people["grandchild"] = create_and_save_member(father_id=people["child"].pk)
+    people["stranger"] = create_and_save_man()
+    # fresh instances, as loaded by views
+    return {name: Member.objects.get(pk=person.pk) for name, person in people.items()}
+
+
+def details_url(member) -> str:
+    return reverse("members:details", args=[member.pk])
+
+
+def page_status(client, urls) -> dict[str, str]:
+    return {url: client.get(url)["X-Page-Cache"] for url in urls}
+
+
+def warm_up(client, family) -> list[str]:
+    urls = [details_url(member) for member in family.values()]
+    urls += [reverse("members:members"), reverse("members:tree")]
+    assert set(page_status(client, urls).values()) == {"miss"}
+    return urls
+
+
+def missed(client, urls) -> set[str]:
+    return {
+        url for url, status in page_status(client, urls).items() if status == "miss"
+    }
+
+
+def test_cached_page_is_served_without_queries(
+    client, family, django_assert_num_queries
+):
+    url = details_url(family["member"])
+    first = client.get(url)
+
+    with django_assert_num_queries(0):
+        second = client.get(url)
+
+    assert (first["X-Page-Cache"], second["X-Page-Cache"]) == ("miss", "hit")
+    assert second.content == first.content
+    stats = client.get(reverse("members:api_page_cache_stats")).json()
+    assert stats == {"details": {"hits": 1, "misses": 1}}
+
+
+def test_member_save_invalidates_relatives_pages(client, family):
+    urls = warm_up(client, family)
+
+    family["member"].firstname = "Renamed"
+    family["member"].save()
+
+    assert missed(client, urls) == {
+        details_url(person) for name, person in family.items() if name != "stranger"
+    } | {reverse("members:members"), reverse("members:tree")}
+    assert "Renamed" in client.get(details_url(family["child"])).content.decode()
+
+
+def test_new_parent_and_previous_parent_pages_are_invalidated(client, family):
+    urls = warm_up(client, family)
+
+    family["sibling"].father = family["stranger"]
+    family["sibling"].save()
+
+    invalidated = missed(client, urls)
+    assert {
+        details_url(family["father"]),
+        details_url(family["stranger"]),
+    } <= invalidated
+    assert details_url(family["wife"]) not in invalidated
+
+
+def test_marriage_invalidates_spouses_pages_and_list(client, family):
+    urls = warm_up(client, family)
+
+    MartialRelationship.divorce(family["member"], family["wife"])
+
+    assert missed(client, urls) == {
+        details_url(family["member"]),
+        details_url(family["wife"]),
+        reverse("members:members"),
+    }
+
+
+def test_delete_invalidates_all_pages(client, family):
+    urls = warm_up(client, family)
+
+    urls.remove(details_url(family["sibling"]))
+    family["sibling"].delete()
+
+    # children are unlinked with a bulk update
+    assert missed(client, urls) == set(urls)
+
+
+def test_bulk_updates_invalidate_all_pages(client, family):
+    urls = warm_up(client, family)
+
+    Member.objects.filter(pk=family["stranger"].pk).update(description="Bulk")
+
+    assert missed(client, urls) == set(urls)
+
+
+def test_pages_rendered_before_commit_are_invalidated(
+    client, family, django_capture_on_commit_callbacks
+):
+    url = details_url(family["member"])
+
+    with django_capture_on_commit_callbacks(execute=True):
+        family["member"].save()
+        # rendered by a request between the write and the commit
+        client.get(url)
+
+    assert client.get(url)["X-Page-Cache"] == "miss"
+
+
+def test_clients_with_session_are_not_served_from_cache(client, family):
+    url = details_url(family["member"])
+    client.get(url)
+    client.cookies[settings.SESSION_COOKIE_NAME] = "session"
+
+    response = client.get(url)
+
+    assert "X-Page-Cache" not in response
+
+
+def test_pages_are_cached_with_local_memory_cache(client, family, settings):
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    }
+    url = details_url(family["member"])
+    client.get(url)
+
+    response = client.get(url)
+
+    assert response["X-Page-Cache"] == "hit"
+
+
+def test_page_cache_can_be_turned_off(client, family, settings):
+    settings.PAGE_CACHE_ENABLED = False
+    url = details_url(family["member"])
+    client.get(url)
+
+    response = client.get(url)
+
+    assert "X-Page-Cache" not in response
+    assert not page_cache.enabled()
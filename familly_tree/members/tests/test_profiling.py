@@ -0,0 +1,108 @@
+import json
+import logging
+
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from family_tree.middleware import QueryProfile, QueryProfilingMiddleware
+from members.models import Member
+from members.tests.factories import create_and_save_member
+
+
+@pytest.fixture
+def profiled_client(settings):
+    settings.QUERY_PROFILING = True
+    settings.QUERY_PROFILING_SLOW_MS = 10_000
+    settings.QUERY_PROFILING_DUPLICATES = 3
+    # middleware is loaded by the first request of a client
+    return Client()
+
+
+def profiling_records(caplog) -> list[tuple[int, dict]]:
+    return [
+        (record.levelno, json.loads(record.getMessage()))
+        for record in caplog.records
+        if record.name == "family_tree.profiling"
+    ]
+
+
+def test_profiling_is_off_by_default(client, db):
+    response = client.get(reverse("members:main"))
+
+    assert "Server-Timing" not in response
+
+
+def test_server_timing_and_log_line(profiled_client, db, caplog):
+    create_and_save_member()
+    caplog.set_level(logging.INFO, logger="family_tree.profiling")
+
+    response = profiled_client.get(reverse("members:members"))
+
+    assert response["Server-Timing"].startswith("db;dur=")
+    assert 'desc="3 queries"' in response["Server-Timing"]
+    [(level, record)] = profiling_records(caplog)
+    assert level == logging.INFO
+    assert record["view"] == "members:members"
+    assert record["status"] == 200
+    assert record["queries"] == 3
+    assert record["duplicates"] == 0
+    assert "top" not in record
+
+
+def test_server_timing_under_asgi(settings, db, caplog):
+    settings.QUERY_PROFILING = True
+    create_and_save_member()
+    caplog.set_level(logging.INFO, logger="family_tree.profiling")
+
+    response = async_to_sync(AsyncClient().get)(reverse("members:members"))
+
+    assert 'desc="3 queries"' in response["Server-Timing"]
+    [(_, record)] = profiling_records(caplog)
+    assert record["view"] == "members:members"
+    assert record["queries"] == 3
+
+
+def test_middleware_is_async_with_an_async_handler(settings):
+    settings.QUERY_PROFILING = True
+
+    async def get_response(request):
+        pass
+
+    assert iscoroutinefunction(QueryProfilingMiddleware(get_response))
+    assert not iscoroutinefunction(QueryProfilingMiddleware(lambda request: None))
+
+
+def test_query_profile_groups_repeated_statements(db):
+    members = [create_and_save_member() for _ in range(3)]
+    profile = QueryProfile()
+
+    with connection.execute_wrapper(profile):
+        Member.objects.count()
+        for member in members:
+            Member.objects.filter(father=member).count()
+
+    assert profile.count == 4
+    assert profile.duplicates == 2
+    assert profile.most_repeated() == 3
+    [top] = profile.top(1)
+    assert top["count"] == 3
+    assert "father_id" in top["sql"]
+
+
+def test_slow_requests_log_top_statements(profiled_client, settings, db, caplog):
+    settings.QUERY_PROFILING_SLOW_MS = 0
+    create_and_save_member()
+    caplog.set_level(logging.INFO, logger="family_tree.profiling")
+
+    profiled_client.get(reverse("members:members"))
+
+    [(level, record)] = profiling_records(caplog)
+    assert level == logging.WARNING
+    assert record["slow"] is True
+    assert len(record["top"]) == 3
+    assert all(
+        {"sql", "count", "ms"} <= statement.keys() for statement in record["top"]
+    )
@@ -0,0 +1,179 @@
+import pytest
+from django.urls import reverse
+
+from members.graph import get_family_graph
+from members.models import MartialRelationship
+from members.relationships import (_ordinal, find_relationship,
+                                   relationship_between)
+from members.tests.factories import create_and_save_man, create_and_save_woman
+
+
+@pytest.fixture
+def family(db):
+    m = {}
+    m["great_grandfather"] = create_and_save_man()
+    m["grandfather"] = create_and_save_man(father=m["great_grandfather"])
+    m["great_uncle"] = create_and_save_man(father=m["great_grandfather"])
+    m["grandmother"] = create_and_save_woman()
+    m["step_grandmother"] = create_and_save_woman()
+    parents = {"father": m["grandfather"], "mother": m["grandmother"]}
+    m["father"] = create_and_save_man(**parents)
+    m["aunt"] = create_and_save_woman(**parents)
+    m["half_uncle"] = create_and_save_man(
+        father=m["grandfather"], mother=m["step_grandmother"]
+    )
+    m["aunts_husband"] = create_and_save_man()
+    MartialRelationship.marry(m["aunt"], m["aunts_husband"])
+    m["cousin"] = create_and_save_woman(mother=m["aunt"], father=m["aunts_husband"])
+    m["cousins_son"] = create_and_save_man(mother=m["cousin"])
+    m["fathers_cousin"] = create_and_save_man(father=m["great_uncle"])
+    m["second_cousin"] = create_and_save_woman(father=m["fathers_cousin"])
+
+    m["mother"] = create_and_save_woman()
+    parents = {"father": m["father"], "mother": m["mother"]}
+    m["me"] = create_and_save_man(**parents)
+    m["sister"] = create_and_save_woman(**parents)
+
+    m["wifes_father"] = create_and_save_man()
+    m["wife"] = create_and_save_woman(father=m["wifes_father"])
+    m["wifes_brother"] = create_and_save_man(father=m["wifes_father"])
+    MartialRelationship.marry(m["me"], m["wife"])
+    m["son"] = create_and_save_man(father=m["me"], mother=m["wife"])
+    m["sons_wife"] = create_and_save_woman()
+    MartialRelationship.marry(m["son"], m["sons_wife"])
+
+    m["stranger"] = create_and_save_woman()
+    return m
+
+
+def relationship_name(family, member, other):
+    relationship = find_relationship(
+        get_family_graph(), family[member].pk, family[other].pk
+    )
+    return relationship.name if relationship else None
+
+
+@pytest.mark.parametrize(
+    "member, other, expected",
+    [
+        ("me", "me", "same person"),
+        ("me", "father", "father"),
+        ("me", "grandmother", "grandmother"),
+        ("me", "great_grandfather", "great-grandfather"),
+        ("great_grandfather", "me", "great-grandson"),
+        ("me", "son", "son"),
+        ("me", "sister", "sister"),
+        ("me", "aunt", "aunt"),
+        ("me", "half_uncle", "half-uncle"),
+        ("me", "great_uncle", "great-uncle"),
+        ("aunt", "me", "nephew"),
+        ("great_uncle", "sister", "great-niece"),
+        ("me", "cousin", "first cousin"),
+        ("me", "cousins_son", "first cousin once removed"),
+        ("cousins_son", "me", "first cousin once removed"),
+        ("me", "second_cousin", "second cousin"),
+        ("son", "second_cousin", "second cousin once removed"),
+        ("me", "wife", "wife"),
+        ("wife", "me", "husband"),
+        ("me", "wifes_father", "father-in-law"),
+        ("me", "wifes_brother", "brother-in-law"),
+        ("wifes_father", "me", "son-in-law"),
+        ("me", "sons_wife", "daughter-in-law"),
+        ("me", "aunts_husband", "aunt's husband"),
+        ("wifes_brother", "me", "brother-in-law"),
+        ("son", "aunts_husband", "great-aunt's husband"),
+        ("me", "stranger", None),
+    ],
+)
+def test_find_relationship(family, member, other, expected):
+    assert relationship_name(family, member, other) == expected
+
+
+def test_ex_spouse(family):
+    MartialRelationship.divorce(family["me"], family["wife"])
+
+    assert relationship_name(family, "me", "wife") == "ex-wife"
+
+
+def test_relationship_path(family):
+    relationship = find_relationship(
+        get_family_graph(), family["me"].pk, family["cousin"].pk
+    )
+
+    assert relationship.path[:2] == [family["me"].pk, family["father"].pk]
+    assert relationship.path[2] in (family["grandfather"].pk, family["grandmother"].pk)
+    assert relationship.path[3:] == [family["aunt"].pk, family["cousin"].pk]
+
+
+def test_parent_index_is_cached_until_tree_changes(family, django_assert_num_queries):
+    get_family_graph()
+
+    # only the tree version and members on the path are read
+    with django_assert_num_queries(2):
+        relationship_between(family["me"].pk, family["cousin"].pk)
+
+    nephew = create_and_save_man(father=family["me"])
+    assert relationship_name({"a": family["sister"], "b": nephew}, "a", "b") == (
+        "nephew"
+    )
+
+
+def test_relationship_api(client, family):
+    url = reverse(
+        "members:api_relationship", args=[family["me"].pk, family["cousins_son"].pk]
+    )
+
+    response = client.get(url)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["relationship"] == "first cousin once removed"
+    assert data["path"][0] == {"id": family["me"].pk, "name": str(family["me"])}
+    assert len(data["path"]) == 6
+
+
+def test_relationship_api_unknown_member(client, family):
+    url = reverse("members:api_relationship", args=[family["me"].pk, 100000])
+
+    assert client.get(url).status_code == 404
+
+
+def test_relationship_page(client, family):
+    response = client.get(
+        reverse("members:relationship"),
+        {"member": family["me"].pk, "other": family["aunt"].pk},
+    )
+
+    assert response.status_code == 200
+    assert (
+        f"{family['aunt']} is the aunt of {family['me']}" in response.content.decode()
+    )
+
+
+def test_relationship_page_unknown_member(client, family):
+    response = client.get(
+        reverse("members:relationship"), {"member": family["me"].pk, "other": 100000}
+    )
+
+    assert response.status_code == 200
+    assert "Member 100000 does not exist." in response.content.decode()
+
+
+@pytest.mark.parametrize(
+    "number, expected",
+    [
+        (3, "third"),
+        (10, "tenth"),
+        (11, "11th"),
+        (12, "12th"),
+        (13, "13th"),
+        (21, "21st"),
+        (22, "22nd"),
+        (23, "23rd"),
+        (24, "24th"),
+        (111, "111th"),
+        (122, "122nd"),
+    ],
+)
+def test_ordinal(number, expected):
+    assert _ordinal(number) == expected
@@ -0,0 +1,133 @@
+import sqlite3
+from contextlib import closing
+from io import StringIO
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import CommandError, call_command
+from django.db import router, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+
+from family_tree.routers import PIN_COOKIE, ReplicaRoutingMiddleware
+from members.models import Member
+from members.tests.factories import create_and_save_member
+
+
+@pytest.fixture
+def replica_settings(settings):
+    settings.DATABASE_REPLICA = "replica"
+    settings.DATABASE_ROUTERS = ["family_tree.routers.PrimaryReplicaRouter"]
+    settings.DATABASE_REPLICA_PIN_SECONDS = 7
+    return settings
+
+
+def read_db(request):
+    return HttpResponse(router.db_for_read(Member))
+
+
+def write_then_read_db(request):
+    router.db_for_write(Member)
+    return read_db(request)
+
+
+def test_replica_routing_is_off_without_replica(settings):
+    settings.DATABASE_REPLICA = None
+
+    with pytest.raises(MiddlewareNotUsed):
+        ReplicaRoutingMiddleware(read_db)
+    assert router.db_for_read(Member) == "default"
+
+
+@pytest.mark.parametrize(
+    "method, url, cookies, expected",
+    [
+        ("get", reverse("members:details", args=[1]), {}, "replica"),
+        ("get", reverse("members:api_member_search"), {}, "replica"),
+        ("head", reverse("members:members"), {}, "replica"),
+        ("get", reverse("members:edit", args=[1]), {}, "default"),
+        ("get", "/missing", {}, "default"),
+        ("post", reverse("members:details", args=[1]), {}, "default"),
+        ("get", reverse("members:details", args=[1]), {PIN_COOKIE: "1"}, "default"),
+    ],
+)
+def test_read_only_views_read_from_replica(
+    replica_settings, method, url, cookies, expected
+):
+    factory = RequestFactory()
+    factory.cookies.load(cookies)
+
+    response = ReplicaRoutingMiddleware(read_db)(getattr(factory, method)(url))
+
+    assert response.content.decode() == expected
+    assert PIN_COOKIE not in response.cookies
+    # nothing leaks out of the request
+    assert router.db_for_read(Member) == "default"
+
+
+def test_writes_pin_the_client_to_primary(replica_settings):
+    request = RequestFactory().get(reverse("members:details", args=[1]))
+
+    response = ReplicaRoutingMiddleware(write_then_read_db)(request)
+
+    assert router.db_for_write(Member) == "default"
+    # reads after a write see it
+    assert response.content == b"default"
+    assert response.cookies[PIN_COOKIE]["max-age"] == 7
+
+
+def test_reads_in_transactions_use_primary(replica_settings, db):
+    def read_in_transaction(request):
+        with transaction.atomic():
+            return read_db(request)
+
+    request = RequestFactory().get(reverse("members:tree"))
+
+    response = ReplicaRoutingMiddleware(read_in_transaction)(request)
+
+    assert response.content == b"default"
+
+
+def test_streamed_exports_read_from_replica(replica_settings):
+    def export(request):
+        return StreamingHttpResponse(router.db_for_read(Member) for _ in range(2))
+
+    request = RequestFactory().get(reverse("members:export", args=["members.csv"]))
+
+    response = ReplicaRoutingMiddleware(export)(request)
+
+    assert b"".join(response) == b"replicareplica"
+
+
+def test_async_views_read_from_replica(replica_settings):
+    async def read(request):
+        return read_db(request)
+
+    request = RequestFactory().get(reverse("members:tree"))
+
+    response = async_to_sync(ReplicaRoutingMiddleware(read))(request)
+
+    assert response.content == b"replica"
+
+
+def test_sync_replica(settings, tmp_path, transactional_db):
+    create_and_save_member()
+    settings.DATABASE_REPLICA_NAME = str(tmp_path / "replica.sqlite3")
+    out = StringIO()
+
+    call_command("sync_replica", stdout=out)
+
+    assert "Copied the database" in out.getvalue()
+    with closing(sqlite3.connect(settings.DATABASE_REPLICA_NAME)) as replica:
+        assert replica.execute("SELECT count(*) FROM members_member").fetchone() == (
+            Member.objects.count(),
+        )
+
+
+def test_sync_replica_outside_transactions_only(settings, tmp_path, db):
+    settings.DATABASE_REPLICA_NAME = str(tmp_path / "replica.sqlite3")
+
+    with pytest.raises(CommandError, match="inside a transaction"):
+        call_command("sync_replica")
@@ -0,0 +1,68 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from members.models import MartialRelationship, Member
+from members.synthetic import generate_tree
+
+FIELDS = ["firstname", "sex", "birth_date", "death_date", "father_id", "mother_id"]
+
+
+def generated_rows() -> list[tuple]:
+    first_id = Member.objects.order_by("id").values_list("id", flat=True).first()
+    return [
+        (
+            *values,
+            father_id and father_id - first_id,
+            mother_id and mother_id - first_id,
+        )
+        for *values, father_id, mother_id in Member.objects.order_by("id").values_list(
+            *FIELDS
+        )
+    ]
+
+
+def test_generate_tree(db):
+    result = generate_tree(300, seed=1, batch_size=50)
+
+    assert result.members == Member.objects.count() == 300
+    assert result.marriages * 2 == MartialRelationship.objects.count() > 0
+    members = Member.objects.in_bulk()
+    for member in members.values():
+        # parents of the right sex, born before their children, dates in order
+        member.clean()
+    children = Member.objects.filter(father__isnull=False)
+    assert children.exists()
+    assert Member.objects.filter(death_date__isnull=False).exists()
+    assert Member.objects.filter(death_date__isnull=True).exists()
+    assert Member.objects.filter(birth_date__isnull=True).exists()
+    assert all(
+        members[member_id].children_count
+        == Member.objects.filter(father_id=member_id).count()
+        for member_id in children.values_list("father_id", flat=True)
+    )
+    for relationship in MartialRelationship.objects.all():
+        assert MartialRelationship.objects.filter(
+            member=relationship.spouse,
+            spouse=relationship.member,
+            married=relationship.married,
+        ).exists()
+
+
+def test_generate_tree_is_deterministic(db):
+    generate_tree(200, seed=3)
+    first = generated_rows()
+    Member.objects.all().delete()
+
+    generate_tree(200, seed=3)
+
+    assert generated_rows() == first
+
+
+def test_generate_tree_command(db):
+    out = StringIO()
+
+    call_command("generate_tree", "120", "--seed", "2", stdout=out)
+
+    assert Member.objects.count() == 120
+    assert "Generated 120 members" in out.getvalue()
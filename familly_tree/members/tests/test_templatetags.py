@@ -2,6 +2,7 @@ import pytest
 from django.template import Context, Template
 from django.urls import reverse
 
+from members.models import MartialRelationship, Member
 from members.tests.factories import create_and_save_man, create_and_save_woman
 
 
@@ -89,3 +90,63 @@ def test_display_family_members_list_no_children():
     expected_output = '<div class="member-child">No children listed.</div>'
     rendered = render_template(template, {"children": []}).strip()
     assert expected_output in rendered
+
+
+def test_member_card_is_cached_per_version(create_family):
+    father, _, _ = create_family
+    template = """
+        {% load family_tree_tags %}
+        {% display_family_member member "Father" %}
+    """
+    render_template(template, {"member": father})
+
+    # same version, so the cached link is used
+    father.firstname = "Unsaved"
+    assert "John Doe" in render_template(template, {"member": father})
+
+    father.save()
+    assert "Unsaved Doe" in render_template(template, {"member": father})
+
+    Member.objects.filter(pk=father.pk).update(firstname="Updated")
+    father = Member.objects.get(pk=father.pk)
+    assert "Updated Doe" in render_template(template, {"member": father})
+
+
+def test_members_list_uses_cached_links(create_family, django_assert_num_queries):
+    father, child, grandchild = create_family
+    template = """
+        {% load family_tree_tags %}
+        {% display_family_members_list members "Member" %}
+    """
+    members = list(Member.objects.order_by("id"))
+    first = render_template(template, {"members": members})
+
+    child.lastname = "Smith"
+    child.save()
+    members = list(Member.objects.order_by("id"))
+    second = render_template(template, {"members": members})
+
+    assert "James Doe" in first
+    assert "James Smith" in second and "John Doe" in second and "Jane Doe" in second
+
+
+def test_spouses_follow_marriages_and_spouse_changes(db):
+    man = create_and_save_man(firstname="John", lastname="Doe")
+    woman = create_and_save_woman(firstname="Jane", lastname="Roe")
+    template = """
+        {% load family_tree_tags %}
+        {% display_family_member_spouses member %}
+    """
+
+    def render_spouses():
+        return render_template(template, {"member": Member.objects.get(pk=man.pk)})
+
+    assert "No spouses listed." in render_spouses()
+    MartialRelationship.marry(man, woman)
+    assert "Spouse: <br>" in render_spouses()
+    MartialRelationship.divorce(man, woman)
+    assert "Ex-Spouse: <br>" in render_spouses()
+
+    woman.lastname = "Smith"
+    woman.save()
+    assert "Jane Smith" in render_spouses()
@@ -1,11 +1,16 @@
+import asyncio
+
 import pytest
+from asgiref.sync import async_to_sync
 from django.core.exceptions import ValidationError
+from django.test import AsyncClient
 from django.urls import reverse
 
 from members.models import MartialRelationship
 from members.tests.factories import (create_and_save_man,
                                      create_and_save_member,
                                      create_and_save_woman)
+from members.views import AllMembers
 
 
 def test_marry_member_success(client, db):
@@ -77,3 +82,242 @@ def test_cannot_marry_yourself(client, db):
 
     with pytest.raises(ValidationError, match=f"{member_1} cannot marry themselves."):
         client.get(url)
+
+
+def test_tree_view_builds_forest_in_single_query(client, db, django_assert_num_queries):
+    grandfather = create_and_save_man(firstname="Adam")
+    grandmother = create_and_save_woman(firstname="Eve")
+    father = create_and_save_man(
+        firstname="Cain", father_id=grandfather.pk, mother_id=grandmother.pk
+    )
+    grandson = create_and_save_man(firstname="Enoch", father_id=father.pk)
+    other_root = create_and_save_woman(firstname="Lilith")
+    daughter = create_and_save_woman(firstname="Naamah", mother_id=other_root.pk)
+    create_and_save_member(firstname="Lonely")
+
+    with django_assert_num_queries(1):
+        response = client.get(reverse("members:tree"))
+
+    assert response.status_code == 200
+    roots = response.context["members"]
+    assert [root.id for root in roots] == [
+        grandfather.pk,
+        grandmother.pk,
+        other_root.pk,
+    ]
+    # children are listed under both parents
+    assert [child.id for child in roots[0].children] == [father.pk]
+    assert roots[1].children == roots[0].children
+    assert [child.id for child in roots[0].children[0].children] == [grandson.pk]
+    assert [child.id for child in roots[2].children] == [daughter.pk]
+    assert str(grandson) in response.content.decode()
+
+
+def test_tree_view_renders_nested_escaped_lists(client, db):
+    father = create_and_save_man(firstname="<b>adam</b>")
+    son = create_and_save_man(firstname="Cain", father_id=father.pk)
+    grandson = create_and_save_man(firstname="Enoch", father_id=son.pk)
+    daughter = create_and_save_woman(firstname="Awan", father_id=father.pk)
+
+    content = client.get(reverse("members:tree")).content.decode()
+
+    link = '<li><a href="{}">{}</a>'.format
+    details = [reverse("members:details", args=[m.pk]) for m in (father, son)]
+    assert (
+        link(details[0], f"&lt;b&gt;adam&lt;/b&gt; {father.lastname}")
+        + "<ul>"
+        + link(details[1], str(son))
+        + "<ul>"
+    ) in content
+    assert f"{grandson}</a></li></ul></li><li>" in content
+    assert f"{daughter}</a></li></ul></li>" in content
+
+
+def test_tree_view_lists_mothers_whose_children_have_fathers(client, db):
+    father = create_and_save_man(firstname="Adam")
+    mother = create_and_save_woman(firstname="Eve")
+    son = create_and_save_man(
+        firstname="Seth", father_id=father.pk, mother_id=mother.pk
+    )
+
+    content = client.get(reverse("members:tree")).content.decode()
+
+    son_link = f'<a href="{reverse("members:details", args=[son.pk])}">{son}</a>'
+    assert content.count(son_link) == 2
+    assert f'<a href="{reverse("members:details", args=[mother.pk])}">' in content
+
+
+@pytest.mark.parametrize("children_num", [1, 5])
+def test_details_query_count_does_not_depend_on_family_size(
+    client, db, django_assert_num_queries, children_num
+):
+    grandfather = create_and_save_man()
+    grandmother = create_and_save_woman()
+    father = create_and_save_man(father_id=grandfather.pk, mother_id=grandmother.pk)
+    create_and_save_woman(father_id=grandfather.pk)
+    wife = create_and_save_woman()
+    MartialRelationship.marry(father, wife)
+    for _ in range(children_num):
+        child = create_and_save_man(father_id=father.pk, mother_id=wife.pk)
+        create_and_save_woman(father_id=child.pk)
+
+    with django_assert_num_queries(5):
+        response = client.get(reverse("members:details", args=[father.pk]))
+
+    assert response.status_code == 200
+    assert len(response.context["children"]) == children_num
+    assert len(response.context["grandchildren"]) == children_num
+    assert len(response.context["siblings"]) == 1
+    assert str(grandmother) in response.content.decode()
+    assert str(wife) in response.content.decode()
+
+
+def test_all_members_keyset_pagination(client, db, django_assert_num_queries):
+    per_page = AllMembers.paginate_by
+    father = create_and_save_man()
+    members = [father] + [
+        create_and_save_member(father_id=father.pk) for _ in range(per_page + 4)
+    ]
+    url = reverse("members:members")
+
+    # count, page and spouses of the members on the page
+    with django_assert_num_queries(3):
+        first_page = client.get(url)
+    page_obj = first_page.context["page_obj"]
+    assert [m.pk for m in first_page.context["all_members"]] == [
+        m.pk for m in members[:per_page]
+    ]
+    assert first_page.context["all_members"][0].children_count == len(members) - 1
+    assert first_page.context["paginator"].count == len(members)
+    assert page_obj.has_next() and not page_obj.has_previous()
+
+    with django_assert_num_queries(3):
+        second_page = client.get(url, {"after": page_obj.next_cursor})
+    assert [m.pk for m in second_page.context["all_members"]] == [
+        m.pk for m in members[per_page:]
+    ]
+    assert not second_page.context["page_obj"].has_next()
+
+    back = client.get(url, {"before": second_page.context["page_obj"].previous_cursor})
+    assert [m.pk for m in back.context["all_members"]] == [
+        m.pk for m in members[:per_page]
+    ]
+    assert not back.context["page_obj"].has_previous()
+
+
+def test_all_members_invalid_cursor(client, db):
+    response = client.get(reverse("members:members"), {"after": "abc"})
+
+    assert response.status_code == 404
+
+
+def test_all_members_sorted_by_birth_date(client, db, monkeypatch):
+    monkeypatch.setattr(AllMembers, "paginate_by", 2)
+    birth_dates = ["1990", "1850-05-01", None, "1850", "1920-07"]
+    members = {date: create_and_save_member(birth_date=date) for date in birth_dates}
+    url = reverse("members:members")
+
+    pages = [client.get(url, {"order": "birth_date"})]
+    while pages[-1].context["page_obj"].has_next():
+        cursor = pages[-1].context["page_obj"].next_cursor
+        pages.append(client.get(url, {"order": "birth_date", "after": cursor}))
+
+    ordered = [member.pk for page in pages for member in page.context["all_members"]]
+    assert ordered == [
+        members[date].pk for date in [None, "1850", "1850-05-01", "1920-07", "1990"]
+    ]
+
+
+def test_choose_child_links_chosen_member(client, db):
+    parent = create_and_save_man(birth_date="1900-05")
+    child = create_and_save_member(birth_date="1925")
+    url = reverse("members:choose_child", args=[parent.pk])
+
+    page = client.get(url)
+    response = client.post(url, {"child": child.pk})
+
+    # members are searched with the autocomplete, not listed on the page
+    assert str(child) not in page.content.decode()
+    assert "born_after=1900-05" in page.content.decode()
+    assert response.status_code == 302
+    child.refresh_from_db()
+    assert child.father_id == parent.pk
+
+
+def test_choose_child_rejects_members_born_before_parent(client, db):
+    parent = create_and_save_man(birth_date="1900-05")
+    older = create_and_save_member(birth_date="1900-04-30")
+
+    response = client.post(
+        reverse("members:choose_child", args=[parent.pk]), {"child": older.pk}
+    )
+
+    assert response.status_code == 200
+    assert response.context["form"].errors["child"]
+    older.refresh_from_db()
+    assert older.father_id is None
+
+
+def test_member_forms_do_not_list_members(client, db):
+    father = create_and_save_man(firstname="Adam", lastname="First")
+    member = create_and_save_man(firstname="Cain", father=father, birth_date="1950")
+    create_and_save_woman(firstname="Eve", lastname="First")
+
+    edit_page = client.get(reverse("members:edit", args=[member.pk])).content.decode()
+    marry_page = client.get(
+        reverse("members:marry_member_form", args=[member.pk])
+    ).content.decode()
+
+    assert "<option" not in edit_page.replace('<option value="m"', "").replace(
+        '<option value="f"', ""
+    )
+    # the current father is shown in the picker, nobody else is listed
+    assert str(father) in edit_page and "Eve" not in edit_page
+    assert "born_before=1950" in edit_page
+    assert "Eve" not in marry_page and "single=1" in marry_page
+
+
+def test_marry_member_form(client, db):
+    man = create_and_save_man()
+    woman = create_and_save_woman()
+
+    response = client.post(
+        reverse("members:marry_member_form", args=[man.pk]), {"spouse": woman.pk}
+    )
+
+    assert response.status_code == 302
+    assert man.current_spouse == woman
+
+
+def test_read_views_served_concurrently_by_async_client(db):
+    father = create_and_save_man()
+    mother = create_and_save_woman()
+    MartialRelationship.marry(father, mother)
+    child = create_and_save_member(father_id=father.pk, mother_id=mother.pk)
+    urls = [
+        reverse("members:members"),
+        reverse("members:details", args=[child.pk]),
+        reverse("members:tree"),
+        reverse("members:member_marriages", args=[father.pk]),
+        reverse("members:details", args=[child.pk + 1]),
+        reverse("members:member_marriages", args=[child.pk + 1]),
+    ]
+
+    async def get_all():
+        client = AsyncClient()
+        return await asyncio.gather(*(client.get(url) for url in urls))
+
+    responses = async_to_sync(get_all)()
+
+    assert [response.status_code for response in responses] == [
+        200,
+        200,
+        200,
+        200,
+        404,
+        404,
+    ]
+    assert str(mother) in responses[0].content.decode()
+    assert str(father) in responses[1].content.decode()
+    assert str(child) in responses[2].content.decode()
+    assert str(mother) in responses[3].content.decode()
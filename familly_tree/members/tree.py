@@ -0,0 +1,65 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Optional
+
+from django.utils.html import escape
+from django.utils.safestring import SafeString, mark_safe
+
+# (id, firstname, lastname, father_id, mother_id)
+MemberRow = tuple[int, str, str, Optional[int], Optional[int]]
+
+
+@dataclass
+class TreeNode:
+    id: int
+    name: str
+    children: list["TreeNode"] = field(default_factory=list)
+
+
+def build_forest(rows: Iterable[MemberRow]) -> list[TreeNode]:
+    """
+    Build family trees (multiple roots) out of flat member rows.
+    Members are placed under both of their parents (the node is shared), like Member.children
+    of each parent. Roots are members without any parents that have at least one child.
+    """
+    nodes: dict[int, TreeNode] = {}
+    children_ids: dict[int, list[int]] = defaultdict(list)
+    root_ids: list[int] = []
+
+    for member_id, firstname, lastname, father_id, mother_id in rows:
+        nodes[member_id] = TreeNode(member_id, f"{firstname} {lastname}")
+        for parent_id in (father_id, mother_id):
+            if parent_id:
+                children_ids[parent_id].append(member_id)
+        if not (father_id or mother_id):
+            root_ids.append(member_id)
+
+    for parent_id, member_ids in children_ids.items():
+        nodes[parent_id].children = [nodes[member_id] for member_id in member_ids]
+
+    return [nodes[root_id] for root_id in root_ids if nodes[root_id].children]
+
+
+def render_forest(
+    roots: list[TreeNode], details_url: Callable[[int], str]
+) -> SafeString:
+    """
+    Nested <li>/<ul> lists of the forest, built iteratively with one string join,
+    as a recursive template include per member is too slow for whole trees.
+    """
+    parts: list[str] = []
+    # nodes to open, or closing tags of nodes whose children are rendered
+    stack: list = list(reversed(roots))
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            parts.append(item)
+            continue
+        parts.append(f'<li><a href="{details_url(item.id)}">{escape(item.name)}</a>')
+        if item.children:
+            parts.append("<ul>")
+            stack.append("</ul></li>")
+            stack.extend(reversed(item.children))
+        else:
+            parts.append("</li>")
+    return mark_safe("".join(parts))
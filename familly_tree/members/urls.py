@@ -1,16 +1,49 @@
 from django.urls import path
 
-from . import views
+from . import api, views
+from .page_cache import cached_page
 
 app_name = "members"
 urlpatterns = [
     path("", views.main, name="main"),
-    path(f"{app_name}/", views.AllMembers.as_view(), name="members"),
-    path(f"{app_name}/<int:pk>", views.Details.as_view(), name="details"),
+    path(
+        f"{app_name}/",
+        cached_page("members")(views.AllMembers.as_view()),
+        name="members",
+    ),
+    path(
+        f"{app_name}/<int:pk>",
+        cached_page("details:{pk}")(views.Details.as_view()),
+        name="details",
+    ),
     path(f"{app_name}/add/", views.AddNew.as_view(), name="add"),
     path(f"{app_name}/edit/<int:pk>", views.EditMember.as_view(), name="edit"),
     path(f"{app_name}/remove/<int:pk>", views.DeleteMember.as_view(), name="remove"),
-    path(f"{app_name}/tree", views.TreeView.as_view(), name="tree"),
+    path(
+        f"{app_name}/tree", cached_page("tree")(views.TreeView.as_view()), name="tree"
+    ),
+    path(f"{app_name}/import/", views.import_gedcom, name="import_gedcom"),
+    path(
+        f"{app_name}/api/<int:pk>/subtree",
+        api.member_subtree,
+        name="api_member_subtree",
+    ),
+    path(
+        f"{app_name}/api/<int:pk>/relationship/<int:other_pk>",
+        api.relationship,
+        name="api_relationship",
+    ),
+    path(f"{app_name}/api/members", api.member_search, name="api_member_search"),
+    path(
+        f"{app_name}/api/members/bulk",
+        api.member_bulk_edit,
+        name="api_member_bulk_edit",
+    ),
+    path(
+        f"{app_name}/api/page-cache", api.page_cache_stats, name="api_page_cache_stats"
+    ),
+    path(f"{app_name}/relationship/", views.relationship, name="relationship"),
+    path(f"{app_name}/export/<str:filename>", views.export, name="export"),
     path(
         "choose_child/<int:parent_id>/",
         views.ChooseChildView.as_view(),
@@ -1,30 +1,94 @@
-from django.db.models import Q
-from django.http import HttpResponseRedirect
-from django.shortcuts import get_object_or_404, redirect, render
+import asyncio
+import io
+
+from django.core.exceptions import ValidationError
+from django.http import (Http404, HttpResponseBadRequest, HttpResponseRedirect,
+                         StreamingHttpResponse)
+from django.shortcuts import (aget_object_or_404, get_object_or_404, redirect,
+                              render)
+from django.template.response import TemplateResponse
 from django.urls import reverse
-from django.views.generic import (CreateView, DeleteView, DetailView, ListView,
-                                  UpdateView)
-from django_filters.views import FilterView
+from django.views.generic import (CreateView, DeleteView, FormView, UpdateView,
+                                  View)
 
+from .exports import gedcom_lines, marriage_csv_rows, member_csv_rows
 from .filters import MemberFilter
-from .forms import MemberForm
+from .forms import (ChooseChildForm, GedcomUploadForm, MarryMemberForm,
+                    MemberForm, RelationshipForm)
+from .gedcom import GedcomImporter
 from .models import MartialRelationship, Member
+from .pagination import KeysetPaginator
+from .relationships import UnknownMember, relationship_between
+from .tree import build_forest
 
 
-class AllMembers(FilterView):
-    model = Member
-    template_name = "all_members.html"
-    context_object_name = "all_members"
-    filterset_class = MemberFilter
-
-    def get_queryset(self):
-        return Member.objects.all()
+class AllMembers(View):
+    """Filtered members list, read with the async ORM (the page and the count at once)."""
 
+    template_name = "all_members.html"
+    paginate_by = 50
+    orderings = {
+        "id": ("id",),
+        "birth_date": ("birth_date_key", "id"),
+    }
+
+    async def get(self, request):
+        filterset = MemberFilter(request.GET or None, queryset=Member.objects.all())
+        if filterset.is_bound and not filterset.is_valid():
+            queryset = filterset.queryset.none()
+        else:
+            queryset = filterset.qs
+        ordering = self.orderings.get(request.GET.get("order"), ("id",))
+        paginator = KeysetPaginator(queryset, self.paginate_by, ordering)
+        _, page = await asyncio.gather(
+            paginator.acount(),
+            self._page(paginator, request.GET.get("after"), request.GET.get("before")),
+        )
+        context = {
+            "filter": filterset,
+            "paginator": paginator,
+            "page_obj": page,
+            "is_paginated": page.has_other_pages(),
+            "all_members": page.object_list,
+        }
+        return TemplateResponse(request, self.template_name, context)
+
+    @staticmethod
+    async def _page(paginator, after, before):
+        page = await paginator.apage(after=after, before=before)
+        # fills member.spouses for the spouse column
+        await MartialRelationship.aspouses_for(page.object_list)
+        return page
+
+
+class Details(View):
+    """Member with its relatives, independent lookups of relatives are awaited together."""
 
-class Details(DetailView):
-    model = Member
     template_name = "details.html"
 
+    async def get(self, request, pk):
+        member = await aget_object_or_404(
+            Member.objects.select_related(
+                "father__father", "father__mother", "mother__father", "mother__mother"
+            ),
+            pk=pk,
+        )
+        children, grandchildren, siblings, _ = await asyncio.gather(
+            _alist(member.children.order_by("id")),
+            _alist(member.descendants(max_depth=2).filter(generation=2).order_by("id")),
+            _alist(member.siblings.order_by("id")),
+            MartialRelationship.aspouses_for([member]),
+        )
+        context = {
+            "member": member,
+            "object": member,
+            "children": children,
+            "grandchildren": grandchildren,
+            "siblings": siblings,
+            "spouses": member.spouses,
+        }
+        return TemplateResponse(request, self.template_name, context)
+
 
 class AddNew(CreateView):
     form_class = MemberForm
@@ -46,59 +110,101 @@ class DeleteMember(DeleteView):
     success_url = "/members/"
 
 
+def import_gedcom(request):
+    form = GedcomUploadForm(request.POST or None, request.FILES or None)
+    result = None
+    if request.method == "POST" and form.is_valid():
+        upload = request.FILES["file"]
+        lines = io.TextIOWrapper(upload.file, encoding="utf-8-sig", errors="replace")
+        try:
+            result = GedcomImporter().run(lines)
+        except ValidationError as error:
+            for message in error.messages:
+                form.add_error("file", message)
+    return render(request, "import_gedcom.html", {"form": form, "result": result})
+
+
+EXPORTS = {
+    "members.csv": (member_csv_rows, "text/csv"),
+    "marriages.csv": (marriage_csv_rows, "text/csv"),
+    "tree.ged": (gedcom_lines, "text/plain; charset=utf-8"),
+}
+
+
+def export(request, filename):
+    """Stream exported members, filtered with the same parameters as the members list."""
+    if filename not in EXPORTS:
+        raise Http404(f"Unknown export {filename}.")
+    filterset = MemberFilter(request.GET, queryset=Member.objects.all())
+    if not filterset.is_valid():
+        return HttpResponseBadRequest(filterset.errors.as_text())
+    generate, content_type = EXPORTS[filename]
+    response = StreamingHttpResponse(generate(filterset.qs), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def relationship(request):
+    form = RelationshipForm(request.GET or None)
+    result = None
+    if form.is_valid():
+        try:
+            result = relationship_between(
+                form.cleaned_data["member"], form.cleaned_data["other"]
+            )
+        except UnknownMember as error:
+            form.add_error(None, str(error))
+    return render(request, "relationship.html", {"form": form, "result": result})
+
+
+async def _alist(queryset) -> list:
+    return [obj async for obj in queryset]
+
+
 def main(request):
     template = "main.html"
     return render(request, template)
 
 
-class TreeView(ListView):
-    model = Member
-    success_url = "members/tree"
+class TreeView(View):
     template_name = "tree.html"
-    context_object_name = "members"
 
-    def get_queryset(self):
-        # TODO: return List of TreeStructures (multiple root nodes). After that write front-end using react or vue.
-        father_null = Q(father_id__isnull=True)
-        mother_null = Q(mother_id__isnull=True)
-        roots = Member.objects.filter(father_null & mother_null).all()
-        roots_with_children = [root for root in roots if root.children.count() > 0]
-        return roots_with_children
+    async def get(self, request):
+        # TODO: write front-end using react or vue.
+        rows = Member.objects.order_by("id").values_list(
+            "id", "firstname", "lastname", "father_id", "mother_id"
+        )
+        # aiterator() of values_list queries runs the query in the event loop (Django 5.2)
+        forest = build_forest(await _alist(rows))
+        return TemplateResponse(request, self.template_name, {"members": forest})
 
 
-class ChooseChildView(ListView):
-    model = Member
-    template_name = "choose_child.html"
-    context_object_name = "members"
+class ChooseChildView(FormView):
+    """Pick an existing member as a child, with an autocomplete instead of listing everyone."""
 
-    def get_queryset(self):
-        parent_id = self.kwargs["parent_id"]
-        parent = get_object_or_404(Member, id=parent_id)
-
-        # Filter out the parent (itself) and members born before itself
-        queryset = Member.objects.exclude(id=parent_id)
+    form_class = ChooseChildForm
+    template_name = "choose_child.html"
 
-        if parent.birth_date:
-            queryset = queryset.filter(
-                Q(birth_date__isnull=True) | Q(birth_date__gt=parent.birth_date)
-            )
-        else:
-            queryset = queryset
+    def setup(self, request, *args, **kwargs):
+        super().setup(request, *args, **kwargs)
+        self.parent = get_object_or_404(Member, id=kwargs["parent_id"])
 
-        return queryset
+    def get_form_kwargs(self):
+        return {**super().get_form_kwargs(), "parent": self.parent}
 
     def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        parent_id = self.kwargs["parent_id"]
-        parent = get_object_or_404(Member, id=parent_id)
-        context["parent"] = parent
-        return context
+        return super().get_context_data(parent=self.parent, **kwargs)
 
+    def form_valid(self, form):
+        try:
+            _link_child(self.parent, form.cleaned_data["child"])
+        except ValidationError as error:
+            form.add_error("child", error)
+            return self.form_invalid(form)
+        return redirect("members:details", self.parent.pk)
 
-def add_child_to_parent(request, parent_id, child_id):
-    parent = get_object_or_404(Member, id=parent_id)
-    child = get_object_or_404(Member, id=child_id)
 
+def _link_child(parent: Member, child: Member) -> None:
     # Depending on the parent's sex, assign the child as a father or mother
     if parent.sex == Member.Sex.MALE:
         child.father = parent
@@ -107,32 +213,42 @@ def add_child_to_parent(request, parent_id, child_id):
 
     child.save()
 
+
+def add_child_to_parent(request, parent_id, child_id):
+    parent = get_object_or_404(Member, id=parent_id)
+    child = get_object_or_404(Member, id=child_id)
+
+    _link_child(parent, child)
+
     # Redirect back to the parent details page
     return redirect("members:details", parent_id)
 
 
-class MemberMarriagesView(ListView):
-    model = MartialRelationship
+class MemberMarriagesView(View):
     template_name = "member_marriages.html"
-    context_object_name = "marriages"
 
-    def get_queryset(self):
-        member_id = self.kwargs["member_id"]
-        return MartialRelationship.objects.filter(member_id=member_id).select_related(
-            "spouse"
+    async def get(self, request, member_id):
+        member, marriages = await asyncio.gather(
+            aget_object_or_404(Member, pk=member_id),
+            _alist(
+                MartialRelationship.objects.filter(member_id=member_id)
+                .select_related("spouse")
+                .order_by("id")
+            ),
         )
-
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context["member"] = get_object_or_404(Member, pk=self.kwargs["member_id"])
-        return context
+        context = {"member": member, "marriages": marriages}
+        return TemplateResponse(request, self.template_name, context)
 
 
 class MarryMemberCreateView(CreateView):
     model = MartialRelationship
-    fields = ["spouse"]
+    form_class = MarryMemberForm
     template_name = "marry_member_form.html"
 
+    def get_form_kwargs(self):
+        member = get_object_or_404(Member, pk=self.kwargs["member_id"])
+        return {**super().get_form_kwargs(), "member": member}
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["member_id"] = self.kwargs["member_id"]